@@ -0,0 +1,153 @@
+"""Opening book of the pro sgf Library
+
+The positions before the first moves of every game are keyed by their canonical
+zobrist hash, with the player to move, and the book records how often each move was
+played from them and how often its player went on to win.  Moves are stored on the
+canonical board, so a position is found whichever way round it was played.
+
+The book is a set of parallel arrays sorted by hash, so a lookup is a binary search:
+
+    book = OpeningBook.build(Library())
+    book.save('book.npz')
+    ...
+    book = OpeningBook.load('book.npz')
+    book.move(position)
+"""
+from copy import deepcopy
+
+import numpy as np
+from thick_goban import go
+
+from nn.datasets import game_rewards
+from util import symmetry, zobrist
+
+
+class OpeningBook:
+    """Next move counts and win rates of canonical positions
+
+    :MIN_COUNT: int
+        times a move must have been played for the book to reply with it.
+    :MAX_PRIOR_WEIGHT: int
+        cap on the simulations a book prior is worth in a search.
+    """
+    MIN_COUNT = 3
+    MAX_PRIOR_WEIGHT = 20
+
+    def __init__(self, hashes, moves, counts, wins, size=19):
+        """
+        :param hashes: array    uint64 canonical position hashes, sorted
+        :param moves: array     canonical moves played from the positions
+        :param counts: array    times each move was played
+        :param wins: array      games won by the player of each move, halves for unknown results
+        :param size: int
+        """
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.moves = np.asarray(moves)
+        self.counts = np.asarray(counts)
+        self.wins = np.asarray(wins)
+        self.size = size
+
+    def __len__(self):
+        """Return the number of position move pairs
+
+        :return: int
+        """
+        return len(self.hashes)
+
+    @classmethod
+    def build(cls, library, max_moves=20, size=19):
+        """Build a book from the first moves of the games of a library
+
+        :param library: sgf.Library or h5py.File
+        :param max_moves: int   moves of each game added
+        :param size: int        board size of the games used
+        :return: OpeningBook
+        """
+        hashes, moves, wins = [], [], []
+        for name in library:
+            game = library[name]
+            if int(game.attrs.get('SZ', 19)) != size or len(game['moves']) == 0:
+                continue
+            game_moves = np.asarray(game['moves'][:max_moves])
+            players = game_moves[:, 1]
+            position_hashes, symmetries = zobrist.board_hashes(
+                zobrist.gray_boards(game['gray'][:len(game_moves)]), players)
+
+            on_board = game_moves[:, 0] < size**2
+            hashes.append(position_hashes[on_board])
+            moves.append(symmetry.transform_moves(game_moves[on_board, 0], symmetries[on_board], size))
+            wins.append((game_rewards(game.attrs.get('RE', ''), players[on_board]) + 1) / 2)
+
+        if not hashes:
+            return cls([], [], [], [], size=size)
+        hashes, moves, wins = np.concatenate(hashes), np.concatenate(moves), np.concatenate(wins)
+
+        order = np.lexsort((moves, hashes))
+        hashes, moves, wins = hashes[order], moves[order], wins[order]
+        starts = np.flatnonzero(np.r_[True, (hashes[1:] != hashes[:-1]) | (moves[1:] != moves[:-1])])
+        counts = np.diff(np.r_[starts, len(hashes)])
+        return cls(hashes[starts], moves[starts], counts, np.add.reduceat(wins, starts), size=size)
+
+    @classmethod
+    def load(cls, file):
+        """Load a saved book
+
+        :param file: str    npz file
+        :return: OpeningBook
+        """
+        with np.load(file) as book:
+            return cls(book['hashes'], book['moves'], book['counts'], book['wins'], size=int(book['size']))
+
+    def save(self, file):
+        """Save the book
+
+        :param file: str    npz file
+        """
+        np.savez(file, hashes=self.hashes, moves=self.moves, counts=self.counts, wins=self.wins,
+                 size=self.size)
+
+    def lookup(self, state):
+        """Return the book moves of a position
+
+        :param state: go.Position
+        :return: dict       {move: (count, win rate of the player to move)}
+        """
+        if state.size != self.size:
+            return {}
+        position_hash, sym = zobrist.position_hash(state)
+        start = np.searchsorted(self.hashes, np.uint64(position_hash), side='left')
+        stop = np.searchsorted(self.hashes, np.uint64(position_hash), side='right')
+        moves = symmetry.dihedral_indexes(self.size)[sym, self.moves[start:stop]]
+        return {int(move): (int(count), wins / count)
+                for move, count, wins in zip(moves, self.counts[start:stop], self.wins[start:stop])}
+
+    def move(self, state, min_count=None):
+        """Return the most played legal book move of a position
+
+        :param state: go.Position
+        :param min_count: int   fewest plays of a book move, None -> MIN_COUNT
+        :return: int            None if the position has no book move
+        """
+        min_count = self.MIN_COUNT if min_count is None else min_count
+        candidates = sorted(self.lookup(state).items(), key=lambda item: item[1], reverse=True)
+        for move, (count, _) in candidates:
+            if count < min_count:
+                break
+            try:
+                deepcopy(state).move(move_pt=move)
+            except go.MoveError:
+                continue
+            return move
+        return None
+
+    def priors(self, state):
+        """Return the book moves of a position as search priors
+
+        Each move is worth as many simulations as it was played, up to MAX_PRIOR_WEIGHT,
+        at its book win rate.
+
+        :param state: go.Position
+        :return: dict       {move: (win rate, weight)}
+        """
+        return {move: (win_rate, min(count, self.MAX_PRIOR_WEIGHT))
+                for move, (count, win_rate) in self.lookup(state).items()}
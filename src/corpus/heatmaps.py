@@ -0,0 +1,148 @@
+"""Move frequency heatmaps of the pro sgf Library
+
+Counts of the intersections played are gathered from the moves of every game, split by
+the colour, move number, rank and era of the player:
+
+    counts[colour, move_bin, rank, era, point]
+
+Games are read a chunk at a time and reduced with a single bincount per chunk, so the
+corpus never has to fit in memory.  The counts are cached in a npz file next to the
+library, and recomputed only when the library changes, so they can be displayed at once.
+"""
+from os import path
+import re
+
+import h5py
+import numpy as np
+
+from sgf import DATA_DIR, SGF_H5
+
+
+HEATMAP_NPZ = path.join(DATA_DIR, 'move_heatmaps.npz')
+
+COLOURS = ('black', 'white')
+# a move is in bin i when MOVE_BINS[i] <= move number < MOVE_BINS[i + 1], counting from 0
+MOVE_BINS = (0, 10, 20, 30, 50, 80, 120, 200, 400)
+RANKS = ('unknown', 'kyu', '1-4 dan', '5-9 dan', 'pro')
+# an era starts with the year, and the first is everything before 1900 and unknown dates
+ERAS = (0, 1900, 1950, 1980, 2000, 2010)
+POINTS = 19**2
+SHAPE = (len(COLOURS), len(MOVE_BINS), len(RANKS), len(ERAS), POINTS)
+
+
+def rank_index(rank):
+    """Return the RANKS index of an sgf rank
+
+    >>> [rank_index(rank) for rank in ['15k', '3d', '7d', '9p', 'Meijin']]
+    [1, 2, 3, 4, 0]
+
+    :param rank: str    sgf BR or WR attribute
+    :return: int
+    """
+    match = re.search(r'(\d+)\s*([kdp])', str(rank).lower())
+    if match is None:
+        return 0
+    level, grade = int(match.group(1)), match.group(2)
+    if grade == 'k':
+        return 1
+    elif grade == 'd':
+        return 2 if level <= 4 else 3
+    return 4
+
+
+def era_index(date):
+    """Return the ERAS index of an sgf date
+
+    >>> [era_index(date) for date in ['1846-09-11', '2003-01-02,03', '']]
+    [0, 4, 0]
+
+    :param date: str    sgf DT attribute
+    :return: int
+    """
+    match = re.search(r'\d{4}', str(date))
+    if match is None:
+        return 0
+    return int(np.searchsorted(ERAS, int(match.group()), side='right')) - 1
+
+
+def game_indexes(game):
+    """Return the flat counts index of every move of a game
+
+    Passes and moves off a 19x19 board are dropped.
+
+    :param game: h5py.Group     game of the Library
+    :return: array              int64 indexes into a flattened SHAPE array
+    """
+    attributes = game.attrs
+    moves = np.asarray(game['moves']).reshape(-1, 2)
+    points, players = moves[:, 0].astype(np.int64), moves[:, 1]
+    move_bins = np.searchsorted(MOVE_BINS, np.arange(len(moves)), side='right') - 1
+    colours = (players == -1).astype(np.int64)
+    ranks = np.where(colours == 0, rank_index(attributes.get('BR', '')), rank_index(attributes.get('WR', '')))
+    eras = np.full(len(moves), era_index(attributes.get('DT', '')))
+
+    on_board = (0 <= points) & (points < POINTS) & (np.abs(players) == 1)
+    indexes = np.ravel_multi_index((colours, move_bins, ranks, eras, points * on_board), SHAPE)
+    return indexes[on_board]
+
+
+def count_moves(library, chunk_size=1000):
+    """Count the intersections played in the 19x19 games of a library
+
+    :param library: sgf.Library or h5py.File
+    :param chunk_size: int      games reduced at once
+    :return: array              int64 counts of SHAPE
+    """
+    counts = np.zeros(np.prod(SHAPE), dtype=np.int64)
+    names = list(library)
+    for start in range(0, len(names), chunk_size):
+        chunk = []
+        for name in names[start:start + chunk_size]:
+            game = library[name]
+            if int(game.attrs.get('SZ', 19)) == 19:
+                chunk.append(game_indexes(game))
+        if chunk:
+            counts += np.bincount(np.concatenate(chunk), minlength=counts.size)
+    return counts.reshape(SHAPE)
+
+
+def load_counts(library_file=SGF_H5, cache=HEATMAP_NPZ, chunk_size=1000):
+    """Return the move counts of a library file, from the cache when it is up to date
+
+    :param library_file: str
+    :param cache: str           npz file
+    :param chunk_size: int      games reduced at once
+    :return: array              int64 counts of SHAPE
+    """
+    mtime = path.getmtime(library_file)
+    try:
+        with np.load(cache) as cached:
+            if cached['mtime'] == mtime and cached['counts'].shape == SHAPE:
+                return cached['counts']
+    except (OSError, KeyError):
+        pass
+
+    with h5py.File(library_file, 'r') as library:
+        counts = count_moves(library, chunk_size=chunk_size)
+    np.savez(cache, counts=counts, mtime=mtime)
+    return counts
+
+
+def heatmap(counts, colours=None, move_bins=None, ranks=None, eras=None):
+    """Return the play frequency of every intersection for a selection of the counts
+
+    Each selection is a list of indexes, or None for all.
+
+    :param counts: array        counts of SHAPE
+    :param colours: list        COLOURS indexes
+    :param move_bins: list      MOVE_BINS indexes
+    :param ranks: list          RANKS indexes
+    :param eras: list           ERAS indexes
+    :return: array              19 x 19 floats summing to 1, or zeros without moves
+    """
+    selection = counts
+    for axis, indexes in enumerate([colours, move_bins, ranks, eras]):
+        if indexes is not None:
+            selection = np.take(selection, indexes, axis=axis)
+    totals = selection.reshape(-1, POINTS).sum(axis=0)
+    return (totals / max(totals.sum(), 1)).reshape(19, 19)
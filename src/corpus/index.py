@@ -0,0 +1,207 @@
+"""Index of the positions of the pro sgf Library
+
+Every position of every game is keyed by its canonical zobrist hash, so the games
+passing through a whole board position, in any orientation, are found with a binary
+search.  Corners are indexed too: the corner_size square of each corner is turned to
+the top left, hashed with the least of itself and its reflection in the diagonal, and
+recorded the first time it appears in a game, so local positions like joseki can be
+found wherever they were played.
+
+Each table is three parallel arrays sorted by hash, saved as npy files in the index
+directory and memory mapped when loaded, so queries read only the pages the search
+touches:
+
+    index = PositionIndex('position_index')
+    index.add_games(Library())
+    index.find(position)            # [(game name, move number), ...]
+    index.find_corner(position, corner=0)
+
+Games added later are merged into the sorted tables.
+"""
+import json
+import os
+from os import path
+
+import numpy as np
+
+from util import zobrist
+
+
+TABLES = ('board', 'corner')
+COLUMNS = ('hashes', 'games', 'moves')
+CORNERS = ('top left', 'top right', 'bottom left', 'bottom right')
+
+
+def corner_windows(boards, corner_size):
+    """Return the corners of boards, each turned so the board corner is at the top left
+
+    :param boards: array        N x size x size colours
+    :param corner_size: int
+    :return: array              N x 4 x corner_size x corner_size, corners in CORNERS order
+    """
+    boards = np.asarray(boards)
+    flips = [boards, boards[:, :, ::-1], boards[:, ::-1, :], boards[:, ::-1, ::-1]]
+    return np.stack([flipped[:, :corner_size, :corner_size] for flipped in flips], axis=1)
+
+
+def corner_hashes(windows):
+    """Return the hashes of corner windows, the same for a window and its diagonal reflection
+
+    :param windows: array       ... x corner_size x corner_size colours
+    :return: array              ... uint64 hashes
+    """
+    corner_size = windows.shape[-1]
+    flat = windows.reshape(windows.shape[:-2] + (corner_size**2,))
+    reflected = np.swapaxes(windows, -1, -2).reshape(flat.shape)
+    return np.minimum(zobrist.hash_boards(flat, corner_size), zobrist.hash_boards(reflected, corner_size))
+
+
+def game_entries(gray, corner_size):
+    """Return the board and corner index entries of the positions of a game
+
+    :param gray: array      grayscale positions of a Library game
+    :param corner_size: int
+    :return: dict           {table: (hashes, move numbers)}
+    """
+    boards = zobrist.gray_boards(gray)
+    board_hashes, _ = zobrist.board_hashes(boards)
+
+    size = gray.shape[-1]
+    windows = corner_windows(boards.reshape(-1, size, size), corner_size)
+    hashes = corner_hashes(windows).ravel()
+    moves = np.repeat(np.arange(len(boards)), len(CORNERS))
+    hashes, first = np.unique(hashes, return_index=True)
+
+    return {'board': (board_hashes, np.arange(len(boards))),
+            'corner': (hashes, moves[first])}
+
+
+class PositionIndex:
+    """Sorted hash tables of the Library positions, stored in a directory
+
+    >>> import tempfile
+    >>> PositionIndex(tempfile.mkdtemp()).find_hash(0)
+    []
+    """
+    def __init__(self, directory, corner_size=7, size=19):
+        """
+        :param directory: str       index files, created if it does not exist
+        :param corner_size: int     side of the corner squares indexed, if the index is new
+        :param size: int            board size of the games indexed, if the index is new
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(path.join(directory, 'games.json')) as games_file:
+                meta = json.load(games_file)
+        except OSError:
+            meta = {'names': [], 'corner_size': corner_size, 'size': size}
+        self.names = meta['names']
+        self.corner_size = meta['corner_size']
+        self.size = meta['size']
+        self._load_tables()
+
+    def __len__(self):
+        """Return the number of games indexed
+
+        :return: int
+        """
+        return len(self.names)
+
+    def _file(self, table, column):
+        return path.join(self.directory, table + '_' + column + '.npy')
+
+    def _load_tables(self):
+        """Memory map the saved tables"""
+        self.tables = {}
+        for table in TABLES:
+            try:
+                self.tables[table] = tuple(np.load(self._file(table, column), mmap_mode='r')
+                                           for column in COLUMNS)
+            except OSError:
+                self.tables[table] = (np.zeros(0, dtype=np.uint64),
+                                      np.zeros(0, dtype=np.int32),
+                                      np.zeros(0, dtype=np.int16))
+
+    def add_games(self, library, chunk_size=1000):
+        """Index the games of a library which are not indexed yet
+
+        :param library: sgf.Library or h5py.File
+        :param chunk_size: int      games merged into the tables at once
+        :return: int                number of games added
+        """
+        known = set(self.names)
+        names = [name for name in library
+                 if name not in known and int(library[name].attrs.get('SZ', 19)) == self.size]
+        for start in range(0, len(names), chunk_size):
+            entries = {table: [] for table in TABLES}
+            for name in names[start:start + chunk_size]:
+                game_id = len(self.names)
+                self.names.append(name)
+                for table, (hashes, moves) in game_entries(library[name]['gray'], self.corner_size).items():
+                    entries[table].append((hashes, np.full(len(hashes), game_id, dtype=np.int32),
+                                           moves.astype(np.int16)))
+            for table in TABLES:
+                if entries[table]:
+                    self._merge(table, [np.concatenate(column) for column in zip(*entries[table])])
+            self._save()
+        return len(names)
+
+    def _merge(self, table, new_columns):
+        """Merge new entries into a sorted table
+
+        :param table: str
+        :param new_columns: list    hashes, games, moves
+        """
+        order = np.argsort(new_columns[0], kind='stable')
+        new_columns = [column[order] for column in new_columns]
+        old_columns = [np.asarray(column) for column in self.tables[table]]
+        positions = np.searchsorted(old_columns[0], new_columns[0], side='right')
+        self.tables[table] = tuple(np.insert(old, positions, new)
+                                   for old, new in zip(old_columns, new_columns))
+
+    def _save(self):
+        """Write the tables and game names, replacing the old files whole"""
+        for table in TABLES:
+            for column, values in zip(COLUMNS, self.tables[table]):
+                temporary = self._file(table, column) + '.tmp.npy'
+                np.save(temporary, values)
+                os.replace(temporary, self._file(table, column))
+        with open(path.join(self.directory, 'games.json'), 'w') as games_file:
+            json.dump({'names': self.names, 'corner_size': self.corner_size, 'size': self.size},
+                      games_file)
+        self._load_tables()
+
+    def find_hash(self, position_hash, table='board'):
+        """Return the games and move numbers of a hash
+
+        :param position_hash: int
+        :param table: str           'board' or 'corner'
+        :return: list               [(game name, move number)]
+        """
+        hashes, games, moves = self.tables[table]
+        start = np.searchsorted(hashes, np.uint64(position_hash), side='left')
+        stop = np.searchsorted(hashes, np.uint64(position_hash), side='right')
+        return [(self.names[game], int(move)) for game, move in zip(games[start:stop], moves[start:stop])]
+
+    def find(self, state):
+        """Return the games passing through a whole board position, in any orientation
+
+        The move number is the number of moves played before the position.
+
+        :param state: go.Position
+        :return: list               [(game name, move number)]
+        """
+        board_hash, _ = zobrist.board_hashes([state.board._board_colour])
+        return self.find_hash(int(board_hash[0]))
+
+    def find_corner(self, state, corner=0):
+        """Return the games in which the stones of a corner first appeared in any corner
+
+        :param state: go.Position
+        :param corner: int          CORNERS index
+        :return: list               [(game name, move number)]
+        """
+        board = np.asarray(state.board._board_colour).reshape(1, state.size, state.size)
+        window = corner_windows(board, self.corner_size)[0, corner]
+        return self.find_hash(int(corner_hashes(window)), table='corner')
@@ -0,0 +1,284 @@
+"""Local patterns of the pro sgf Library
+
+The pattern of an intersection is the colours of the intersections around it, seen by
+the player to move: 0 open, 1 own, 2 opponent and 3 off the board.  Two shapes are
+used, the 3x3 square and the diamond of the intersections within two steps, and a
+pattern is coded as an integer with two bits per intersection.  The 3x3 code is the
+low 16 bits of the diamond code.  Codes are reduced to the least code of the eight
+symmetries of the pattern, so a shape has one code however it is turned.
+
+A PatternTable counts how often pros played on an open intersection of each pattern,
+and how often the pattern was on the board when they moved.  It gives the move priors
+of a search, and the pattern weights of playout.PatternPlayout.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from util import zobrist
+
+
+OFF_BOARD = 3
+# offsets (dy, dx) of the intersections of a pattern, the 3x3 square first
+SMALL = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+DIAMOND = SMALL + ((-2, 0), (0, -2), (0, 2), (2, 0))
+ORTHOGONAL = (1, 3, 4, 6)   # SMALL indexes of the four neighbours
+
+
+@lru_cache(maxsize=None)
+def neighbour_indexes(size, offsets=DIAMOND):
+    """Return the intersection at each offset of every intersection
+
+    Offsets off the board index size**2, where a board extended by an OFF_BOARD entry
+    has it.
+
+    :param size: int
+    :param offsets: tuple
+    :return: array      size**2 x len(offsets)
+    """
+    y, x = np.divmod(np.arange(size**2), size)
+    dy, dx = np.array(offsets).T
+    ny, nx = y[:, None] + dy, x[:, None] + dx
+    on_board = (0 <= ny) & (ny < size) & (0 <= nx) & (nx < size)
+    return np.where(on_board, nx + ny*size, size**2)
+
+
+@lru_cache(maxsize=None)
+def symmetry_permutations(offsets=DIAMOND):
+    """Return where each offset goes under the eight symmetries
+
+    :param offsets: tuple
+    :return: array      8 x len(offsets)
+    """
+    positions = {offset: idx for idx, offset in enumerate(offsets)}
+    permutations = []
+    for rotations in range(4):
+        for mirror in (False, True):
+            moved = []
+            for dy, dx in offsets:
+                for _ in range(rotations):
+                    dy, dx = dx, -dy
+                if mirror:
+                    dx = -dx
+                moved.append(positions[(dy, dx)])
+            permutations.append(moved)
+    return np.array(permutations)
+
+
+def pattern_codes(digits, size, offsets=DIAMOND):
+    """Return the pattern code of every intersection of boards
+
+    :param digits: array    N x size**2 of 0 open, 1 own, 2 opponent
+    :param size: int
+    :param offsets: tuple
+    :return: array          N x size**2 uint32 codes
+    """
+    digits = np.asarray(digits, dtype=np.uint32)
+    extended = np.concatenate([digits, np.full((len(digits), 1), OFF_BOARD, dtype=np.uint32)], axis=1)
+    shifts = 2*np.arange(len(offsets), dtype=np.uint32)
+    return (extended[:, neighbour_indexes(size, offsets)] << shifts).sum(axis=-1, dtype=np.uint32)
+
+
+def canonical_codes(codes, offsets=DIAMOND):
+    """Return the least code of the symmetries of each pattern
+
+    >>> int(canonical_codes(np.array([1 << 2*1]), SMALL)[0]) == int(canonical_codes(np.array([1 << 2*6]), SMALL)[0])
+    True
+
+    :param codes: array     uint32 codes
+    :param offsets: tuple
+    :return: array          uint32 codes
+    """
+    codes = np.asarray(codes, dtype=np.uint32)
+    shifts = 2*np.arange(len(offsets), dtype=np.uint32)
+    digits = (codes[..., None] >> shifts) & 3
+    permutations = symmetry_permutations(offsets)
+    symmetric = [(digits << (2*permutation).astype(np.uint32)).sum(axis=-1, dtype=np.uint32)
+                 for permutation in permutations]
+    return np.min(symmetric, axis=0)
+
+
+@lru_cache(maxsize=None)
+def small_canonical():
+    """Return the canonical code of every 3x3 code
+
+    :return: array      4**8 uint32 codes
+    """
+    return canonical_codes(np.arange(4**len(SMALL)), SMALL)
+
+
+def swap_colours(codes, length=len(SMALL)):
+    """Return the codes of the patterns seen by the other player
+
+    :param codes: array     uint32 codes
+    :param length: int      intersections in the pattern
+    :return: array
+    """
+    codes = np.asarray(codes, dtype=np.uint32)
+    shifts = 2*np.arange(length, dtype=np.uint32)
+    digits = (codes[..., None] >> shifts) & 3
+    swapped = np.choose(digits, [0, 2, 1, 3]).astype(np.uint32)
+    return (swapped << shifts).sum(axis=-1, dtype=np.uint32)
+
+
+def own_eye(codes):
+    """Return True for 3x3 codes of an intersection surrounded by own stones or the edge
+
+    :param codes: array     uint32 3x3 codes
+    :return: array          booleans
+    """
+    digits = (np.asarray(codes, dtype=np.uint32)[..., None] >> (2*np.array(ORTHOGONAL, dtype=np.uint32))) & 3
+    return ((digits == 1) | (digits == OFF_BOARD)).all(axis=-1)
+
+
+def relative_digits(boards, players):
+    """Return boards as the digits seen by the player to move
+
+    :param boards: array    N x size**2 colours
+    :param players: array   N colours to move
+    :return: array          N x size**2 of 0 open, 1 own, 2 opponent
+    """
+    relative = np.asarray(boards) * np.asarray(players)[:, None]
+    return np.where(relative == 1, 1, np.where(relative == -1, 2, 0))
+
+
+def _merge_counts(codes, counts, new_codes, new_counts):
+    """Add counts of codes to sorted code counts"""
+    codes, inverse = np.unique(np.concatenate([codes, new_codes]), return_inverse=True)
+    return codes, np.bincount(inverse, weights=np.concatenate([counts, new_counts]),
+                              minlength=len(codes)).astype(np.int64)
+
+
+class PatternTable:
+    """Move frequencies of canonical 3x3 and diamond patterns
+
+    :MIN_SEEN: int
+        times a diamond pattern must have been seen to be used instead of its 3x3 pattern.
+    :SMOOTHING: float
+        weight of the average play rate in the rate of a pattern.
+    :PRIOR_WEIGHT: int
+        simulations a pattern prior is worth in a search.
+    """
+    MIN_SEEN = 20
+    SMOOTHING = 10
+    PRIOR_WEIGHT = 10
+
+    def __init__(self, small_played, small_seen, diamond_codes, diamond_played, diamond_seen):
+        """
+        :param small_played: array      times a move was played on each 3x3 code
+        :param small_seen: array        times each 3x3 code was open when a move was played
+        :param diamond_codes: array     sorted canonical diamond codes seen
+        :param diamond_played: array    times a move was played on them
+        :param diamond_seen: array      times they were open when a move was played
+        """
+        self.small_played = np.asarray(small_played)
+        self.small_seen = np.asarray(small_seen)
+        self.diamond_codes = np.asarray(diamond_codes, dtype=np.uint32)
+        self.diamond_played = np.asarray(diamond_played)
+        self.diamond_seen = np.asarray(diamond_seen)
+
+    @classmethod
+    def build(cls, library, size=19, chunk_size=500):
+        """Count the patterns of the moves of the games of a library
+
+        :param library: sgf.Library or h5py.File
+        :param size: int            board size of the games used
+        :param chunk_size: int      games reduced at once
+        :return: PatternTable
+        """
+        small_played = np.zeros(4**len(SMALL), dtype=np.int64)
+        small_seen = np.zeros(4**len(SMALL), dtype=np.int64)
+        diamond = {'seen': (np.zeros(0, np.uint32), np.zeros(0, np.int64)),
+                   'played': (np.zeros(0, np.uint32), np.zeros(0, np.int64))}
+
+        names = [name for name in library if int(library[name].attrs.get('SZ', 19)) == size]
+        for start in range(0, len(names), chunk_size):
+            seen, played = [], []
+            for name in names[start:start + chunk_size]:
+                game = library[name]
+                moves = np.asarray(game['moves']).reshape(-1, 2)
+                moves = moves[moves[:, 0] < size**2]
+                if not len(moves):
+                    continue
+                boards = zobrist.gray_boards(game['gray'][:len(moves)])
+                digits = relative_digits(boards, moves[:, 1])
+                codes = pattern_codes(digits, size)
+                open_codes = codes[digits == 0]
+                played_codes = codes[np.arange(len(moves)), moves[:, 0]]
+
+                small_seen += np.bincount(small_canonical()[open_codes & 0xFFFF], minlength=len(small_seen))
+                small_played += np.bincount(small_canonical()[played_codes & 0xFFFF], minlength=len(small_played))
+                seen.append(canonical_codes(open_codes))
+                played.append(canonical_codes(played_codes))
+
+            for key, chunk in [('seen', seen), ('played', played)]:
+                if chunk:
+                    chunk_codes, chunk_counts = np.unique(np.concatenate(chunk), return_counts=True)
+                    diamond[key] = _merge_counts(*diamond[key], chunk_codes, chunk_counts)
+
+        codes, seen_counts = diamond['seen']
+        played_counts = np.zeros(len(codes), dtype=np.int64)
+        played_counts[np.searchsorted(codes, diamond['played'][0])] = diamond['played'][1]
+        return cls(small_played, small_seen, codes, played_counts, seen_counts)
+
+    @classmethod
+    def load(cls, file):
+        """Load a saved table
+
+        :param file: str    npz file
+        :return: PatternTable
+        """
+        with np.load(file) as table:
+            return cls(table['small_played'], table['small_seen'],
+                       table['diamond_codes'], table['diamond_played'], table['diamond_seen'])
+
+    def save(self, file):
+        """Save the table
+
+        :param file: str    npz file
+        """
+        np.savez(file, small_played=self.small_played, small_seen=self.small_seen,
+                 diamond_codes=self.diamond_codes, diamond_played=self.diamond_played,
+                 diamond_seen=self.diamond_seen)
+
+    def small_rates(self):
+        """Return the smoothed play rate of every 3x3 code
+
+        :return: array      4**8 floats, by canonical or plain code
+        """
+        average = self.small_played.sum() / max(self.small_seen.sum(), 1)
+        rates = (self.small_played + self.SMOOTHING*average) / (self.small_seen + self.SMOOTHING)
+        return rates[small_canonical()]
+
+    def rates(self, codes):
+        """Return the play rates of diamond codes, from their 3x3 code when rarely seen
+
+        :param codes: array     uint32 diamond codes, not necessarily canonical
+        :return: array          floats
+        """
+        rates = self.small_rates()[codes & 0xFFFF]
+        if len(self.diamond_codes):
+            canonical = canonical_codes(codes)
+            found = np.minimum(np.searchsorted(self.diamond_codes, canonical), len(self.diamond_codes) - 1)
+            known = (self.diamond_codes[found] == canonical) & (self.diamond_seen[found] >= self.MIN_SEEN)
+            rates[known] = self.diamond_played[found[known]] / self.diamond_seen[found[known]]
+        return rates
+
+    def priors(self, state):
+        """Return the pattern priors of the open intersections of a position
+
+        The prior win rate of a move is its pattern play rate over the best of the
+        position, worth PRIOR_WEIGHT simulations.
+
+        :param state: go.Position
+        :return: dict       {move: (win rate, weight)}
+        """
+        digits = relative_digits([state.board._board_colour], [state.next_player])
+        codes = pattern_codes(digits, state.size)[0]
+        moves = np.flatnonzero(digits[0] == 0)
+        moves = moves[~own_eye(codes[moves] & 0xFFFF)]
+        if not len(moves):
+            return {}
+        rates = self.rates(codes[moves])
+        rates = rates / max(rates.max(), np.finfo(float).tiny)
+        return {int(move): (float(rate), self.PRIOR_WEIGHT) for move, rate in zip(moves, rates)}
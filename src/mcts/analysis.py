@@ -0,0 +1,184 @@
+"""Persistent background analysis
+
+An AnalysisWorker is a long lived search process.  Positions are sent to it over a
+command pipe, and it keeps searching the latest one, publishing the scores to a
+snapshot.ScoreSnapshot.  The search tree is kept between positions, so when a new
+position follows from the last by a move or two, the search carries on from the
+matching subtree instead of starting again.  With a cache file, the statistics of every
+position left are cached, so going back to a position carries on its search too.  With
+a node budget, the tree is pruned to it, so the worker can search indefinitely.  With a
+checkpoint file, the tree is saved every checkpoint interval and when the worker quits,
+and a restarted worker carries on from the saved tree when its position comes again.
+
+It needs no GUI:
+
+    worker = AnalysisWorker(size=19)
+    worker.analyse(position)
+    ...
+    worker.scores()
+    worker.stop()
+"""
+from multiprocessing import Event, Pipe, Process
+import os
+import time
+
+from mcts import mcts
+from mcts.budget import NodeBudget
+from mcts.cache import AnalysisCache
+from mcts.checkpoint import load_tree, save_tree
+from mcts.snapshot import ScoreSnapshot
+
+
+def analysis_loop(commands, snapshot, sim_limit=None, publish_interval=0.1, cache_file=None,
+                  node_budget=None, checkpoint_file=None, checkpoint_interval=60, idle=None):
+    """Search the latest position received until told to quit
+
+    Commands are tuples:
+        ('position', go.Position)   search a new position
+        ('pause',)                  stop searching until the next position
+        ('quit',)                   end the loop
+
+    :param commands: multiprocessing.Connection    receiving end of the command pipe
+    :param snapshot: ScoreSnapshot                  where the scores are published
+    :param sim_limit: int           simulations per position, None -> no limit
+    :param publish_interval: float  seconds between snapshots
+    :param cache_file: str          sqlite file of a cache.AnalysisCache, None -> no cache
+    :param node_budget: int         most nodes of the search tree, None -> no limit
+    :param checkpoint_file: str     npz file the search tree is saved to, None -> no checkpoints
+    :param checkpoint_interval: float   seconds between checkpoints
+    :param idle: multiprocessing.Event      set whenever the search stops, None -> no event
+    """
+    cache = None if cache_file is None else AnalysisCache(cache_file)
+    budget = None if node_budget is None else NodeBudget(capacity=node_budget)
+    saved = None
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+        try:
+            saved = load_tree(checkpoint_file, budget=budget)
+        except (OSError, ValueError, KeyError):   # unreadable, or of other nodes
+            saved = None
+    rootnode = None
+    searching = False
+    last_publish = last_checkpoint = time.time()
+
+    while True:
+        if commands.poll(None if not searching else 0):
+            command = commands.recv()
+            if cache is not None and rootnode is not None and rootnode.sims:
+                cache.store(rootnode)
+            if command[0] == 'quit':
+                if checkpoint_file is not None and rootnode is not None:
+                    save_tree(rootnode, checkpoint_file)
+                if cache is not None:
+                    cache.close()
+                return
+            elif command[0] == 'pause':
+                searching = False
+                if idle is not None:
+                    idle.set()
+            elif command[0] == 'position':
+                state = command[1]
+                reused = None if rootnode is None else mcts.subtree(rootnode, state)
+                if reused is None and saved is not None:
+                    reused = mcts.subtree(saved, state)
+                saved = None
+                if reused is None and cache is not None:
+                    reused = cache.restore(state, budget=budget)
+                rootnode = reused if reused is not None else mcts.NodeMCTS(state=state, budget=budget)
+                searching = True
+                snapshot.publish(rootnode)
+                last_publish = time.time()
+            continue
+
+        if sim_limit is not None and rootnode.sims >= sim_limit:   # a reused root may start there
+            snapshot.publish(rootnode)
+            searching = False
+            if idle is not None:
+                idle.set()
+            continue
+
+        mcts.search_step(rootnode)
+
+        if time.time() - last_publish >= publish_interval:
+            snapshot.publish(rootnode)
+            last_publish = time.time()
+        if checkpoint_file is not None and time.time() - last_checkpoint >= checkpoint_interval:
+            save_tree(rootnode, checkpoint_file)
+            last_checkpoint = time.time()
+
+
+class AnalysisWorker:
+    """Long lived analysis process with a command channel
+
+    >>> worker = AnalysisWorker(size=9)
+    """
+    def __init__(self, size=19, sim_limit=None, publish_interval=0.1, cache_file=None, node_budget=None,
+                 checkpoint_file=None):
+        """
+        :param size: int                board size
+        :param sim_limit: int           simulations per position, None -> until the next one
+        :param publish_interval: float  seconds between snapshots
+        :param cache_file: str          sqlite file caching the searches, None -> no cache
+        :param node_budget: int         most nodes of the search tree, None -> no limit
+        :param checkpoint_file: str     npz file the search tree is saved to, None -> no checkpoints
+        """
+        self.snapshot = ScoreSnapshot(size=size)
+        self.idle = Event()
+        receiver, self._commands = Pipe(duplex=False)
+        self.process = Process(target=analysis_loop,
+                               args=(receiver, self.snapshot, sim_limit, publish_interval, cache_file,
+                                     node_budget, checkpoint_file),
+                               kwargs={'idle': self.idle},
+                               daemon=True)
+
+    def start(self):
+        """Start the worker process"""
+        if not self.process.is_alive():
+            self.process.start()
+
+    def analyse(self, state):
+        """Switch the search to a new position
+
+        The worker is started if it is not running.
+
+        :param state: go.Position
+        """
+        self.start()
+        self.idle.clear()
+        self._commands.send(('position', state))
+
+    def pause(self):
+        """Stop searching until the next position"""
+        self._commands.send(('pause',))
+
+    def wait(self, timeout=None):
+        """Wait for the search of the latest position to reach the simulation limit, or pause
+
+        :param timeout: float   seconds, None -> wait for ever
+        :return: boolean        False if it timed out
+        """
+        return self.idle.wait(timeout)
+
+    def stop(self, timeout=1):
+        """End the worker process
+
+        :param timeout: float   seconds to wait before terminating the process
+        """
+        if self.process.is_alive():
+            self._commands.send(('quit',))
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+
+    def read(self):
+        """Return the latest snapshot
+
+        :return: dict       see ScoreSnapshot.read
+        """
+        return self.snapshot.read()
+
+    def scores(self):
+        """Return the latest root child scores
+
+        :return: dict       {name: score}
+        """
+        return self.snapshot.scores()
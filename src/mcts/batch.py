@@ -0,0 +1,242 @@
+"""Batch analysis of collections of games
+
+Every position of every game is searched across a pool of processes, and each move is
+scored by how much it changed the win rate of its player.  The results of a game are
+checkpointed to their own npz file as soon as the game is done, so an interrupted run
+resumes with the games left, and the checkpoints are gathered into one h5 file of
+columns, one row per move:
+
+    game        index into the names dataset
+    move        move number, from 0
+    colour      1 black, -1 white
+    point       move played, -1 for a pass
+    best        move the search preferred
+    winrate     win rate of the player before the move
+    loss        win rate the move lost its player
+    blunder     loss of at least the blunder threshold
+
+Games come from an sgf directory or a Library query:
+
+    batch = BatchAnalysis('tournament', sim_limit=2000)
+    batch.run(sgf_jobs('sgfs/tournament'))
+    results = read_results(batch.results_file)
+"""
+from copy import deepcopy
+import hashlib
+from multiprocessing import Pool
+import os
+from os import path
+
+import h5py
+import numpy as np
+from thick_goban import go
+
+from mcts import mcts
+import sgf
+
+
+COLUMNS = ('move', 'colour', 'point', 'best', 'winrate', 'loss', 'blunder')
+
+
+def sgf_jobs(directory):
+    """Yield the games of the sgf files in a directory tree
+
+    Files which do not parse are skipped.
+
+    :param directory: str
+    :yield: dict        sgf.sgf_str_to_game output
+    """
+    for file_path, sgf_str in sgf.store(sgf_direc=directory):
+        try:
+            yield sgf.sgf_str_to_game(sgf_str, sgf_name=file_path)
+        except ValueError:
+            continue
+
+
+def library_point(point, size):
+    """Convert a point numbered on a 19x19 board, as a Library stores it, to a board size
+
+    >>> library_point(80, 9), library_point(380, 9)
+    (40, None)
+
+    :param point: int
+    :param size: int
+    :return: int        None for a pass, or a point off the board
+    """
+    x, y = point % 19, point // 19
+    return x + y*size if x < size and y < size else None
+
+
+def library_jobs(library, where=None):
+    """Yield the games of a Library matching a query
+
+    Setup stones off the board are left out, and moves off the board are passes.
+
+    :param library: sgf.Library or h5py.File
+    :param where: callable      True for the sgf attributes of games to analyse, None -> all
+    :yield: dict                name, size, komi, setup and moves, None for a pass
+    """
+    for name in library:
+        game = library[name]
+        attributes = dict(game.attrs)
+        if where is not None and not where(attributes):
+            continue
+        size = int(attributes.get('SZ', 19))
+        setup = np.asarray(game['setup']).reshape(-1, 2) if 'setup' in game else np.zeros((0, 2), dtype=int)
+        setup = [(library_point(int(point), size), int(colour)) for point, colour in setup]
+        yield {'name': name,
+               'size': size,
+               'komi': float(attributes.get('KM', 6.5)),
+               'setup': [stone for stone in setup if stone[0] is not None],
+               'moves': [(library_point(int(point), size), int(colour))
+                         for point, colour in np.asarray(game['moves']).reshape(-1, 2)],
+               }
+
+
+def black_winrate(state, colour, sim_limit):
+    """Search a position with colour to move
+
+    :param state: go.Position
+    :param colour: int
+    :param sim_limit: int
+    :return: (float, int)   black win rate, best move or -1
+    """
+    state = deepcopy(state)
+    state.next_player = colour
+    rootnode = mcts.search(mcts.NodeMCTS(state=state), sim_limit=sim_limit)
+    try:
+        best = rootnode.bestchild()
+    except ValueError:  # no moves left
+        best = -1
+    winrate = 1 - rootnode.wins / max(rootnode.sims, 1)
+    return (winrate if colour == go.BLACK else 1 - winrate), best
+
+
+def analyse_game(game, sim_limit=1000, blunder=0.2):
+    """Search every position of a game and score its moves
+
+    The game stops at a move the rules do not allow.  A move of None, or off the board,
+    is a pass.
+
+    :param game: dict           name, size, komi, setup and moves
+    :param sim_limit: int       simulations per position
+    :param blunder: float       loss of a blunder
+    :return: dict               COLUMNS arrays
+    """
+    position = go.Position(setup=game['setup'], size=game['size'], komi=game['komi'])
+    rows, black_rates = [], []
+    for number, (point, colour) in enumerate(game['moves']):
+        if point is not None and not 0 <= point < game['size']**2:
+            point = None
+        rate, best = black_winrate(position, colour, sim_limit)
+        black_rates.append(rate)
+        rows.append((number, colour, -1 if point is None else point, best))
+        if point is None:
+            position.next_player = -colour
+            continue
+        try:
+            position.move(move_pt=point, colour=colour)
+        except go.MoveError:
+            rows.pop()
+            black_rates.pop()
+            break
+    if rows:
+        black_rates.append(black_winrate(position, -rows[-1][1], sim_limit)[0])
+
+    numbers, colours, points, bests = np.array(rows, dtype=int).reshape(-1, 4).T
+    black_rates = np.array(black_rates, dtype=float)
+    winrates = np.where(colours == go.BLACK, black_rates[:-1], 1 - black_rates[:-1])
+    losses = colours * (black_rates[:-1] - black_rates[1:])
+    return {'move': numbers, 'colour': colours, 'point': points, 'best': bests,
+            'winrate': winrates, 'loss': losses, 'blunder': losses >= blunder}
+
+
+def _analyse_job(args):
+    """Analyse a game in a worker process
+
+    :return: (str, dict)    game name, analyse_game columns
+    """
+    game, sim_limit, blunder = args
+    return game['name'], analyse_game(game, sim_limit=sim_limit, blunder=blunder)
+
+
+class BatchAnalysis:
+    """Analysis of many games, checkpointed per game in a folder
+
+    >>> import tempfile
+    >>> BatchAnalysis(tempfile.mkdtemp(), sim_limit=10).run([])
+    0
+    """
+    def __init__(self, folder, sim_limit=1000, blunder=0.2, processes=None):
+        """
+        :param folder: str          checkpoints and results file
+        :param sim_limit: int       simulations per position
+        :param blunder: float       loss of a blunder
+        :param processes: int       worker processes, None -> one per cpu
+        """
+        self.folder = folder
+        self.checkpoints = path.join(folder, 'games')
+        self.results_file = path.join(folder, 'results.h5')
+        self.sim_limit = sim_limit
+        self.blunder = blunder
+        self.processes = processes
+        os.makedirs(self.checkpoints, exist_ok=True)
+
+    def checkpoint(self, name):
+        """Return the checkpoint file of a game
+
+        :param name: str
+        :return: str
+        """
+        return path.join(self.checkpoints, hashlib.md5(name.encode('utf-8')).hexdigest() + '.npz')
+
+    def run(self, jobs):
+        """Analyse the games without checkpoints, then write the results file
+
+        :param jobs: iterable       games, see sgf_jobs and library_jobs
+        :return: int                games analysed in this run
+        """
+        todo = [(game, self.sim_limit, self.blunder) for game in jobs
+                if not path.exists(self.checkpoint(game['name']))]
+        analysed = 0
+        if todo:
+            with Pool(processes=self.processes) as pool:
+                for name, columns in pool.imap_unordered(_analyse_job, todo):
+                    temporary = self.checkpoint(name) + '.tmp.npz'
+                    np.savez(temporary, name=name, **columns)
+                    os.replace(temporary, self.checkpoint(name))
+                    analysed += 1
+        self.collect()
+        return analysed
+
+    def collect(self):
+        """Gather the checkpoints into the results file"""
+        names, columns = [], {column: [] for column in COLUMNS}
+        for file_name in sorted(os.listdir(self.checkpoints)):
+            if not file_name.endswith('.npz') or file_name.endswith('.tmp.npz'):
+                continue
+            with np.load(path.join(self.checkpoints, file_name)) as game:
+                names.append(str(game['name']))
+                for column in COLUMNS:
+                    columns[column].append(game[column])
+
+        games = [np.full(len(moves), idx, dtype=int) for idx, moves in enumerate(columns['move'])]
+        with h5py.File(self.results_file, 'w') as results:
+            results.create_dataset('names', data=np.array(names, dtype=h5py.string_dtype()))
+            results.create_dataset('game', data=np.concatenate(games) if games else np.zeros(0, dtype=int))
+            for column in COLUMNS:
+                values = np.concatenate(columns[column]) if columns[column] else np.zeros(0)
+                results.create_dataset(column, data=values)
+
+
+def read_results(results_file):
+    """Read a results file into memory
+
+    :param results_file: str
+    :return: dict       names list and column arrays
+    """
+    with h5py.File(results_file, 'r') as results:
+        columns = {column: results[column][()] for column in ('game',) + COLUMNS}
+        columns['names'] = [name.decode('utf-8') if isinstance(name, bytes) else name
+                            for name in results['names'][()]]
+    return columns
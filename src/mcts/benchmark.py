@@ -0,0 +1,124 @@
+"""Strength per simulation of search variants
+
+A challenger node class plays a baseline node class from fixed 9x9 test positions, both
+searching the same number of simulations a move, and taking each colour in turn.  The
+challenger win rate at equal simulations is the strength its changes gain, such as
+progressive widening against the plain NodeMCTS:
+
+    python -m mcts.benchmark [sim_limit] [games per position and colour]
+"""
+from copy import deepcopy
+import sys
+
+from thick_goban import go
+
+from mcts import mcts
+
+
+TEST_POSITIONS = {'empty': [],
+                  'tengen': [40],
+                  'corners': [20, 60, 24, 56],
+                  'contact': [40, 41, 31, 49, 50, 39],
+                  }
+
+
+class WideningNodeMCTS(mcts.NodeMCTS):
+    """NodeMCTS with progressive widening"""
+    WIDENING = 0.4
+
+
+def search_move(node_class, state, sim_limit):
+    """Return the move a search of a node class chooses, None if it finds none
+
+    :param node_class: NodeMCTS class
+    :param state: go.Position
+    :param sim_limit: int
+    :return: int
+    """
+    rootnode = mcts.search(node_class(state=deepcopy(state)), sim_limit=sim_limit)
+    try:
+        candidates = [rootnode.bestchild()]
+    except ValueError:  # no children nor AMAF totals
+        candidates = []
+    candidates += sorted(rootnode.children, key=lambda name: -rootnode.children[name].sims)
+    for move_pt in candidates:
+        try:
+            deepcopy(state).move(move_pt=move_pt)
+        except go.MoveError:
+            continue
+        return move_pt
+    return None
+
+
+def play(position, black, white, sim_limit, move_limit=None, white_sim_limit=None):
+    """Play a game on from a position between two node classes
+
+    :param position: go.Position
+    :param black: NodeMCTS class
+    :param white: NodeMCTS class
+    :param sim_limit: int       simulations per move
+    :param move_limit: int      None -> 3 moves per intersection
+    :param white_sim_limit: int simulations per white move, None -> sim_limit
+    :return: int                winning colour
+    """
+    state = deepcopy(position)
+    players = {go.BLACK: black, go.WHITE: white}
+    sim_limits = {go.BLACK: sim_limit, go.WHITE: sim_limit if white_sim_limit is None else white_sim_limit}
+    passes = 0
+    for _ in range(3*state.size**2 if move_limit is None else move_limit):
+        colour = state.next_player
+        move_pt = search_move(players[colour], state, sim_limits[colour])
+        if move_pt is None:
+            passes += 1
+            state.next_player = -colour
+            if passes == 2:
+                break
+        else:
+            passes = 0
+            state.move(move_pt=move_pt)
+    return state.winner()
+
+
+def benchmark(challenger=WideningNodeMCTS, baseline=mcts.NodeMCTS, sim_limit=200, games=2,
+              positions=None, move_limit=None, size=9, komi=7.5, baseline_sim_limit=None):
+    """Return the challenger wins from each test position
+
+    A baseline_sim_limit below the sim_limit makes the baseline a fixed weaker opponent,
+    so the win rates of more challenger simulations show the strength they gain.
+
+    :param challenger: NodeMCTS class
+    :param baseline: NodeMCTS class
+    :param sim_limit: int       simulations per move of the challenger, and the baseline by default
+    :param games: int           games per position and colour
+    :param positions: dict      {name: moves played in turn from black}, None -> TEST_POSITIONS
+    :param move_limit: int      moves per game
+    :param size: int
+    :param komi: float
+    :param baseline_sim_limit: int  simulations per move of the baseline, None -> sim_limit
+    :return: dict               {name: (challenger wins, games)}
+    """
+    if baseline_sim_limit is None:
+        baseline_sim_limit = sim_limit
+    results = {}
+    for name, moves in (TEST_POSITIONS if positions is None else positions).items():
+        position = go.Position(size=size, komi=komi)
+        for move_pt in moves:
+            position.move(move_pt=move_pt)
+        wins = 0
+        for _ in range(games):
+            wins += play(position, challenger, baseline, sim_limit, move_limit,
+                         white_sim_limit=baseline_sim_limit) == go.BLACK
+            wins += play(position, baseline, challenger, baseline_sim_limit, move_limit,
+                         white_sim_limit=sim_limit) == go.WHITE
+        results[name] = (wins, 2*games)
+    return results
+
+
+if __name__ == '__main__':
+    sim_limit = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    games = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    results = benchmark(sim_limit=sim_limit, games=games)
+    for name, (wins, played) in results.items():
+        print('{:10} {:3} / {:3}'.format(name, wins, played))
+    total_wins, total_games = (sum(column) for column in zip(*results.values()))
+    print('widening win rate at {} simulations: {:.2f}'.format(sim_limit, total_wins / total_games))
@@ -0,0 +1,111 @@
+"""Node memory budget of a search tree
+
+Every node holds a Position and its AMAF counters, so a long search grows the tree
+until the process runs out of memory.  A NodeBudget given to a root NodeMCTS is passed
+down to every node of its tree, counting them.  When the count reaches the capacity,
+search_step prunes the tree: the lowest visited subtrees below the root children are
+collapsed into the AMAF totals of their move at the parent, and their nodes are kept on
+free lists, one per node class and board size, from which new nodes are recycled.  A collapsed move stays a candidate of
+its parent, at the win rate of its collapsed simulations, and becomes a node again when
+it is selected, so the search carries on indefinitely within the budget.
+
+    rootnode = NodeMCTS(state=state, budget=NodeBudget(capacity=50000))
+"""
+
+
+class NodeBudget:
+    """Counter and free lists of the nodes of a search tree
+
+    >>> budget = NodeBudget(capacity=100)
+    >>> budget.full()
+    False
+    """
+    # fraction of the capacity kept by a prune
+    PRUNE_TO = 0.75
+
+    def __init__(self, capacity=100000):
+        """
+        :param capacity: int    most nodes of the tree
+        """
+        self.capacity = capacity
+        self.count = 1      # the root
+        self.free = {}      # {(node class, points): [nodes]}
+        self.pruned = 0
+
+    def full(self):
+        """
+        :return: boolean    True when the tree has as many nodes as the capacity
+        """
+        return self.count >= self.capacity
+
+    def new_node(self, node_class, state, **kwargs):
+        """Return a node for a state, recycled from the free list of its class and board size
+
+        :param node_class: NodeMCTS class
+        :param state: go.Position   None -> built from the parent state and name when used
+        :param kwargs: more node arguments, such as prior_policy, playout, name and parent
+        :return: NodeMCTS
+        """
+        self.count += 1
+        points = len(kwargs['parent'].ownership) if state is None else len(state.board._board_colour)
+        free = self.free.get((node_class, points))
+        if free:
+            node = free.pop()
+            node.reuse(state, budget=self, **kwargs)
+            return node
+        return node_class(state=state, budget=self, **kwargs)
+
+    def release(self, node):
+        """Put the nodes of a detached subtree on the free list
+
+        :param node: NodeMCTS
+        :return: int    the number of nodes released
+        """
+        released = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.children.values())
+            node.children.clear()
+            node.parent = None
+            node.state = None
+            self.free.setdefault((type(node), len(node.ownership)), []).append(node)
+            released += 1
+        return released
+
+    def prune(self, rootnode):
+        """Collapse the lowest visited subtrees until the tree is within PRUNE_TO of the capacity
+
+        The tree is counted first, as nodes may have left it when a subtree became a
+        root.  Nodes with at most as many simulations as the pruned nodes are all pruned,
+        and the root and its children never are.
+
+        :param rootnode: NodeMCTS
+        :return: int    the number of nodes pruned
+        """
+        candidates = []
+        count = 1
+        level, depth = list(rootnode.children.values()), 1
+        while level:
+            count += len(level)
+            if depth >= 2:
+                candidates.extend((node, depth) for node in level)
+            level = [child for node in level for child in node.children.values()]
+            depth += 1
+        self.count = count
+        excess = count - int(self.capacity * self.PRUNE_TO)
+        if not self.full() or excess <= 0 or not candidates:
+            return 0
+
+        sims = sorted(node.sims for node, _ in candidates)
+        threshold = sims[min(excess, len(sims)) - 1]
+        pruned = 0
+        for node, depth in candidates:   # parents come before their children
+            if node.sims > threshold or node.parent is None:    # kept, or already released
+                continue
+            if depth == 2 or node.parent.sims > threshold:
+                node.parent.collapse(node.name)
+                pruned += self.release(node)
+        self.count -= pruned
+        self.pruned += pruned
+        return pruned
@@ -0,0 +1,230 @@
+"""Cache of search results keyed by position
+
+The statistics of a search root, its simulations, wins, AMAF totals, ownership and
+the simulations and wins of its children, are stored under the canonical zobrist hash
+of the position, its komi and the tuning parameters of the node class.  A later search
+of the position, or of any rotation or reflection of it, starts from a root rebuilt
+from them and carries on, instead of starting from nothing.
+
+The most recent entries are kept in memory, and all entries are written to an sqlite
+file, each store bounded by a number of entries with the least recently used evicted.
+
+    cache = AnalysisCache('analysis.sqlite')
+    rootnode = cache.restore(state) or NodeMCTS(state=state)
+    ...
+    cache.store(rootnode)
+"""
+from collections import OrderedDict
+from copy import deepcopy
+import io
+import sqlite3
+import time
+
+import numpy as np
+from thick_goban import go
+
+from mcts.mcts import NodeMCTS
+from util import symmetry, zobrist
+
+
+def node_params(node_class):
+    """Return the tuning parameters of a node class as a string
+
+    :param node_class: NodeMCTS class
+    :return: str
+    """
+    return '{}:{}:{}:{}:{}'.format(node_class.__name__, node_class.CONFIDENCE_ALG, node_class.AMAF_LIMIT,
+                                   node_class.WIDENING, node_class.WIDENING_START)
+
+
+def encode(stats):
+    """Pack statistics arrays into bytes
+
+    :param stats: dict      arrays
+    :return: bytes
+    """
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **stats)
+    return buffer.getvalue()
+
+
+def decode(blob):
+    """Unpack statistics arrays from bytes
+
+    :param blob: bytes
+    :return: dict       arrays
+    """
+    with np.load(io.BytesIO(blob)) as stats:
+        return {name: stats[name] for name in stats.files}
+
+
+class AnalysisCache:
+    """Least recently used cache of search root statistics with an sqlite store
+
+    >>> cache = AnalysisCache(capacity=2)
+    >>> cache.restore(go.Position(size=9)) is None
+    True
+    """
+    def __init__(self, file=None, capacity=1000, disk_capacity=100000, params=''):
+        """
+        :param file: str            sqlite file, None -> memory only
+        :param capacity: int        entries kept in memory
+        :param disk_capacity: int   entries kept in the file
+        :param params: str          more search parameters to key on, such as the playout
+        """
+        self.capacity = capacity
+        self.disk_capacity = disk_capacity
+        self.params = params
+        self.memory = OrderedDict()
+        self._touched = {}      # {key: time} of file reads not yet written
+        self.db = None
+        if file is not None:
+            self.db = sqlite3.connect(file)
+            self.db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, stats BLOB, used REAL)')
+            self.db.commit()
+
+    def __len__(self):
+        """Return the number of entries in memory
+
+        :return: int
+        """
+        return len(self.memory)
+
+    def close(self):
+        """Write the pending read times, and close the sqlite file"""
+        if self.db is not None:
+            self._write_touched()
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def key(self, state, node_class=NodeMCTS):
+        """Return the key of a position and the symmetry to its canonical board
+
+        :param state: go.Position
+        :param node_class: NodeMCTS class
+        :return: (str, int)
+        """
+        position_hash, sym = zobrist.position_hash(state)
+        key = '{:016x}:{}:{}:{}:{}'.format(position_hash, state.size, state.komi,
+                                           node_params(node_class), self.params)
+        return key, sym
+
+    def get(self, key):
+        """Return the statistics of a key, from memory or the file
+
+        :param key: str
+        :return: dict       None if the key is not cached
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.db is None:
+            return None
+        row = self.db.execute('SELECT stats FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self._touched[key] = time.time()
+        stats = decode(row[0])
+        self._remember(key, stats)
+        return stats
+
+    def put(self, key, stats):
+        """Cache the statistics of a key in memory and the file
+
+        :param key: str
+        :param stats: dict      arrays
+        """
+        self._remember(key, stats)
+        if self.db is None:
+            return
+        self._touched.pop(key, None)
+        self._write_touched()
+        self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?)', (key, encode(stats), time.time()))
+        excess = self.db.execute('SELECT COUNT(*) FROM results').fetchone()[0] - self.disk_capacity
+        if excess > 0:
+            self.db.execute('DELETE FROM results WHERE key IN '
+                            '(SELECT key FROM results ORDER BY used LIMIT ?)', (excess,))
+        self.db.commit()
+
+    def _write_touched(self):
+        """Write the read times of the file entries, for the next eviction or commit
+
+        Reads are not committed on their own, which would cost a sync of the file every
+        cache hit.
+        """
+        if self._touched:
+            self.db.executemany('UPDATE results SET used = ? WHERE key = ?',
+                                [(used, key) for key, used in self._touched.items()])
+            self._touched = {}
+
+    def _remember(self, key, stats):
+        """Keep statistics in memory, evicting the least recently used"""
+        self.memory[key] = stats
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def store(self, rootnode):
+        """Cache the statistics of a search root
+
+        :param rootnode: NodeMCTS
+        """
+        key, sym = self.key(rootnode.state, type(rootnode))
+        size = rootnode.state.size
+        indexes = symmetry.dihedral_indexes(size)[sym]
+        inverse = symmetry.inverse_indexes(indexes)
+
+        children = list(rootnode.children.values())
+        amaf = [move for move in rootnode.amaf_sims if move is not None and 0 <= move < size**2]
+        self.put(key, {'totals': np.array([rootnode.sims, rootnode.wins], dtype=float),
+                       'ownership': rootnode.ownership[indexes],
+                       'child_moves': inverse[np.array([child.name for child in children], dtype=int)],
+                       'child_totals': np.array([(child.sims, child.wins) for child in children],
+                                                dtype=float).reshape(-1, 2),
+                       'amaf_moves': inverse[np.array(amaf, dtype=int)],
+                       'amaf_totals': np.array([(rootnode.amaf_rates[move], rootnode.amaf_sims[move])
+                                                for move in amaf], dtype=float).reshape(-1, 2),
+                       })
+
+    def restore(self, state, node_class=NodeMCTS, **kwargs):
+        """Rebuild a search root of a position from its cached statistics
+
+        The root and its children get their cached totals, so a search carries on from
+        them.  Children which are no longer legal moves are left out.  A position which
+        is its own reflection may get the children of its reflection, which are worth
+        the same.
+
+        :param state: go.Position
+        :param node_class: NodeMCTS class
+        :param kwargs: more node arguments, such as prior_policy, playout and budget
+        :return: NodeMCTS       None if the position is not cached
+        """
+        key, sym = self.key(state, node_class)
+        stats = self.get(key)
+        if stats is None:
+            return None
+        indexes = symmetry.dihedral_indexes(state.size)[sym]
+        inverse = symmetry.inverse_indexes(indexes)
+
+        budget = kwargs.pop('budget', None)
+        rootnode = node_class(state=state, budget=budget, **kwargs)
+        rootnode.sims, rootnode.wins = int(stats['totals'][0]), stats['totals'][1]
+        rootnode.ownership = stats['ownership'][inverse].astype(np.int32)
+        for move, (rate, sims) in zip(indexes[stats['amaf_moves']], stats['amaf_totals']):
+            rootnode.amaf_rates[int(move)] = rate
+            rootnode.amaf_sims[int(move)] = int(sims)
+        for move, (sims, wins) in zip(indexes[stats['child_moves']], stats['child_totals']):
+            child_state = deepcopy(state)
+            try:
+                child_state.move(move_pt=int(move))
+            except go.MoveError:
+                continue
+            if budget is None:
+                child = node_class(state=child_state, **kwargs)
+            else:
+                child = budget.new_node(node_class, state=child_state, **kwargs)
+            child.sims, child.wins = int(sims), wins
+            child.parent = rootnode
+            rootnode.children[child.name] = child
+        return rootnode
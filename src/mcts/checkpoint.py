@@ -0,0 +1,139 @@
+"""Save and load search trees as flat arrays
+
+A tree is written to an uncompressed npz file in breadth first order, with one entry
+per node in each of the node arrays:
+
+    parents     index of the parent node, -1 for the root
+    names       move into the node, -1 for a pass, and for the root
+    sims, wins  search totals
+    ownership   ownership sums, one row per node
+
+and the AMAF totals of all the nodes in compressed sparse row arrays, amaf_offsets
+giving where the moves, rates and sims of each node start.  No Position is pickled: the
+root is stored as its stones, and the state of every other node is rebuilt from its
+parent state and move the first time it is used.  A stored root loses the ko and
+history of its game, so a caller knowing the root position passes it to load_tree.
+
+Loading a tree of millions of simulations is a few array reads and a loop creating the
+nodes, so a long analysis can be resumed, or moved to another machine:
+
+    save_tree(rootnode, 'analysis.npz')
+    ...
+    rootnode = load_tree('analysis.npz')
+    mcts.search(rootnode, sim_limit=rootnode.sims + 100000)
+"""
+from collections import Counter
+import os
+
+import numpy as np
+from thick_goban import go
+
+from mcts.mcts import NodeMCTS, same_position
+
+
+def tree_arrays(rootnode):
+    """Return the flat arrays of a search tree
+
+    :param rootnode: NodeMCTS
+    :return: dict       arrays
+    """
+    state = rootnode.state
+    points = state.size**2
+    nodes, parents = [rootnode], [-1]
+    index = 0
+    while index < len(nodes):
+        nodes.extend(nodes[index].children.values())
+        parents.extend([index] * len(nodes[index].children))
+        index += 1
+
+    amaf_moves, amaf_rates, amaf_sims, amaf_offsets = [], [], [], [0]
+    for node in nodes:
+        moves = [move for move in node.amaf_sims if move is not None and 0 <= move < points]
+        amaf_moves.extend(moves)
+        amaf_rates.extend(node.amaf_rates[move] for move in moves)
+        amaf_sims.extend(node.amaf_sims[move] for move in moves)
+        amaf_offsets.append(len(amaf_moves))
+
+    return {'parents': np.array(parents, dtype=np.int32),
+            'names': np.array([-1 if node.name is None or node is rootnode else node.name
+                               for node in nodes], dtype=np.int32),
+            'sims': np.array([node.sims for node in nodes], dtype=np.int64),
+            'wins': np.array([node.wins for node in nodes], dtype=np.float64),
+            'ownership': np.array([node.ownership for node in nodes], dtype=np.int32).reshape(-1, points),
+            'amaf_offsets': np.array(amaf_offsets, dtype=np.int64),
+            'amaf_moves': np.array(amaf_moves, dtype=np.int32),
+            'amaf_rates': np.array(amaf_rates, dtype=np.float64),
+            'amaf_sims': np.array(amaf_sims, dtype=np.int64),
+            'board': np.array(state.board._board_colour, dtype=np.int8),
+            'root': np.array([state.size, state.komi, state.next_player], dtype=np.float64),
+            'node_class': np.array(type(rootnode).__name__),
+            }
+
+
+def save_tree(rootnode, file):
+    """Write a search tree to an npz file
+
+    The file is written next to its final name and then renamed, so a checkpoint is
+    never left half written.
+
+    :param rootnode: NodeMCTS
+    :param file: str
+    """
+    temp_file = file + '.tmp'
+    with open(temp_file, 'wb') as tree_file:
+        np.savez(tree_file, **tree_arrays(rootnode))
+    os.replace(temp_file, file)
+
+
+def load_tree(file, state=None, node_class=NodeMCTS, **kwargs):
+    """Read a search tree from an npz file
+
+    :param file: str
+    :param state: go.Position   the root position, None -> rebuilt from the stored stones
+    :param node_class: NodeMCTS class of the saved tree
+    :param kwargs: more node arguments, such as prior_policy, playout and budget
+    :raises: ValueError if the tree is of another node class or state is another position
+    :return: NodeMCTS   the root node
+    """
+    with np.load(file) as arrays:
+        arrays = {name: arrays[name] for name in arrays.files}
+    if str(arrays['node_class']) != node_class.__name__:
+        raise ValueError('The tree is of ' + str(arrays['node_class']) + ' nodes')
+
+    size, komi, next_player = arrays['root']
+    stored = go.Position(setup=[(int(pt), int(colour)) for pt, colour in enumerate(arrays['board']) if colour],
+                         size=int(size), komi=komi)
+    stored.next_player = int(next_player)
+    if state is None:
+        state = stored
+    elif not same_position(state, stored):
+        raise ValueError('The tree is of another position')
+
+    parents = arrays['parents'].tolist()
+    names = [None if name < 0 else name for name in arrays['names'].tolist()]
+    sims, wins = arrays['sims'].tolist(), arrays['wins'].tolist()
+    ownership = arrays['ownership']
+    offsets = arrays['amaf_offsets'].tolist()
+    amaf_moves = arrays['amaf_moves'].tolist()
+    amaf_rates, amaf_sims = arrays['amaf_rates'].tolist(), arrays['amaf_sims'].tolist()
+
+    budget = kwargs.pop('budget', None)
+    rootnode = node_class(state=state, budget=budget, **kwargs)
+    nodes = []
+    for index, parent in enumerate(parents):
+        if parent < 0:
+            node = rootnode
+        else:
+            parent = nodes[parent]
+            if budget is None:
+                node = node_class(state=None, name=names[index], parent=parent, **kwargs)
+            else:
+                node = budget.new_node(node_class, state=None, name=names[index], parent=parent, **kwargs)
+            parent.children[node.name] = node
+        start, end = offsets[index], offsets[index + 1]
+        node.sims, node.wins = sims[index], wins[index]
+        node.ownership[:] = ownership[index]
+        node.amaf_rates.update(dict(zip(amaf_moves[start:end], amaf_rates[start:end])))
+        node.amaf_sims.update(dict(zip(amaf_moves[start:end], amaf_sims[start:end])))
+        nodes.append(node)
+    return rootnode
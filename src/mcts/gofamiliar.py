@@ -1,8 +1,3 @@
-
-# Don't use multiprocessing.queue.Queue
-# http://stackoverflow.com/questions/24941359/ctx-parameter-in-multiprocessing-queue
-from multiprocessing import Queue, Process
-
 import matplotlib.pyplot as plt
 from kivy.app import App
 from kivy.clock import Clock
@@ -15,7 +10,7 @@ from kivy.uix.gridlayout import GridLayout
 from kivy.uix.image import Image
 from thick_goban import go
 
-import mcts
+from mcts.analysis import AnalysisWorker
 from sgf import parse_to_thick_goban
 
 
@@ -27,7 +22,7 @@ class GoFamiliarApp(App):
         analysis = self.root.ids['_analysis_panel']
         board = analysis.ids['_analysis_board']
         analysis_grid = board.ids['_analysis_grid']
-        analysis_grid.analysis_process.terminate()
+        analysis_grid.analysis.stop()
 
 
 class GoFamiliar(BoxLayout):
@@ -151,16 +146,33 @@ class AnalysisButtonGrid(GridLayout):
     heat_cmap = plt.get_cmap('cool')
 
     def update_board_overlay(self, dt):
-        current_state = self.analysis_queue.get()
+        """Redraw the overlay from the latest analysis scores
+
+        The analysis snapshot is read without blocking the main thread, and only when
+        it has changed.  Intersections whose score has not changed are not redrawn.
+        """
+        if self.analysis.snapshot.seq == self.drawn_seq:
+            return
+        self.drawn_seq = self.analysis.snapshot.seq
+        current_state = self.analysis.scores()
+
         for inter in self.intersectionlist:
-            if inter.intersection_id in current_state:
-                inter.stone_image.canvas.after.clear()
+            inter_id = inter.intersection_id
+            if inter_id not in current_state and inter_id not in self.drawn_scores:
+                continue
+            inter_score = current_state.get(inter_id, 0)
+            if self.drawn_scores.get(inter_id, 0) == inter_score:
+                continue
+
+            inter.stone_image.canvas.after.clear()
+            if inter_score != 0:
+                self.drawn_scores[inter_id] = inter_score
                 with inter.stone_image.canvas.after:
-                    inter_score = current_state[inter.intersection_id]
-                    if inter_score != 0:
-                        r, g, b, a = self.heat_cmap(inter_score)
-                        Color(r, g, b, inter_score)
-                        Rectangle(pos=inter.pos, size=inter.size)
+                    r, g, b, a = self.heat_cmap(inter_score)
+                    Color(r, g, b, inter_score)
+                    Rectangle(pos=inter.pos, size=inter.size)
+            else:
+                del self.drawn_scores[inter_id]
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -169,14 +181,13 @@ class AnalysisButtonGrid(GridLayout):
 
         self.state = go.Position()
         self.intersectionlist = []
+        self.drawn_scores = {}
+        self.drawn_seq = None
 
-        Clock.schedule_interval(self.update_board_overlay, .05)
+        self.analysis = AnalysisWorker(size=19, sim_limit=10000, node_budget=50000)
+        self.analysis.analyse(self.state)
 
-        # Idea to use queue came from here
-        # https://pymotw.com/2/multiprocessing/communication.html
-        self.analysis_queue = Queue()
-        self.analysis_process = Process(target=mcts.gof_move_search, args=(self.analysis_queue, self.state, 10000))
-        self.analysis_process.start()
+        Clock.schedule_interval(self.update_board_overlay, .05)
 
     def on_gamestate(self, instance, value):
 
@@ -191,12 +202,10 @@ class AnalysisButtonGrid(GridLayout):
             instance.lastmove.circle = circle_values(instance)
             instance.lastmove.width = instance.width * 0.05
 
-        self.analysis_process.terminate()
-        self.analysis_queue = Queue()
-        self.analysis_process = Process(target=mcts.gof_move_search, args=(self.analysis_queue, self.state, 10000))
-        self.analysis_process.start()
+        self.analysis.analyse(self.state)
 
         #Logger.info('Board state: ' + str(value))
+        self.drawn_scores = {}
         for inter in self.intersectionlist:
             inter.stone_image.canvas.after.clear()
 
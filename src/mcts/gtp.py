@@ -0,0 +1,371 @@
+"""Go Text Protocol front-end for the MCTS engine
+
+Run it with
+    python -m mcts.gtp [sim_limit] [book.npz]
+
+and register the command with a GTP controller, such as gogui-twogtp, to play other
+engines.  Moves are searched with mcts.search for the time budget of the time settings,
+or for sim_limit simulations when there are none.  The search tree is kept across
+turns, so the part of it under the moves played is reused by the next genmove.  With an
+opening book, book moves are played without a search, and the book priors guide the
+searches of the positions it knows.  When pondering, the tree below our move is
+searched until the next command arrives, so the opponent's time is used too.
+"""
+from copy import deepcopy
+import inspect
+import sys
+
+from thick_goban import go
+
+from corpus.book import OpeningBook
+from mcts import mcts
+from sgf import parse_to_thick_goban
+
+
+COLUMNS = 'ABCDEFGHJKLMNOPQRSTUVWXYZ'   # GTP skips I
+COLOURS = {'b': go.BLACK, 'black': go.BLACK, 'w': go.WHITE, 'white': go.WHITE}
+
+
+class GTPError(Exception):
+    """A command failure reported to the controller"""
+
+
+def parse_vertex(vertex, size):
+    """Convert a GTP vertex to a point
+
+    Row 1 is the bottom row of the board, and point 0 is the top left corner.
+
+    >>> parse_vertex('A19', 19), parse_vertex('T1', 19), parse_vertex('pass', 19)
+    (0, 360, None)
+
+    :param vertex: str
+    :param size: int
+    :return: int        None for a pass
+    """
+    vertex = vertex.upper()
+    if vertex == 'PASS':
+        return None
+    try:
+        x = COLUMNS.index(vertex[0])
+        row = int(vertex[1:])
+    except ValueError:
+        raise GTPError('invalid vertex')
+    if not (x < size and 1 <= row <= size):
+        raise GTPError('invalid vertex')
+    return x + (size - row)*size
+
+
+def format_vertex(move_pt, size):
+    """Convert a point to a GTP vertex
+
+    >>> format_vertex(0, 19), format_vertex(80, 9), format_vertex(None, 9)
+    ('A19', 'J1', 'pass')
+
+    :param move_pt: int     None for a pass
+    :param size: int
+    :return: str
+    """
+    if move_pt is None:
+        return 'pass'
+    return COLUMNS[move_pt % size] + str(size - move_pt // size)
+
+
+def parse_colour(colour):
+    """Convert a GTP colour to a player
+
+    :param colour: str
+    :return: int
+    """
+    try:
+        return COLOURS[colour.lower()]
+    except KeyError:
+        raise GTPError('invalid color')
+
+
+class GTPEngine:
+    """GTP engine state: the game, the time settings and the search tree
+
+    >>> engine = GTPEngine(size=9, sim_limit=10)
+    >>> engine.handle('1 boardsize 9')
+    '=1'
+    >>> engine.handle('play b E5')
+    '='
+    >>> engine.handle('play w E5')
+    '? illegal move'
+    """
+    NAME = 'GoFamiliar'
+    VERSION = '0.1'
+    PROTOCOL_VERSION = 2
+    # resign when the win rate of the root is below RESIGN_RATE after RESIGN_SIMS
+    RESIGN_RATE = 0.05
+    RESIGN_SIMS = 500
+    # main time is shared between at least MIN_MOVES_LEFT moves, and a safety margin kept
+    MIN_MOVES_LEFT = 20
+    TIME_MARGIN = 0.9
+    # fewest simulations of a move searched on time, even with no time left
+    MIN_SIMS = 50
+    # most simulations of a pondered tree
+    PONDER_SIMS = 100000
+
+    def __init__(self, size=19, komi=6.5, sim_limit=1000, book=None, ponder=False):
+        """
+        :param size: int
+        :param komi: float
+        :param sim_limit: int       simulations per move without time settings
+        :param book: OpeningBook    or None
+        :param ponder: boolean      True -> search during the opponent's turn
+        """
+        self.size = size
+        self.komi = komi
+        self.sim_limit = sim_limit
+        self.book = book
+        self.ponderer = mcts.Ponderer(sim_limit=self.PONDER_SIMS) if ponder else None
+        self.time_settings = None
+        self.time_left = {}
+        self.running = False
+        self.commands = {name[4:]: getattr(self, name) for name in dir(self)
+                         if name.startswith('cmd_')}
+        self.clear()
+
+    def clear(self):
+        """Start a new game on an empty board"""
+        self.state = go.Position(size=self.size, komi=self.komi)
+        self.moves = 0
+        self.rootnode = None
+
+    def handle(self, line):
+        """Run a command line and return the response, without the closing blank line
+
+        :param line: str
+        :return: str    None if the line has no command
+        """
+        line = ''.join(char for char in line.split('#')[0]
+                       if char >= ' ' or char in '\t\n').replace('\t', ' ')
+        words = line.split()
+        if not words:
+            return None
+
+        cmd_id = ''
+        if words[0].isdigit():
+            cmd_id = words.pop(0)
+        if not words:
+            return '?' + cmd_id + ' missing command'
+
+        try:
+            command = self.commands[words[0]]
+        except KeyError:
+            return '?' + cmd_id + ' unknown command'
+        if self.ponderer is not None:
+            self.ponderer.stop()    # the tree is the engine's again
+        try:
+            inspect.signature(command).bind(*words[1:])
+        except TypeError:   # wrong number of arguments
+            return '?' + cmd_id + ' syntax error'
+        try:
+            result = command(*words[1:])
+        except GTPError as err:
+            return '?' + cmd_id + ' ' + str(err)
+
+        return '=' + cmd_id + ('' if result is None else ' ' + str(result))
+
+    def run(self, instream=sys.stdin, outstream=sys.stdout):
+        """Answer commands until quit or the end of the input
+
+        :param instream: file
+        :param outstream: file
+        """
+        self.running = True
+        for line in instream:
+            response = self.handle(line)
+            if response is None:
+                continue
+            outstream.write(response + '\n\n')
+            outstream.flush()
+            if not self.running:
+                break
+        if self.ponderer is not None:
+            self.ponderer.stop()
+
+    def play(self, colour, move_pt):
+        """Play a move, and keep the part of the search tree below it
+
+        :param colour: int
+        :param move_pt: int     None for a pass
+        """
+        if move_pt is None:
+            self.state.next_player = -colour
+            self.rootnode = None
+        else:
+            try:
+                self.state.move(move_pt=move_pt, colour=colour)
+            except go.MoveError:
+                raise GTPError('illegal move')
+            if self.rootnode is not None:
+                self.rootnode = mcts.subtree(self.rootnode, self.state, depth=1)
+        self.moves += 1
+
+    def move_time(self, colour):
+        """Return the seconds to search a move for, from the time settings
+
+        A search on time always runs at least MIN_SIMS simulations, so a move with no
+        time left is still searched.
+
+        :param colour: int
+        :return: float      None without a time limit
+        """
+        if self.time_settings is None:
+            return None
+        main_time, byo_yomi_time, byo_yomi_stones = self.time_settings
+        if byo_yomi_time > 0 and byo_yomi_stones == 0:     # no time limit
+            return None
+        if main_time == byo_yomi_time == 0:     # 0 0 0, taken as no time limit too
+            return None
+
+        time_left, stones = self.time_left.get(colour, (main_time, 0))
+        if stones > 0:      # in byo yomi
+            budget = time_left / stones
+        else:
+            moves_left = max(self.MIN_MOVES_LEFT, self.size**2 // 3 - self.moves // 2)
+            budget = time_left / moves_left
+            if byo_yomi_stones > 0:
+                budget += byo_yomi_time / byo_yomi_stones
+        return max(0.0, budget*self.TIME_MARGIN)
+
+    def genmove(self, colour):
+        """Search for a move and play it
+
+        :param colour: int
+        :return: int    move, None for a pass, or 'resign'
+        """
+        if self.state.next_player != colour:
+            self.state.next_player = colour
+            self.rootnode = None
+        if self.book is not None:
+            move_pt = self.book.move(self.state)
+            if move_pt is not None:
+                self.play(colour, move_pt)
+                return move_pt
+        if self.rootnode is None:
+            self.rootnode = mcts.NodeMCTS(state=deepcopy(self.state),
+                                          prior_policy=None if self.book is None else self.book.priors)
+
+        time_limit = self.move_time(colour)
+        if time_limit is None:
+            mcts.search(self.rootnode, sim_limit=self.rootnode.sims + self.sim_limit)
+        else:
+            mcts.search(self.rootnode, time_limit=time_limit)
+            if self.rootnode.sims < self.MIN_SIMS:
+                mcts.search(self.rootnode, sim_limit=self.MIN_SIMS)
+
+        root = self.rootnode
+        if root.sims >= self.RESIGN_SIMS and 1 - root.wins/root.sims < self.RESIGN_RATE:
+            return 'resign'
+
+        try:
+            candidates = [root.bestchild()]
+        except ValueError:  # no children nor AMAF totals
+            candidates = []
+        candidates += sorted(root.children, key=lambda name: -root.children[name].sims)
+        for move_pt in candidates:
+            try:
+                self.play(colour, move_pt)
+            except GTPError:
+                continue
+            return move_pt
+
+        self.play(colour, None)
+        return None
+
+    def cmd_protocol_version(self):
+        return self.PROTOCOL_VERSION
+
+    def cmd_name(self):
+        return self.NAME
+
+    def cmd_version(self):
+        return self.VERSION
+
+    def cmd_known_command(self, command):
+        return 'true' if command in self.commands else 'false'
+
+    def cmd_list_commands(self):
+        return '\n'.join(sorted(self.commands))
+
+    def cmd_quit(self):
+        self.running = False
+
+    def cmd_boardsize(self, size):
+        try:
+            size = int(size)
+        except ValueError:
+            raise GTPError('syntax error')
+        if not 2 <= size <= len(COLUMNS):
+            raise GTPError('unacceptable size')
+        self.size = size
+        self.clear()
+
+    def cmd_clear_board(self):
+        self.clear()
+
+    def cmd_komi(self, komi):
+        try:
+            self.komi = float(komi)
+        except ValueError:
+            raise GTPError('syntax error')
+        self.state.komi = self.komi
+        self.rootnode = None    # the scores are for the old komi
+
+    def cmd_play(self, colour, vertex):
+        self.play(parse_colour(colour), parse_vertex(vertex, self.size))
+
+    def cmd_genmove(self, colour):
+        move_pt = self.genmove(parse_colour(colour))
+        if move_pt == 'resign':
+            return move_pt
+        if self.ponderer is not None:
+            if self.rootnode is None:
+                self.rootnode = mcts.NodeMCTS(state=deepcopy(self.state),
+                                              prior_policy=None if self.book is None else self.book.priors)
+            self.ponderer.start(self.rootnode)
+        return format_vertex(move_pt, self.size)
+
+    def cmd_time_settings(self, main_time, byo_yomi_time, byo_yomi_stones):
+        try:
+            self.time_settings = (float(main_time), float(byo_yomi_time), int(byo_yomi_stones))
+        except ValueError:
+            raise GTPError('syntax error')
+        self.time_left = {}
+
+    def cmd_time_left(self, colour, time_left, stones):
+        try:
+            self.time_left[parse_colour(colour)] = (float(time_left), int(stones))
+        except ValueError:
+            raise GTPError('syntax error')
+
+    def cmd_loadsgf(self, filename, move_number=None):
+        try:
+            move_limit = None if move_number is None else int(move_number) - 1
+            state = parse_to_thick_goban(filename, move_limit=move_limit)
+        except (OSError, ValueError, KeyError):
+            raise GTPError('cannot load file')
+        self.state = state
+        self.size = state.size
+        self.komi = state.komi
+        # the stones on the board stand in for the moves played, for the time budget
+        self.moves = sum(colour != go.OPEN for colour in state.board._board_colour)
+        self.rootnode = None
+
+    def cmd_showboard(self):
+        symbols = {go.BLACK: 'X', go.WHITE: 'O', go.OPEN: '.'}
+        colours = self.state.board._board_colour
+        rows = ['   ' + ' '.join(COLUMNS[:self.size])]
+        for y in range(self.size):
+            row = ' '.join(symbols[colours[x + y*self.size]] for x in range(self.size))
+            rows.append('{:>2} {}'.format(self.size - y, row))
+        return '\n' + '\n'.join(rows)
+
+
+if __name__ == '__main__':
+    GTPEngine(sim_limit=int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+              book=OpeningBook.load(sys.argv[2]) if len(sys.argv) > 2 else None,
+              ponder=True).run()
@@ -8,8 +8,12 @@ It is based on the basic algorithm shown in "A Survey of Monte Carlo Tree Search
 from copy import deepcopy
 from math import sqrt, log
 from collections import Counter
+import threading
+import time
 
+import numpy as np
 from thick_goban import go
+from mcts.budget import NodeBudget
 from util import tree
 
 
@@ -17,32 +21,87 @@ class NodeMCTS(tree.Node):
     """
     A node of MC search tree
 
-    Two algorithm tuning parameters are defined at the class level.
+    Algorithm tuning parameters are defined at the class level.
     :CONFIDENCE_ALG: boolean
         Interpolates between usual confidence algorithm and AMAF.
         False means do not use confidence term.
         True means use it and do not use AMAF term, so the AMAF_LIMIT is ignored.
     :AMAF_LIMIT: int
         the number of MCTS simulations before the normal win rate term takes over for scoring.
+    :WIDENING: float
+        progressive widening exponent, 0 for none.  A node may have WIDENING_START children,
+        and one more each time sims**WIDENING reaches a whole number, before which only the
+        children compete in bestchild.  New children are the best candidates by blended
+        AMAF rate and prior.
+    :WIDENING_START: int
+        children allowed before any simulations when widening.
+
+    Every node also sums the final ownership of each intersection over its simulations,
+    black as 1 and white as -1, for the ownership map and expected score.
+
+    A prior_policy, passed down from the root to every node, is a callable returning the
+    priors of a state, {move: (win rate, weight)}, such as OpeningBook.priors.  A prior
+    counts as weight simulations at its win rate in both the AMAF and win rate terms of
+    the child score, and moves with priors are candidates for selection before they are
+    simulated.  A playout, passed down the same way, replaces Position.random_playout in
+    the simulations, such as a playout.PatternPlayout.  So does a stats.SearchStats, which
+    records the timing of the search phases, and a budget.NodeBudget, which bounds the
+    number of nodes of the tree and recycles them.
     """
     CONFIDENCE_ALG = False
     AMAF_LIMIT = 20
+    WIDENING = 0
+    WIDENING_START = 2
 
-    def __init__(self, state, name=None, children=None):
+    def __init__(self, state, name=None, children=None, prior_policy=None, playout=None, stats=None,
+                 budget=None, parent=None):
         """
         Initialize a MCTS node object
+
+        A node with a parent may be made without a state, given the move into it as its
+        name, and builds the state when it is first used.
         """
-        if name is None:
+        if name is None and state is not None:
             self.name = state.lastmove
         else:
             self.name = name
-        self.state = state
+        self._state = state
         self.wins = 0
         self.sims = 0
         self.amaf_rates = Counter()
         self.amaf_sims = Counter()
+        points = len(parent.ownership) if state is None else len(state.board._board_colour)
+        self.ownership = np.zeros(points, dtype=np.int32)
+        self.prior_policy = prior_policy
+        self.playout = playout
+        self.stats = stats
+        self.budget = budget
+        self._priors = None
         super(NodeMCTS, self).__init__(children=children)
         self.children = {}
+        self.parent = parent
+
+    @property
+    def state(self):
+        """
+        The game state of the node
+
+        A node made with a parent and no state, as the nodes of a loaded tree are,
+        rebuilds it from the parent state and its move when first used.  A move of None
+        is a pass.
+        """
+        if self._state is None and self.parent is not None:
+            state = deepcopy(self.parent.state)
+            if self.name is None:
+                state.next_player = -state.next_player
+            else:
+                state.move(move_pt=self.name)
+            self._state = state
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        self._state = state
 
     def __repr__(self):
         """
@@ -59,23 +118,89 @@ class NodeMCTS(tree.Node):
         """
         return self.state.next_player
 
+    @property
+    def priors(self):
+        """
+        Return the priors of the moves from this node, computed on first use
+
+        :return: dict {move: (win rate, weight)}
+        """
+        if self._priors is None:
+            self._priors = {} if self.prior_policy is None else self.prior_policy(self.state)
+        return self._priors
+
     def new_child(self, move_pt=None):
         """
         Add a new child node and play it out
         """
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
         new_state = deepcopy(self.state)
         if move_pt is None:
             new_state.random_move(tried=self.children.keys())
         else:
             new_state.move(move_pt=move_pt)
 
-        child = NodeMCTS(state=new_state)
+        if self.budget is None:
+            child = type(self)(state=new_state, prior_policy=self.prior_policy, playout=self.playout,
+                               stats=stats)
+        else:
+            child = self.budget.new_node(type(self), state=new_state, prior_policy=self.prior_policy,
+                                         playout=self.playout, stats=stats)
         child.parent = self
         self.children[child.name] = child
+        if stats is not None:
+            stats.record('expansion', time.perf_counter() - start)
+            stats.count('nodes')
 
         child.random_sim()
         return child
 
+    def reuse(self, state, name=None, prior_policy=None, playout=None, stats=None, budget=None,
+              parent=None):
+        """
+        Reset a released node for a new state, keeping its counters and arrays
+
+        :param state: go.Position   None -> built from the parent state and name when used
+        :param name: the move into the node, None -> the last move of the state
+        :param prior_policy, playout, stats, budget, parent: as for a new node
+        """
+        if name is None and state is not None:
+            self.name = state.lastmove
+        else:
+            self.name = name
+        self.state = state
+        self.prior_policy = prior_policy
+        self.playout = playout
+        self.stats = stats
+        self.budget = budget
+        self.wins = 0
+        self.sims = 0
+        self.amaf_rates.clear()
+        self.amaf_sims.clear()
+        self.ownership[:] = 0
+        self._priors = None
+        self.children.clear()
+        self.parent = parent
+
+    def collapse(self, name):
+        """
+        Remove a child, and add its simulations to the AMAF totals of its move
+
+        The child wins count for the player to move here, as the AMAF rates do, so the
+        move keeps its win rate as a candidate of bestchild.
+
+        :param name: int
+        :return: NodeMCTS   the removed child
+        """
+        child = self.children.pop(name)
+        amaf_sims = self.amaf_sims[name]
+        self.amaf_sims[name] = amaf_sims + child.sims
+        self.amaf_rates[name] = (self.amaf_rates[name]*amaf_sims + child.wins) / (amaf_sims + child.sims)
+        child.parent = None
+        return child
+
     def random_sim(self):
         """
         Randomly simulate from the game state to a terminal state
@@ -116,18 +241,35 @@ class NodeMCTS(tree.Node):
             nonlocal self
             self.sims += 1
             self.wins += abs(result - self.colour)/2
+            self.ownership += owners
             root = self
             while root.parent is not None:
                 root = root.parent
                 root.sims += 1
                 root.wins += abs(result - root.colour)/2
+                root.ownership += owners
 
             update_children(node=root, moves=moves)
 
-        terminal_state, moves = self.state.random_playout()
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
+        if self.playout is None:
+            terminal_state, moves = self.state.random_playout()
+        else:
+            terminal_state, moves = self.playout(self.state)
+        if stats is not None:
+            played = time.perf_counter()
+            stats.record('playout', played - start)
         result = terminal_state.winner()
+        owners = terminal_ownership(terminal_state)
+        if stats is not None:
+            scored = time.perf_counter()
+            stats.record('scoring', scored - played)
 
         update_tree(moves=moves, result=result)
+        if stats is not None:
+            stats.record('backprop', time.perf_counter() - scored)
 
         return terminal_state
 
@@ -140,6 +282,7 @@ class NodeMCTS(tree.Node):
         w = self.wins
         n = self.sims
         N = self.parent.sims
+        prior_rate, prior_weight = self.parent.priors.get(self.name, (0, 0))
 
         if self.CONFIDENCE_ALG:
             rate_balancer = 0
@@ -149,13 +292,45 @@ class NodeMCTS(tree.Node):
                 ar = self.parent.amaf_rates[self.name]
             except KeyError:
                 ar = 0
+            if prior_weight:    # the prior counts as AMAF simulations too
+                an = self.parent.amaf_sims[self.name]
+                ar = (ar*an + prior_rate*prior_weight) / (an + prior_weight)
             rate_balancer = max(0, ((self.AMAF_LIMIT + 1 - n) / (self.AMAF_LIMIT + 1)))
             explore_term = rate_balancer * ar
 
-        win_rate_term = (1 - rate_balancer) * (w + 1) / (n + 1)
+        win_rate_term = (1 - rate_balancer) * (w + 1 + prior_rate*prior_weight) / (n + 1 + prior_weight)
 
         return win_rate_term + explore_term
 
+    def ownership_map(self):
+        """
+        Return the expected final ownership of each intersection
+
+        1 is certainly black, -1 certainly white.
+
+        :return: numpy.array    size by size float
+        """
+        size = self.state.size
+        return (self.ownership / max(self.sims, 1)).reshape(size, size)
+
+    def expected_score(self):
+        """
+        Return the mean area score of the simulations, positive when black is ahead
+
+        :return: float
+        """
+        if not self.sims:
+            return 0.0
+        return self.ownership.sum() / self.sims - self.state.komi
+
+    def child_limit(self):
+        """
+        Return the number of children progressive widening allows the node
+
+        :return: int
+        """
+        return self.WIDENING_START + int(self.sims ** self.WIDENING)
+
     def bestchild(self):
         """
         Find the child name with the highest score
@@ -172,42 +347,235 @@ class NodeMCTS(tree.Node):
             scores = dict(self.amaf_rates)
         else:
             scores = {}
+        for move, (prior_rate, prior_weight) in self.priors.items():
+            amaf_sims = self.amaf_sims[move] if move in scores else 0
+            if amaf_sims + prior_weight:
+                prior_rate = (scores.get(move, 0)*amaf_sims + prior_rate*prior_weight) / (amaf_sims + prior_weight)
+            scores[move] = prior_rate
+        if self.WIDENING and len(self.children) >= self.child_limit():
+            scores = {}
         for child in self.children.values():
             scores[child.name] = child.score()
         return max(scores, key=lambda x: scores[x])
 
 
+def terminal_ownership(state):
+    """Return the owner of every intersection of a finished game
+
+    Stones belong to their colour, and empty intersections to the colour of their
+    neighbours when only one colour touches them.
+
+    :param state: go.Position
+    :return: numpy.array    int8 of 1 black, -1 white, 0 neither, one per intersection
+    """
+    board = np.array(state.board._board_colour, dtype=np.int8).reshape(state.size, state.size)
+    padded = np.pad(board, 1)
+    neighbours = np.stack([padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:]])
+    black = (neighbours == go.BLACK).any(axis=0)
+    white = (neighbours == go.WHITE).any(axis=0)
+    empty = board == go.OPEN
+
+    owners = board.copy()
+    owners[empty & black & ~white] = go.BLACK
+    owners[empty & white & ~black] = go.WHITE
+    return owners.ravel()
+
+
 def treepolicy(root):
     """Simulate a select node using MCTS with AMAF
 
     :param root: NodeMCTS
     """
     node = root
+    stats = root.stats
+    selection = 0.0
+    depth = 0
+
+    try:
+        while True:
+            if stats is not None:
+                start = time.perf_counter()
+            try:
+                bestchildname = node.bestchild()
+            except ValueError:  # no children nor AMAF totals
+                bestchildname = None
+            if stats is not None:
+                selection += time.perf_counter() - start
+            if bestchildname is None:
+                node.new_child()
+                break
 
-    while True:
-        try:
-            bestchildname = node.bestchild()
-        except ValueError:  # no children nor AMAF totals
-            node.new_child()
-            break
+            try:
+                node = node.children[bestchildname]
+            except KeyError:  # selected child is not a node yet
+                pass
+            else:
+                depth += 1
+                continue
 
-        try:
-            node = node.children[bestchildname]
-        except KeyError:  # selected child is not a node yet
-            pass
-        else:
-            continue
+            try:
+                node = node.new_child(move_pt=bestchildname)
+            except go.MoveError:  # bad move from AMAF or the priors
+                node.amaf_rates.pop(bestchildname, None)
+                node.amaf_sims.pop(bestchildname, None)
+                node.priors.pop(bestchildname, None)
+                if stats is not None:
+                    stats.count('move_errors')
+            else:
+                break
+    finally:
+        if stats is not None:
+            stats.record('selection', selection)
+            stats.depths[depth] += 1
+
+
+def search_step(rootnode):
+    """Run one simulation of the search from the root node
+
+    The tree is pruned when it fills the node budget of the root, if any.
+
+    :param rootnode: NodeMCTS
+    """
+    try:
+        treepolicy(rootnode)
+    except go.MoveError:    # hit a terminal position
+        if rootnode.stats is not None:
+            rootnode.stats.count('terminal')
+        rootnode.random_sim()   # run another simulation to mix up all the totals.
+    if rootnode.budget is not None and rootnode.budget.full():
+        rootnode.budget.prune(rootnode)
+
+
+def same_position(state, other):
+    """Return True if two states have the same stones and player to move
+
+    :param state: go.Position
+    :param other: go.Position
+    :return: boolean
+    """
+    return (state.next_player == other.next_player
+            and list(state.board._board_colour) == list(other.board._board_colour))
 
-        try:
-            node = node.new_child(move_pt=bestchildname)
-        except go.MoveError:  # bad move from AMAF
-            del node.amaf_rates[bestchildname]
-            del node.amaf_sims[bestchildname]
-        else:
+
+def subtree(rootnode, state, depth=2):
+    """Find the node of a search tree for a state, and make it a root
+
+    Nodes up to depth moves below the root are searched, so the tree of a search can be
+    reused after the moves of both players.  The found node is detached from its parent,
+    and the rest of the tree can be garbage collected.
+
+    :param rootnode: NodeMCTS
+    :param state: go.Position
+    :param depth: int
+    :return: NodeMCTS   None if no node has the state
+    """
+    level = [rootnode]
+    for _ in range(depth + 1):
+        for node in level:
+            if same_position(node.state, state):
+                node.parent = None
+                return node
+        level = [child for node in level for child in node.children.values()]
+    return None
+
+
+def search(rootnode, sim_limit=None, time_limit=None):
+    """Search from a root node, which may already hold the tree of an earlier search
+
+    The search ends when the root node has sim_limit simulations, or after time_limit
+    seconds, whichever comes first.  The stats of the root node, if any, count the steps
+    and dump their periodic reports.
+
+    :param rootnode: NodeMCTS
+    :param sim_limit: int       None -> no limit
+    :param time_limit: float    seconds, None -> no limit
+    :return: NodeMCTS           the root node
+    """
+    if sim_limit is None and time_limit is None:
+        raise ValueError('A search needs a simulation or time limit')
+    if time_limit is not None:
+        finish = time.time() + time_limit
+    stats = rootnode.stats
+
+    while sim_limit is None or rootnode.sims < sim_limit:
+        if time_limit is not None and time.time() >= finish:
             break
+        search_step(rootnode)
+        if stats is not None:
+            stats.step(rootnode)
+
+    return rootnode
+
 
+class Ponderer:
+    """Search on a background thread while the opponent is thinking
 
-def move_search(state, sim_limit=1000):
+    After our move, ponder on the tree below it.  When the opponent's move arrives,
+    respond promotes the subtree of the new position, which the search of our next move
+    carries on from.
+
+    >>> ponderer = Ponderer()
+    >>> ponderer.stop() is None
+    True
+    """
+    def __init__(self, sim_limit=None):
+        """
+        :param sim_limit: int   most simulations a pondered root reaches, None -> no limit
+        """
+        self.sim_limit = sim_limit
+        self.rootnode = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def pondering(self):
+        """
+        :return: boolean    True while the background search runs
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, rootnode):
+        """Start pondering on a tree
+
+        :param rootnode: NodeMCTS   root of the position after our move
+        """
+        self.stop()
+        self.rootnode = rootnode
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._ponder, daemon=True)
+        self._thread.start()
+
+    def _ponder(self):
+        while not self._stop.is_set():
+            if self.sim_limit is not None and self.rootnode.sims >= self.sim_limit:
+                break
+            search_step(self.rootnode)
+
+    def stop(self):
+        """Stop pondering, waiting for the simulation in progress
+
+        :return: NodeMCTS   the pondered root, None if there is none
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.rootnode
+
+    def respond(self, state, depth=1):
+        """Stop pondering, and return the subtree of the position after the opponent's move
+
+        :param state: go.Position
+        :param depth: int       moves below the pondered root searched for the position
+        :return: NodeMCTS       None if the position was not in the tree
+        """
+        rootnode = self.stop()
+        self.rootnode = None
+        return None if rootnode is None else subtree(rootnode, state, depth=depth)
+
+
+def move_search(state, sim_limit=1000, time_limit=None, book=None, prior_policy=None, playout=None,
+                stats=None):
     """Find a good move in a Go game
 
     This is the main function of the MCTS algorithm.
@@ -217,20 +585,28 @@ def move_search(state, sim_limit=1000):
 
     :param rootnode: root node with starting state
     :param sim_limit: int
+    :param time_limit: float seconds before a move is returned, None -> no limit
+    :param book: OpeningBook replying at once in known positions, or None
+    :param prior_policy: callable returning move priors of states, see NodeMCTS
+    :param playout: callable playing states out, see NodeMCTS
+    :param stats: stats.SearchStats filled in with the phase timings and tree shape, or None
     :return: action
     """
-    rootnode = NodeMCTS(state=state)
+    if book is not None:
+        book_move = book.move(state)
+        if book_move is not None:
+            return book_move
 
-    while rootnode.sims < sim_limit:
-        try:
-            treepolicy(rootnode)
-        except go.MoveError:    # hit a terminal position
-            rootnode.random_sim()   # run another simulation to mix up all the totals.
+    rootnode = NodeMCTS(state=state, prior_policy=prior_policy, playout=playout, stats=stats)
+    search(rootnode, sim_limit=sim_limit, time_limit=time_limit)
+    if stats is not None:
+        stats.finish(rootnode)
 
     return rootnode.bestchild()
 
 
-def gof_move_search(queue, state, sim_limit=10000):
+def gof_move_search(queue, state, sim_limit=10000, snapshot=None, publish_interval=None, stop=None,
+                    cache=None, node_budget=None):
     """Pass search scores from the MCTS algorithm in to a queue
 
     This is the main function of the MCTS algorithm.
@@ -238,19 +614,45 @@ def gof_move_search(queue, state, sim_limit=10000):
     sim_limit limits the total number of terminal playouts can occur before a move is returned/
     const is a constant value used in bestchild as part of move evaluation
 
-    :param queue: multiprocessing.Queue object to allow algorithm state passing
+    Scores are published every 10 simulations, or every publish_interval seconds.
+    A snapshot.ScoreSnapshot is overwritten in place, so it never holds stale scores.
+
+    :param queue: multiprocessing.Queue object to allow algorithm state passing, or None
     :param rootnode: root node with starting state
     :param sim_limit: int
-    :return: action
+    :param snapshot: ScoreSnapshot shared memory to publish to as well as or instead of queue
+    :param publish_interval: float seconds between publishes, None -> every 10 simulations
+    :param stop: callable returning True to end the search before sim_limit
+    :param cache: cache.AnalysisCache to carry on from and store the search in, or None
+    :param node_budget: int most nodes of the tree, None -> no limit
+    :return: NodeMCTS the root node of the search
     """
-    rootnode = NodeMCTS(state=state)
-
-    while rootnode.sims < sim_limit:
-        try:
-            treepolicy(rootnode)
-        except go.MoveError:  # hit a terminal position
-            rootnode.random_sim()  # run another simulation to mix up all the totals.
-
-        if rootnode.sims % 10 == 0:
+    budget = None if node_budget is None else NodeBudget(capacity=node_budget)
+    rootnode = None if cache is None else cache.restore(state, budget=budget)
+    if rootnode is None:
+        rootnode = NodeMCTS(state=state, budget=budget)
+    last_publish = time.time()
+
+    def publish():
+        if queue is not None:
             child_scores = {child.name: child.score() for child in rootnode.children.values()}
             queue.put(child_scores)
+        if snapshot is not None:
+            snapshot.publish(rootnode)
+
+    while rootnode.sims < sim_limit:
+        if stop is not None and stop():
+            break
+        search_step(rootnode)
+
+        if publish_interval is None:
+            if rootnode.sims % 10 == 0:
+                publish()
+        elif time.time() - last_publish >= publish_interval:
+            publish()
+            last_publish = time.time()
+
+    publish()
+    if cache is not None:
+        cache.store(rootnode)
+    return rootnode
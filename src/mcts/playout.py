@@ -0,0 +1,187 @@
+"""Pattern weighted playouts
+
+Instead of playing uniformly random moves like Position.random_playout, a PatternPlayout
+picks each move with a probability in proportion to the play rate of its 3x3 pattern
+in a corpus.PatternTable, and never fills its own eyes.
+
+The 3x3 code of every intersection is kept through the playout, with black and white
+as own and opponent.  After a move only the codes around the intersections that
+changed, the move and the stones it captured, are recomputed, and the pattern weights
+for white are looked up through codes with the colours swapped.  The weights of each
+colour are kept in a WeightTree, so a move is sampled and its changes are weighed in
+time logarithmic in the board size.
+
+As with Position.random_playout, the moves returned stop at the first capture, since
+later moves may be played on points a capture has opened again.
+"""
+from copy import deepcopy
+import random
+
+import numpy as np
+from thick_goban import go
+
+from corpus import patterns
+
+
+class WeightTree:
+    """Fenwick tree of non negative weights, sampled in proportion to them
+
+    >>> tree = WeightTree([0.0, 2.0, 0.0, 1.0])
+    >>> tree.find(1.5), tree.find(2.5), tree.total
+    (1, 3, 3.0)
+    """
+    def __init__(self, weights):
+        """
+        :param weights: iterable of floats
+        """
+        self.weights = [float(weight) for weight in weights]
+        self.size = len(self.weights)
+        self.tree = [0.0] + self.weights
+        for index in range(1, self.size + 1):
+            parent = index + (index & -index)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[index]
+        self.total = sum(self.weights)
+        self.top = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    def update(self, index, weight):
+        """Set the weight of an index
+
+        :param index: int
+        :param weight: float
+        """
+        delta = weight - self.weights[index]
+        if not delta:
+            return
+        self.weights[index] = weight
+        self.total += delta
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def find(self, value):
+        """Return the index whose weight covers a value of the running total
+
+        :param value: float     from 0 up to the total
+        :return: int
+        """
+        index, step = 0, self.top
+        while step:
+            if index + step <= self.size and self.tree[index + step] <= value:
+                index += step
+                value -= self.tree[index]
+            step >>= 1
+        return min(index, self.size - 1)
+
+
+class PatternPlayout:
+    """Playout policy of 3x3 pattern weights, callable like Position.random_playout
+
+    A NodeMCTS given one as its playout uses it for all its simulations.
+    """
+    def __init__(self, table):
+        """
+        :param table: corpus.patterns.PatternTable
+        """
+        rates = table.small_rates()
+        codes = np.arange(4**len(patterns.SMALL), dtype=np.uint32)
+        swapped = patterns.swap_colours(codes)
+        self.weights = {go.BLACK: np.where(patterns.own_eye(codes), 0, rates),
+                        go.WHITE: np.where(patterns.own_eye(swapped), 0, rates[swapped])}
+
+    def __call__(self, state, move_limit=None):
+        """Play a position out to the end
+
+        :param state: go.Position       not changed
+        :param move_limit: int          None -> 3 moves per intersection
+        :return: (go.Position, dict)    final position, {BLACK: moves, WHITE: moves}
+        """
+        state = deepcopy(state)
+        size = state.size
+        points = size**2
+        neighbours = patterns.neighbour_indexes(size, patterns.SMALL)
+        adjacent = neighbours[:, patterns.ORTHOGONAL]
+        shifts = 2*np.arange(len(patterns.SMALL), dtype=np.uint32)
+
+        board = np.array(state.board._board_colour)
+        digits = np.append(np.where(board == go.WHITE, 2, board), patterns.OFF_BOARD).astype(np.uint32)
+        codes = (digits[neighbours] << shifts).sum(axis=-1, dtype=np.uint32)
+        trees = {colour: WeightTree(np.where(board == go.OPEN, self.weights[colour][codes], 0))
+                 for colour in (go.BLACK, go.WHITE)}
+
+        moves = {go.BLACK: [], go.WHITE: []}
+        captured = False
+        passes = 0
+        for _ in range(3*points if move_limit is None else move_limit):
+            colour = state.next_player
+            tree = trees[colour]
+            move_pt = None
+            rejected = []
+            while tree.total > 0:
+                candidate = tree.find(random.random()*tree.total)
+                if not tree.weights[candidate]:     # rounding left a total with no weights
+                    break
+                try:
+                    state.move(move_pt=candidate)
+                except go.MoveError:
+                    rejected.append((candidate, tree.weights[candidate]))
+                    tree.update(candidate, 0.0)
+                else:
+                    move_pt = candidate
+                    break
+            for point, weight in rejected:      # illegal for this move only
+                tree.update(point, weight)
+
+            if move_pt is None:
+                passes += 1
+                state.next_player = -colour
+                if passes == 2:
+                    break
+                continue
+            passes = 0
+            if not captured:
+                moves[colour].append(move_pt)
+
+            changed = [move_pt] + self.captures(state, move_pt, digits, adjacent)
+            captured = captured or len(changed) > 1
+            digits[move_pt] = 1 if colour == go.BLACK else 2
+            around = np.unique(neighbours[changed])
+            around = around[around < points]
+            # a pattern around a changed intersection includes it, so only these change
+            codes[around] = (digits[neighbours[around]] << shifts).sum(axis=-1, dtype=np.uint32)
+            reweighed = np.union1d(around, changed)
+            open_points = digits[reweighed] == 0
+            for weigh_colour, weigh_tree in trees.items():
+                weights = np.where(open_points, self.weights[weigh_colour][codes[reweighed]], 0)
+                for point, weight in zip(reweighed.tolist(), weights.tolist()):
+                    weigh_tree.update(point, weight)
+
+        return state, moves
+
+    @staticmethod
+    def captures(state, move_pt, digits, adjacent):
+        """Return the stones captured by a move, clearing them from the digits
+
+        :param state: go.Position       after the move
+        :param move_pt: int
+        :param digits: array            board digits before the move, changed in place
+        :param adjacent: array          the four neighbour indexes of every intersection
+        :return: list of int
+        """
+        opponent = 1 if state.next_player == go.BLACK else 2
+        board = state.board._board_colour
+        captured = []
+        for start in adjacent[move_pt].tolist():
+            if digits[start] != opponent or board[start] != go.OPEN:
+                continue
+            digits[start] = 0
+            stack = [start]
+            while stack:
+                point = stack.pop()
+                captured.append(point)
+                for neighbour in adjacent[point].tolist():
+                    if digits[neighbour] == opponent:
+                        digits[neighbour] = 0
+                        stack.append(neighbour)
+        return captured
@@ -0,0 +1,107 @@
+"""A pool of search processes shared by many analysis sessions
+
+Each pool process owns a slot: a snapshot.ScoreSnapshot the searches it runs publish
+to, and a stop flag to end a search early.  The slots are created with the pool, so the
+shared memory is inherited by the processes, and nothing but the position is sent to
+start a search.
+
+A session takes a free slot for as long as its search runs, so as many searches run at
+once as there are processes, and further sessions wait for a slot.
+"""
+from multiprocessing import Pool
+from multiprocessing.sharedctypes import RawArray
+import queue
+
+from mcts import mcts
+from mcts.snapshot import ScoreSnapshot
+
+
+_snapshots = None
+_stop_flags = None
+
+
+def _init_worker(snapshots, stop_flags):
+    """Keep the shared slots in the pool process"""
+    global _snapshots, _stop_flags
+    _snapshots, _stop_flags = snapshots, stop_flags
+
+
+def _search_task(slot, state, sim_limit, publish_interval):
+    """Search a position, publishing to the slot snapshot
+
+    :return: int        best move found, None if there are no moves
+    """
+    rootnode = mcts.gof_move_search(None, state,
+                                    sim_limit=sim_limit,
+                                    snapshot=_snapshots[slot],
+                                    publish_interval=publish_interval,
+                                    stop=lambda: _stop_flags[slot])
+    try:
+        return rootnode.bestchild()
+    except ValueError:      # no children nor AMAF totals
+        return None
+
+
+class SearchPool:
+    """Pool of search processes publishing to shared memory slots
+
+    >>> pool = SearchPool(processes=1)
+    >>> pool.close()
+    """
+    def __init__(self, processes=2, size=19, max_pv=20):
+        """
+        :param processes: int       number of searches run at once
+        :param size: int            largest board size searched
+        :param max_pv: int          length of the published principal variations
+        """
+        self.snapshots = [ScoreSnapshot(size=size, max_pv=max_pv) for _ in range(processes)]
+        self.stop_flags = RawArray('b', processes)
+        self._free_slots = queue.Queue()
+        for slot in range(processes):
+            self._free_slots.put(slot)
+        self._pool = Pool(processes=processes, initializer=_init_worker,
+                          initargs=(self.snapshots, self.stop_flags))
+
+    def acquire(self, timeout=None):
+        """Wait for a free slot
+
+        :param timeout: float       seconds, None -> wait for ever
+        :raises queue.Empty:        no slot became free in time
+        :return: int                slot
+        """
+        return self._free_slots.get(timeout=timeout)
+
+    def release(self, slot):
+        """Return a slot whose search has finished
+
+        :param slot: int
+        """
+        self._free_slots.put(slot)
+
+    def search(self, slot, state, sim_limit=10000, publish_interval=0.1, callback=None):
+        """Start a search in a slot
+
+        :param slot: int                acquired slot
+        :param state: go.Position
+        :param sim_limit: int
+        :param publish_interval: float  seconds between snapshots
+        :param callback: callable       called with the best move when the search ends
+        :return: multiprocessing.pool.AsyncResult
+        """
+        self.stop_flags[slot] = 0
+        return self._pool.apply_async(_search_task, (slot, state, sim_limit, publish_interval),
+                                      callback=callback)
+
+    def stop(self, slot):
+        """End the search of a slot early
+
+        :param slot: int
+        """
+        self.stop_flags[slot] = 1
+
+    def close(self):
+        """Stop all searches and end the processes"""
+        for slot in range(len(self.stop_flags)):
+            self.stop_flags[slot] = 1
+        self._pool.terminate()
+        self._pool.join()
@@ -0,0 +1,277 @@
+"""Headless analysis server speaking JSON lines over stdin and stdout
+
+Run it with
+    python -m mcts.server [processes]
+
+Every request and response is a JSON object on one line.  Requests:
+
+    {"cmd": "analyse", "session": "a", "sgf": "(;SZ[19]...)", "sim_limit": 10000, "interval": 0.2}
+    {"cmd": "analyse", "session": "b", "moves": [[72, 1], [8, -1]], "size": 9, "komi": 7.5}
+    {"cmd": "stop", "session": "a"}
+    {"cmd": "quit"}
+
+Positions are an sgf string, or a list of [move, colour] pairs or of moves played in
+turn from black, on an empty board of the given size.  A new analyse request for a
+running session replaces its search.
+
+Responses, in gof_move_search style:
+
+    {"session": "a", "event": "scores", "sims": 1200, "scores": [[move, score, visits], ...], "pv": [...],
+     "score": 3.5, "ownership": [...]}
+    {"session": "a", "event": "done", "sims": 10000, "best": move}
+    {"session": "a", "event": "stopped"}
+    {"event": "error", "message": "..."}
+
+The score is the expected area score, positive when black is ahead, and the ownership
+lists the expected owner of each intersection, from 1 black to -1 white.
+
+Sessions share a pool of search processes; when all are busy, new sessions wait for
+one to finish.  At the end of the input the server waits for the running sessions.
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
+from thick_goban import go
+
+from mcts.pool import SearchPool
+from sgf import sgf_str_to_thick_goban
+
+
+def request_position(request):
+    """Create the position of an analyse request
+
+    :param request: dict
+    :return: go.Position
+    """
+    if 'sgf' in request:
+        return sgf_str_to_thick_goban(request['sgf'])
+
+    position = go.Position(size=int(request.get('size', 19)), komi=float(request.get('komi', 6.5)))
+    for move in request.get('moves', []):
+        if isinstance(move, (list, tuple)):
+            position.move(move_pt=int(move[0]), colour=int(move[1]))
+        else:
+            position.move(move_pt=int(move))
+    return position
+
+
+def scores_event(session, snapshot, points):
+    """Return the scores event of a snapshot
+
+    :param session: str         session name
+    :param snapshot: dict       ScoreSnapshot.read output
+    :param points: int          intersections of the board searched
+    :return: dict
+    """
+    moves = np.flatnonzero(~np.isnan(snapshot['scores']))
+    return {'session': session,
+            'event': 'scores',
+            'sims': snapshot['sims'],
+            'scores': [[int(move), float(snapshot['scores'][move]), int(snapshot['visits'][move])]
+                       for move in moves],
+            'pv': snapshot['pv'],
+            'score': snapshot['score'],
+            'ownership': [round(float(owner), 3) for owner in snapshot['ownership'][:points]],
+            }
+
+
+class AnalysisSession(threading.Thread):
+    """Thread streaming the snapshots of one search to the server output"""
+    def __init__(self, server, name, state, sim_limit, interval):
+        super().__init__(daemon=True)
+        self.server = server
+        self.session = name
+        self.state = state
+        self.sim_limit = sim_limit
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.slot = None
+        self._slot_lock = threading.Lock()     # guards slot between stop and the end of run
+        self.points = len(state.board._board_colour)
+
+    def stop(self):
+        """End the search of the session"""
+        self.stopped.set()
+        with self._slot_lock:
+            if self.slot is not None:
+                self.server.pool.stop(self.slot)
+
+    def run(self):
+        slot = self.server.pool.acquire()
+        with self._slot_lock:
+            self.slot = slot
+        try:
+            if self.stopped.is_set():
+                self.server.respond({'session': self.session, 'event': 'stopped'})
+                return
+            snapshot = self.server.pool.snapshots[slot]
+            seq = snapshot.seq
+            result = self.server.pool.search(slot, self.state, self.sim_limit, self.interval)
+            if self.stopped.is_set():       # stopped while the search was starting
+                self.server.pool.stop(slot)
+
+            while not result.ready():
+                result.wait(self.interval)
+                if snapshot.seq != seq:
+                    latest = snapshot.read()
+                    seq = latest['seq']
+                    self.server.respond(self.scores_response(latest))
+
+            best = result.get()
+            latest = snapshot.read()
+            if self.stopped.is_set():
+                self.server.respond({'session': self.session, 'event': 'stopped'})
+            else:
+                self.server.respond({'session': self.session, 'event': 'done',
+                                     'sims': latest['sims'], 'best': best})
+        except Exception as err:
+            self.server.respond({'session': self.session, 'event': 'error', 'message': str(err)})
+        finally:
+            with self._slot_lock:
+                self.slot = None
+                self.server.pool.release(slot)
+
+    def scores_response(self, snapshot):
+        """Return the scores event of a snapshot
+
+        :param snapshot: dict       ScoreSnapshot.read output
+        :return: dict
+        """
+        return scores_event(self.session, snapshot, self.points)
+
+
+class AnalysisServer:
+    """JSON lines analysis server
+
+    >>> import io
+    >>> AnalysisServer(io.StringIO('{"cmd": "quit"}'), io.StringIO(), processes=1).serve()
+    """
+    def __init__(self, instream=sys.stdin, outstream=sys.stdout, processes=2, size=19):
+        """
+        :param instream: file       requests
+        :param outstream: file      responses
+        :param processes: int       searches run at once
+        :param size: int            largest board size analysed
+        """
+        self.instream = instream
+        self.outstream = outstream
+        self.pool = SearchPool(processes=processes, size=size)
+        self.sessions = {}
+        self._threads = []
+        self._output_lock = threading.Lock()
+
+    def respond(self, response):
+        """Write a response line
+
+        :param response: dict
+        """
+        with self._output_lock:
+            self.outstream.write(json.dumps(response) + '\n')
+            self.outstream.flush()
+
+    def serve(self):
+        """Handle requests until the input ends or a quit request"""
+        try:
+            for line in self.instream:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if request.get('cmd') == 'quit':
+                        for session in self.sessions.values():
+                            session.stop()
+                        break
+                    self.handle(request)
+                except Exception as err:
+                    self.respond({'event': 'error', 'message': str(err)})
+
+            for session in list(self._threads):
+                session.join()
+        finally:
+            self.pool.close()
+
+    def reap(self):
+        """Join the threads of the sessions which have ended, and forget them
+
+        Sessions replaced by a newer one of the same name are dropped when they end.
+        """
+        for session in [thread for thread in self._threads if not thread.is_alive()]:
+            session.join()
+            self._threads.remove(session)
+            if self.sessions.get(session.session) is session:
+                del self.sessions[session.session]
+
+    def handle(self, request):
+        """Handle an analyse or stop request
+
+        The sessions which have ended are forgotten first.
+
+        :param request: dict
+        """
+        self.reap()
+        cmd = request.get('cmd')
+        name = request.get('session')
+        if cmd == 'analyse':
+            if name in self.sessions:
+                self.sessions[name].stop()
+            session = AnalysisSession(self, name,
+                                      state=request_position(request),
+                                      sim_limit=int(request.get('sim_limit', 10000)),
+                                      interval=float(request.get('interval', 0.2)))
+            self.sessions[name] = session
+            self._threads.append(session)
+            session.start()
+        elif cmd == 'stop':
+            try:
+                self.sessions[name].stop()
+            except KeyError:
+                raise ValueError('Unknown session: ' + str(name))
+        else:
+            raise ValueError('Unknown command: ' + str(cmd))
+
+
+class AnalysisClient:
+    """Client running an analysis server as a local subprocess
+
+    >>> client = AnalysisClient(processes=1)
+    >>> client.send({'cmd': 'quit'})
+    >>> client.close()
+    """
+    def __init__(self, processes=2):
+        """
+        :param processes: int       searches the server runs at once
+        """
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+        self.process = subprocess.Popen([sys.executable, '-m', 'mcts.server', str(processes)],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        universal_newlines=True, env=env)
+
+    def send(self, request):
+        """Send a request
+
+        :param request: dict
+        """
+        self.process.stdin.write(json.dumps(request) + '\n')
+        self.process.stdin.flush()
+
+    def responses(self):
+        """Yield the responses of the server until it ends
+
+        :yield: dict
+        """
+        for line in self.process.stdout:
+            yield json.loads(line)
+
+    def close(self):
+        """End the input of the server and wait for it to finish"""
+        self.process.stdin.close()
+        self.process.wait()
+        self.process.stdout.close()
+
+
+if __name__ == '__main__':
+    AnalysisServer(processes=int(sys.argv[1]) if len(sys.argv) > 1 else 2).serve()
@@ -0,0 +1,198 @@
+"""Asyncio front-end multiplexing analysis sessions over a search pool
+
+A SessionMultiplexer runs many named analysis sessions in one event loop, sharing the
+processes of a pool.SearchPool.  Each session waits for a free slot, searches its
+position with gof_move_search in the slot, and streams the scores events of the slot
+snapshot to every consumer awaiting its events:
+
+    multiplexer = SessionMultiplexer(processes=4)
+    session = multiplexer.analyse('board 1', position, sim_limit=10000)
+    async for event in session.events():
+        ...
+    await multiplexer.close()
+
+The events are the scores, done and stopped events of the server.  Analysing a new
+position in a running session stops its stale search, which ends its consumers with a
+stopped event.
+
+Every consumer has a queue of at most queue_size events.  The snapshot of a search is
+overwritten in place, so when the queues of all its consumers are full a session skips
+reading it, and the consumers catch up with a later snapshot instead of a backlog of
+stale ones.  The search itself never waits for its consumers.
+"""
+import asyncio
+
+from mcts import mcts
+from mcts.pool import SearchPool
+from mcts.server import scores_event
+
+
+class AsyncSession:
+    """One named search of a position, streaming its events to its consumers"""
+    def __init__(self, multiplexer, name, state, sim_limit=10000, interval=0.2):
+        """
+        :param multiplexer: SessionMultiplexer
+        :param name: str
+        :param state: go.Position
+        :param sim_limit: int
+        :param interval: float      seconds between snapshots
+        """
+        self.multiplexer = multiplexer
+        self.name = name
+        self.state = state
+        self.sim_limit = sim_limit
+        self.interval = interval
+        self.points = len(state.board._board_colour)
+        self.slot = None
+        self.stopped = False
+        self.result = None      # the done or stopped event
+        self._consumers = []
+        self.task = None
+
+    @property
+    def running(self):
+        """
+        :return: boolean    True until the done or stopped event
+        """
+        return self.result is None
+
+    def stop(self):
+        """End the search of the session, or its wait for a slot"""
+        self.stopped = True
+        if self.slot is not None:
+            self.multiplexer.pool.stop(self.slot)
+        elif self.task is not None:
+            self.task.cancel()
+            if self.result is None:     # the task may be cancelled before it starts
+                self._finish({'session': self.name, 'event': 'stopped'})
+
+    async def events(self):
+        """Yield the events of the session, ending with the done or stopped event
+
+        :yield: dict
+        """
+        if self.result is not None:
+            yield self.result
+            return
+        queue = asyncio.Queue(maxsize=self.multiplexer.queue_size)
+        self._consumers.append(queue)
+        try:
+            while True:
+                event = await queue.get()
+                yield event
+                if event['event'] != 'scores':
+                    return
+        finally:
+            self._consumers.remove(queue)
+
+    def _publish(self, event):
+        """Queue a scores event for the consumers with room for it"""
+        for queue in self._consumers:
+            if not queue.full():
+                queue.put_nowait(event)
+
+    def _finish(self, event):
+        """Queue the last event for every consumer, dropping their oldest when full"""
+        self.result = event
+        for queue in self._consumers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def run(self):
+        """Wait for a slot, search, and stream the snapshots of the search"""
+        pool = self.multiplexer.pool
+        try:
+            self.slot = await self.multiplexer.slots.get()
+        except asyncio.CancelledError:      # stopped while waiting for a slot
+            return
+
+        try:
+            if self.stopped:
+                self._finish({'session': self.name, 'event': 'stopped'})
+                return
+            snapshot = pool.snapshots[self.slot]
+            seq = snapshot.seq
+            result = pool.search(self.slot, self.state, self.sim_limit, self.interval)
+
+            while not result.ready():
+                await asyncio.sleep(self.interval)
+                if snapshot.seq != seq and any(not queue.full() for queue in self._consumers):
+                    latest = snapshot.read()
+                    seq = latest['seq']
+                    self._publish(scores_event(self.name, latest, self.points))
+
+            best = result.get()
+            if self.stopped:
+                self._finish({'session': self.name, 'event': 'stopped'})
+            else:
+                self._finish({'session': self.name, 'event': 'done',
+                              'sims': snapshot.read()['sims'], 'best': best})
+        except Exception as err:
+            self._finish({'session': self.name, 'event': 'error', 'message': str(err)})
+        finally:
+            slot, self.slot = self.slot, None
+            self.multiplexer.slots.put_nowait(slot)
+
+
+class SessionMultiplexer:
+    """Named analysis sessions of an event loop sharing a search pool
+
+    Create it in the event loop it serves.
+    """
+    def __init__(self, processes=2, size=19, queue_size=4, pool=None):
+        """
+        :param processes: int       searches run at once, when the pool is made here
+        :param size: int            largest board size analysed
+        :param queue_size: int      most events waiting for a consumer
+        :param pool: SearchPool     shared pool, None -> a pool of its own
+        """
+        self.own_pool = pool is None
+        self.pool = SearchPool(processes=processes, size=size) if pool is None else pool
+        self.queue_size = queue_size
+        self.sessions = {}
+        self.slots = asyncio.Queue()
+        for _ in self.pool.snapshots:
+            self.slots.put_nowait(self.pool.acquire())
+
+    def analyse(self, name, state, sim_limit=10000, interval=0.2):
+        """Start analysing a position in a session
+
+        A running session of the same position carries on.  Otherwise the stale search
+        of the session is stopped, and a new one started.
+
+        :param name: str
+        :param state: go.Position
+        :param sim_limit: int
+        :param interval: float      seconds between snapshots
+        :return: AsyncSession
+        """
+        session = self.sessions.get(name)
+        if session is not None:
+            if session.running and mcts.same_position(session.state, state):
+                return session
+            session.stop()
+
+        session = AsyncSession(self, name, state, sim_limit=sim_limit, interval=interval)
+        session.task = asyncio.ensure_future(session.run())
+        self.sessions[name] = session
+        return session
+
+    def stop(self, name):
+        """Stop the search of a session
+
+        :param name: str
+        :raises: KeyError for an unknown session
+        """
+        self.sessions[name].stop()
+
+    async def close(self):
+        """Stop every session, wait for them to end, and give back the slots"""
+        for session in self.sessions.values():
+            session.stop()
+        await asyncio.gather(*(session.task for session in self.sessions.values()), return_exceptions=True)
+        self.sessions = {}
+        while not self.slots.empty():
+            self.pool.release(self.slots.get_nowait())
+        if self.own_pool:
+            self.pool.close()
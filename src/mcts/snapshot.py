@@ -0,0 +1,146 @@
+"""Fixed size shared memory snapshots of a search
+
+A ScoreSnapshot is a block of shared memory holding the latest root child scores, visit
+counts, principal variation, ownership map and expected score of a search.  The
+searching process overwrites it in place, so publishing never queues up stale
+snapshots, and readers in other processes see the latest state without anything being
+pickled.
+
+A sequence counter guards every write.  It is odd while a write is in progress, and is
+increased by two for every completed write, so readers can detect torn reads and
+unchanged snapshots.
+"""
+from multiprocessing.sharedctypes import RawArray
+import time
+
+import numpy as np
+
+
+_HEADER = ('seq', 'sims', 'children', 'pv_length', 'time', 'score')
+
+
+class ScoreSnapshot:
+    """Shared memory snapshot of the root of a search
+
+    >>> snap = ScoreSnapshot(size=9)
+    >>> snap.read()['seq']
+    0
+    """
+    def __init__(self, size=19, max_pv=20):
+        """
+        :param size: int        board size
+        :param max_pv: int      maximum length of the principal variation
+        """
+        self.size = size
+        self.max_pv = max_pv
+        self._buffer = RawArray('d', len(_HEADER) + 3 * size**2 + max_pv)
+        self._map_arrays()
+
+    def __getstate__(self):
+        return {'size': self.size, 'max_pv': self.max_pv, '_buffer': self._buffer}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._map_arrays()
+
+    def _map_arrays(self):
+        """Create the numpy views of the shared buffer"""
+        data = np.frombuffer(self._buffer, dtype=np.float64)
+        points = self.size**2
+        self._header = data[:len(_HEADER)]
+        self._scores = data[len(_HEADER):len(_HEADER) + points]
+        self._visits = data[len(_HEADER) + points:len(_HEADER) + 2*points]
+        self._ownership = data[len(_HEADER) + 2*points:len(_HEADER) + 3*points]
+        self._pv = data[len(_HEADER) + 3*points:]
+
+    @property
+    def seq(self):
+        """The sequence number of the latest completed write
+
+        :return: int
+        """
+        return int(self._header[0]) & ~1
+
+    def publish(self, rootnode):
+        """Write the root children statistics of a search
+
+        Scores of intersections which are not root children are NaN, as is the ownership
+        of intersections off a board smaller than the snapshot.  A pass child has no
+        intersection, so it has no score, and is -1 in the principal variation.
+
+        :param rootnode: NodeMCTS
+        """
+        pv = principal_variation(rootnode, max_length=self.max_pv)
+
+        self._header[0] += 1
+        self._scores[:] = np.nan
+        self._visits[:] = 0
+        for child in rootnode.children.values():
+            if child.name is None:      # a None index would fill the whole array
+                continue
+            self._scores[child.name] = child.score()
+            self._visits[child.name] = child.sims
+        self._ownership[:] = np.nan
+        self._ownership[:len(rootnode.ownership)] = rootnode.ownership / max(rootnode.sims, 1)
+        self._pv[:len(pv)] = [-1 if move is None else move for move in pv]
+        self._header[1:] = (rootnode.sims, len(rootnode.children), len(pv), time.time(),
+                            rootnode.expected_score())
+        self._header[0] += 1
+
+    def view(self):
+        """Return zero copy views of the shared arrays
+
+        The views change as the search publishes, and may be read mid write.
+
+        :return: dict
+        """
+        return {'scores': self._scores, 'visits': self._visits, 'ownership': self._ownership,
+                'pv': self._pv}
+
+    def read(self):
+        """Return a consistent copy of the latest snapshot
+
+        :return: dict       seq, sims, scores, visits, ownership, pv, time, score
+        """
+        while True:
+            seq = self._header[0]
+            if not int(seq) % 2:
+                header = self._header.copy()
+                scores, visits, pv = self._scores.copy(), self._visits.copy(), self._pv.copy()
+                ownership = self._ownership.copy()
+                if self._header[0] == seq:
+                    break
+            time.sleep(0)       # let the writer finish
+
+        return {'seq': int(seq),
+                'sims': int(header[1]),
+                'scores': scores,
+                'visits': visits,
+                'ownership': ownership,
+                'pv': [None if move < 0 else int(move) for move in pv[:int(header[3])]],
+                'time': header[4],
+                'score': header[5],
+                }
+
+    def scores(self):
+        """Return the latest scores as a {name: score} dict, like the analysis queue
+
+        :return: dict
+        """
+        scores = self.read()['scores']
+        return {int(name): scores[name] for name in np.flatnonzero(~np.isnan(scores))}
+
+
+def principal_variation(rootnode, max_length=20):
+    """Return the most visited line of moves from a node
+
+    :param rootnode: NodeMCTS
+    :param max_length: int
+    :return: list       move names
+    """
+    pv = []
+    node = rootnode
+    while node.children and len(pv) < max_length:
+        node = max(node.children.values(), key=lambda child: child.sims)
+        pv.append(node.name)
+    return pv
@@ -0,0 +1,162 @@
+"""Timing and counters of the phases of a search
+
+A SearchStats given to a root NodeMCTS is passed down to every node of its tree, and
+the search records in it the wall time of each phase of every simulation:
+
+    selection   bestchild calls down the tree
+    expansion   copying the state and playing the move of a new node
+    playout     playing the new node out to a terminal position
+    scoring     the winner and ownership of the terminal position
+    backprop    the update of the win and AMAF totals up the tree
+
+as log2 histograms in microseconds, with counters of new nodes, bad moves hit by the
+tree policy and terminal positions, and the depth of each selection.  Without a
+SearchStats the search only checks for None, so leaving it out costs next to nothing.
+
+    >>> stats = SearchStats()
+    >>> stats.record('playout', 0.0003)
+    >>> stats.summary()['phases']['playout']['count']
+    1
+"""
+from collections import Counter
+from math import frexp
+import sys
+import time
+
+
+PHASES = ('selection', 'expansion', 'playout', 'scoring', 'backprop')
+BUCKETS = 32    # bucket b counts durations from 2**(b-1) up to 2**b microseconds
+
+
+class SearchStats:
+    """Per phase timing histograms and counters of a search"""
+    def __init__(self, dump_interval=None, outstream=sys.stderr):
+        """
+        :param dump_interval: float     seconds between reports written by step, None -> never
+        :param outstream: file          where the reports are written
+        """
+        self.dump_interval = dump_interval
+        self.outstream = outstream
+        self.totals = {phase: 0.0 for phase in PHASES}
+        self.histograms = {phase: [0] * BUCKETS for phase in PHASES}
+        self.counters = Counter()
+        self.depths = Counter()
+        self.tree = {}
+        self.started = time.time()
+        self._last_dump = self.started
+
+    def record(self, phase, seconds):
+        """Add the duration of a phase
+
+        :param phase: str
+        :param seconds: float
+        """
+        self.totals[phase] += seconds
+        self.histograms[phase][min(frexp(seconds * 1e6)[1], BUCKETS - 1)] += 1
+
+    def count(self, counter, number=1):
+        """Increase a counter, such as 'nodes', 'move_errors' or 'terminal'
+
+        :param counter: str
+        :param number: int
+        """
+        self.counters[counter] += number
+
+    def step(self, rootnode):
+        """Count a search step, and write a report when the dump interval has passed
+
+        :param rootnode: NodeMCTS
+        """
+        self.counters['steps'] += 1
+        if self.dump_interval is not None and time.time() - self._last_dump >= self.dump_interval:
+            self.dump(rootnode)
+
+    def finish(self, rootnode):
+        """Record the shape of the tree at the end of a search
+
+        :param rootnode: NodeMCTS
+        """
+        self.tree = tree_stats(rootnode)
+
+    def summary(self):
+        """Return the statistics as plain data
+
+        :return: dict   phases {phase: total, count, mean, histogram}, counters, depths, tree
+        """
+        phases = {}
+        for phase in PHASES:
+            count = sum(self.histograms[phase])
+            phases[phase] = {'total': self.totals[phase],
+                             'count': count,
+                             'mean': self.totals[phase] / count if count else 0.0,
+                             'histogram': list(self.histograms[phase]),
+                             }
+        return {'phases': phases,
+                'counters': dict(self.counters),
+                'depths': dict(self.depths),
+                'tree': dict(self.tree),
+                'elapsed': time.time() - self.started,
+                }
+
+    def report(self):
+        """Return a readable report of the statistics
+
+        :return: str
+        """
+        summary = self.summary()
+        timed = sum(self.totals.values()) or 1.0
+        lines = ['{:.1f}s elapsed, {}'.format(summary['elapsed'], ', '.join(
+            '{} {}'.format(name, number) for name, number in sorted(summary['counters'].items())))]
+        for phase, phase_stats in summary['phases'].items():
+            lines.append('{:<10} {:8.3f}s {:5.1f}% {:8} x {:9.1f}us'.format(
+                phase, phase_stats['total'], 100 * phase_stats['total'] / timed,
+                phase_stats['count'], 1e6 * phase_stats['mean']))
+        if self.depths:
+            depths = sum(depth * number for depth, number in self.depths.items())
+            lines.append('depth mean {:.2f} max {}'.format(depths / sum(self.depths.values()),
+                                                          max(self.depths)))
+        if self.tree:
+            lines.append(', '.join('{} {:.4g}'.format(name, value) for name, value in self.tree.items()))
+        return '\n'.join(lines)
+
+    def dump(self, rootnode=None):
+        """Write a report, with the shape of the tree when there is a root node
+
+        :param rootnode: NodeMCTS
+        """
+        if rootnode is not None:
+            self.finish(rootnode)
+        self.outstream.write(self.report() + '\n')
+        self.outstream.flush()
+        self._last_dump = time.time()
+
+
+def tree_stats(rootnode):
+    """Return the size and shape of a search tree
+
+    :param rootnode: NodeMCTS
+    :return: dict   nodes, leaves, max_depth, mean_depth of the leaves, branching of the inner nodes
+    """
+    nodes = leaves = leaf_depths = max_depth = max_branching = 0
+    level, depth = [rootnode], 0
+    while level:
+        nodes += len(level)
+        max_depth = depth
+        next_level = []
+        for node in level:
+            if node.children:
+                max_branching = max(max_branching, len(node.children))
+                next_level.extend(node.children.values())
+            else:
+                leaves += 1
+                leaf_depths += depth
+        level, depth = next_level, depth + 1
+
+    inner = nodes - leaves
+    return {'nodes': nodes,
+            'leaves': leaves,
+            'max_depth': max_depth,
+            'mean_depth': leaf_depths / leaves,
+            'branching': (nodes - 1) / inner if inner else 0.0,
+            'max_branching': max_branching,
+            }
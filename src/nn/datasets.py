@@ -0,0 +1,187 @@
+"""Streaming training data for the policy net
+
+Minibatches are read lazily from either the pro sgf Library or numpy files of OpenAI
+Go positions, so a training set never has to fit in memory.  Every pipeline stage is a
+generator of (observations, actions, rewards) tuples:
+
+    observations    N x 3 x SIZE x SIZE uint8 planes of black, white and open intersections
+    actions         N integer moves
+    rewards         N floats, the reward to the player making the move
+
+which can be augmented with the board symmetries, converted to the PolicyNet inputs and
+prefetched on background threads.
+"""
+import queue
+import threading
+
+import numpy as np
+
+from openai_go.positions import grayscale_observations
+from util import symmetry
+
+
+def game_rewards(result, players):
+    """Reward each move by whether its player won the game
+
+    >>> game_rewards('W+0.5', np.array([1, -1, 1]))
+    array([-1.,  1., -1.])
+
+    :param result: str          sgf RE attribute eg 'B+R', 'W+0.5'
+    :param players: array       player of each move, 1 black, -1 white
+    :return: array              floats, 0 for unknown or drawn results
+    """
+    winner = {'B': 1, 'W': -1}.get(str(result)[:1].upper(), 0)
+    return (np.asarray(players) * winner).astype(float)
+
+
+def library_batches(library, batch_size=128, size=19, shuffle=True):
+    """Yield minibatches of the move positions from an sgf Library
+
+    Games are read one at a time, and only games of the requested board size are used.
+
+    :param library: sgf.Library
+    :param batch_size: int
+    :param size: int                board size of the games to use
+    :param shuffle: boolean         True -> read games and positions in random order
+    :yield: (array, array, array)   observations, actions, rewards
+    """
+    names = list(library)
+    if shuffle:
+        np.random.shuffle(names)
+
+    buffered, buffer_len = [], 0
+    for name in names:
+        game = library[name]
+        attributes = game.attrs
+        if int(attributes.get('SZ', 19)) != size or len(game['moves']) == 0:
+            continue
+
+        moves = np.array(game['moves'])
+        positions = grayscale_observations(game['gray'][:len(moves)])
+        rewards = game_rewards(attributes.get('RE', ''), moves[:, 1])
+        buffered.append((positions, moves[:, 0], rewards))
+        buffer_len += len(moves)
+
+        while buffer_len >= batch_size:
+            observations, actions, rewards = (np.concatenate(column) for column in zip(*buffered))
+            if shuffle:
+                order = np.random.permutation(buffer_len)
+                observations, actions, rewards = observations[order], actions[order], rewards[order]
+            yield observations[:batch_size], actions[:batch_size], rewards[:batch_size]
+            buffered = [(observations[batch_size:], actions[batch_size:], rewards[batch_size:])]
+            buffer_len -= batch_size
+
+    if buffer_len:
+        yield tuple(np.concatenate(column) for column in zip(*buffered))
+
+
+def openai_batches(positions, moves, rewards, batch_size=128, shuffle=True):
+    """Yield minibatches from OpenAI Go9x9-v0 position arrays
+
+    The arrays can be np.load(..., mmap_mode='r') memory maps, in which case only the
+    minibatch being yielded is read from disk.
+
+    :param positions: array         N x 3 x SIZE x SIZE
+    :param moves: array             N integer actions
+    :param rewards: array           N rewards
+    :param batch_size: int
+    :param shuffle: boolean         True -> yield minibatches in random order
+    :yield: (array, array, array)   observations, actions, rewards
+    """
+    starts = np.arange(0, len(positions), batch_size)
+    if shuffle:
+        np.random.shuffle(starts)
+
+    for start in starts:
+        batch = slice(start, start + batch_size)
+        yield (np.asarray(positions[batch], dtype=np.uint8),
+               np.asarray(moves[batch]).ravel(),
+               np.asarray(rewards[batch], dtype=float).ravel())
+
+
+def augment(batches):
+    """Apply a random board symmetry to every position of every minibatch
+
+    The actions are remapped to the same symmetry as their positions.
+
+    :param batches: iter            over (observations, actions, rewards)
+    :yield: (array, array, array)   observations, actions, rewards
+    """
+    for observations, actions, rewards in batches:
+        symmetries = np.random.randint(symmetry.SYMMETRIES, size=len(actions))
+        size = observations.shape[-1]
+        yield (symmetry.transform_boards(observations, symmetries),
+               symmetry.transform_moves(actions, symmetries, size=size),
+               rewards)
+
+
+def policy_batches(batches):
+    """Convert minibatches into PolicyNet inputs and action rewards
+
+    Actions off the board, like pass, get a zero action reward.
+
+    :param batches: iter            over (observations, actions, rewards)
+    :yield: ([array, array], array) [stones, open], actionrewards
+    """
+    for observations, actions, rewards in batches:
+        action_space = observations.shape[-1]**2
+        actionrewards = np.zeros((len(actions), action_space))
+        on_board = np.flatnonzero(actions < action_space)
+        actionrewards[on_board, actions[on_board]] = rewards[on_board]
+        yield [observations[:, :2], observations[:, 2]], actionrewards
+
+
+def prefetch(batches, buffer_size=8, workers=1):
+    """Read ahead from a minibatch generator on background threads
+
+    Reading h5 and memory mapped files, and the numpy transformations, largely release
+    the GIL, so the workers keep buffer_size minibatches ready while the model trains.
+
+    :param batches: iter            any generator
+    :param buffer_size: int         maximum number of minibatches held ready
+    :param workers: int             number of reading threads
+    :yield: items of batches
+    """
+    ready = queue.Queue(maxsize=buffer_size)
+    source_lock = threading.Lock()
+    finished = object()
+
+    def work():
+        try:
+            while True:
+                with source_lock:
+                    try:
+                        item = next(batches)
+                    except StopIteration:
+                        break
+                ready.put(item)
+        except Exception as err:
+            ready.put(err)
+        ready.put(finished)
+
+    batches = iter(batches)
+    for _ in range(workers):
+        threading.Thread(target=work, daemon=True).start()
+
+    running = workers
+    while running:
+        item = ready.get()
+        if item is finished:
+            running -= 1
+        elif isinstance(item, Exception):
+            raise item
+        else:
+            yield item
+
+
+def endless(make_batches):
+    """Restart a finite minibatch pipeline every time it runs out
+
+    keras fit_generator expects a generator which yields for every epoch.
+
+    :param make_batches: callable   returns a new minibatch generator
+    :yield: items of make_batches()
+    """
+    while True:
+        for item in make_batches():
+            yield item
@@ -0,0 +1,364 @@
+"""Stuff to define, train, save and use the policy net
+
+The data structures are all based on how the OpenAI gym defines it's Go9x9-v0
+environment, generalised to any board size: a position is 3 planes of black, white and
+open intersections, and the action space is the board intersections.
+"""
+from datetime import datetime
+from os import path
+import threading
+
+import keras
+import numpy as np
+from keras import models, layers, backend as K
+
+
+_compiled_models = {}
+_compiled_models_lock = threading.Lock()
+
+_loaded_models = {}
+_loaded_models_lock = threading.Lock()
+
+
+def board_shape(size):
+    """Return the shape of one position on a board
+
+    >>> board_shape(9)
+    (3, 9, 9)
+
+    :param size: int
+    :return: tuple
+    """
+    return (3, size, size)
+
+
+def rewardloss(actionreward, policy):
+    """Calculate expected loss
+
+    Given a reward for each action and the current policy, calculate the expected return.
+    Losses are minimized, so the sign of reward must be inverted so a positive reward is
+    negative loss.
+
+    This is a custom keras loss function which has the keras loss signature, the targets
+    first and the predictions second.
+
+    :param actionreward: tensor with dim n x (action space)
+    :param policy: tensor with dim n x (action space)
+    :return: scalar tensor
+    """
+    return -K.dot(actionreward, K.transpose(policy))
+
+
+def sample_actions(probabilities, legal=None):
+    """Sample one action from every row of a probability matrix
+
+    Rows are renormalised over their legal actions, and sampled together by inverting
+    the cumulative distributions.  Rows with no probability on a legal action are
+    sampled uniformly from the legal actions, and rows with no legal actions pass.
+
+    >>> sample_actions(np.array([[0, 1, 0], [1, 0, 0]]), legal=np.array([[1, 1, 1], [0, 0, 1]]))
+    array([1, 2])
+    >>> sample_actions(np.array([[1, 1, 1]]), legal=np.zeros((1, 3)))
+    array([3])
+
+    :param probabilities: array     N x (action space)
+    :param legal: array             N x (action space) booleans, None -> all actions legal
+    :return: array                  N actions, pass is len(action space)
+    """
+    weights = np.asarray(probabilities, dtype=float)
+    if legal is not None:
+        legal = np.asarray(legal, dtype=bool)
+        weights = weights * legal
+        no_mass = ~weights.any(axis=1)
+        weights[no_mass] = legal[no_mass]
+
+    cumulative = np.cumsum(weights, axis=1)
+    totals = cumulative[:, -1:]
+    draws = np.random.random_sample(totals.shape) * totals
+    actions = (cumulative <= draws).sum(axis=1)
+    actions[totals[:, 0] == 0] = weights.shape[1]
+    return actions
+
+
+def default_optimizer(size):
+    """Return the optimizer a net of a board size is compiled with
+
+    The 19x19 net keeps the plain Adagrad it has always used, and other sizes the slower
+    learning rate of the 9x9 net.
+
+    :param size: int
+    :return: keras optimizer
+    """
+    if size == 19:
+        return keras.optimizers.Adagrad()
+    return keras.optimizers.Adagrad(lr=0.001)
+
+
+def build_model(size, summary=True, **kwargs):
+    """Creates neural network architecture for a board size
+
+    :param size: int                board size
+    :param summary: boolean         True -> prints keras model summary
+    :param kwargs: unpacked dict    model.compile keywords
+    :return: keras Model
+    """
+    activation = 'selu'
+
+    stones = layers.Input(shape=(2, size, size))
+    open = layers.Input(shape=(size, size))
+    open_flat = layers.Flatten()(open)
+
+    zeros1 = layers.ZeroPadding2D((1,1))(stones)
+    conv1 = layers.Convolution2D(filters=32, kernel_size=(3, 3), activation=activation)(zeros1)
+
+    zeros2 = layers.ZeroPadding2D((1,1))(conv1)
+    conv2 = layers.Convolution2D(filters=32, kernel_size=(3, 3), activation=activation)(zeros2)
+
+    flat = layers.Flatten()(conv2)
+
+    hidden1 = layers.Dense(2 ** 10, activation=activation)(flat)
+    bn1 = layers.BatchNormalization()(hidden1)
+
+    hidden2 = layers.Dense(2 ** 10, activation=activation)(bn1)
+    bn2 = layers.BatchNormalization()(hidden2)
+
+    soft = layers.Dense(size**2, activation='sigmoid')(bn2)
+
+    output = layers.Multiply()([soft, open_flat])
+
+    model = models.Model(inputs=[stones, open], outputs=output)
+
+    model.compile(optimizer=kwargs.pop('optimizer', default_optimizer(size)),
+                  loss=kwargs.pop('loss', rewardloss),
+                  **kwargs
+                  )
+    if summary:
+        print(model.summary())
+
+    return model
+
+
+def compiled_model(size):
+    """Return the process wide compiled model for a board size
+
+    The model is built on the first request for the size, and shared afterwards.
+
+    :param size: int
+    :return: keras Model
+    """
+    with _compiled_models_lock:
+        try:
+            return _compiled_models[size]
+        except KeyError:
+            model = _compiled_models[size] = build_model(size, summary=False)
+            return model
+
+
+def load_cached_model(h5model, inference=True):
+    """Return the process wide model loaded from a saved model file
+
+    Models are registered by file and modification time, so a file is only loaded once
+    per process however many nets use it, and a file overwritten by a newer save is
+    loaded again.  Inference models are not compiled, which skips building the
+    optimizer and loss, and so cannot be trained.
+
+    :param h5model: str             saved model file
+    :param inference: boolean       True -> load without compiling
+    :return: keras Model
+    """
+    h5model = path.abspath(h5model)
+    key = (h5model, path.getmtime(h5model), inference)
+    with _loaded_models_lock:
+        try:
+            return _loaded_models[key]
+        except KeyError:
+            for old_key in [old for old in _loaded_models if old[0] == h5model and old[2] == inference]:
+                del _loaded_models[old_key]
+            model = _loaded_models[key] = models.load_model(h5model,
+                                                            custom_objects={'rewardloss': rewardloss},
+                                                            compile=not inference)
+            return model
+
+
+def clear_model_caches():
+    """Forget all compiled and loaded models of the process"""
+    with _compiled_models_lock:
+        _compiled_models.clear()
+    with _loaded_models_lock:
+        _loaded_models.clear()
+
+
+class PolicyNet:
+    """The policy network model
+
+        Defines the neural net architecture for the policy net, ie the neural net which
+        calculates the action sampling distribution.
+
+        Every net has a model of its own, unless it is made with shared=True, when it
+        uses the process wide compiled model of its board size, and training one shared
+        net trains them all.
+
+        The model is only built the first time it is used, so nets which load a saved
+        model, or are created before forking workers, never pay for a build.
+    """
+    def __init__(self, size=9, shared=False):
+        """Create a policy net for a board size
+
+        :param size: int            board size
+        :param shared: boolean      True -> use the process wide model for the size
+        """
+        self.size = size
+        self.board_shape = board_shape(size)
+        self.action_space = list(range(size**2))
+
+        self._shared = shared
+        self._model = None
+
+    @classmethod
+    def from_file(cls, h5model, inference=True):
+        """Create a policy net of a saved model using the process wide model registry
+
+        A board size subclass, such as policy9x9.PolicyNet, only loads models of its size.
+
+        :param h5model: str             saved model file
+        :param inference: boolean       True -> load without compiling, for predictions only
+        :raises: ValueError if the model is of another board size than the class
+        :return: PolicyNet
+        """
+        model = load_cached_model(h5model, inference=inference)
+        size = int(round(np.sqrt(model.output_shape[-1])))
+        net = cls(size=size) if cls is PolicyNet else cls()
+        if net.size != size:
+            raise ValueError('The model is of a {0}x{0} board'.format(size))
+        net.model = model
+        return net
+
+    @property
+    def model(self):
+        """The keras model, which is built on first use
+
+        :return: keras Model
+        """
+        if self._model is None:
+            if self._shared:
+                self._model = compiled_model(self.size)
+            else:
+                self._build()
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    def _build(self, summary=True, **kwargs):
+        """Creates neural network architecture
+
+        :param summary: boolean         True -> prints keras model summary
+        :param kwargs: unpacked dict    model.compile keywords
+        """
+        self.model = build_model(self.size, summary=summary, **kwargs)
+
+    def train(self, observations, actionrewards, **kwargs):
+        """Train model on observations given the action's rewards
+
+        :param observations: array
+        :param actionrewards: array
+        :param kwargs: unpacked dict    model.fit keywords
+        """
+        self.model.fit([observations[:,:2,:,:], observations[:,2,:,:]],
+                       actionrewards,
+                       verbose=kwargs.pop('verbose', 2),
+                       **kwargs
+                       )
+
+    def train_batches(self, batches, steps_per_epoch, **kwargs):
+        """Train model on a stream of minibatches
+
+        Use the nn.datasets pipelines to stream, augment and prefetch the minibatches.
+
+        :param batches: iter            over ([stones, open], actionrewards)
+        :param steps_per_epoch: int     minibatches per epoch
+        :param kwargs: unpacked dict    model.fit_generator keywords
+        """
+        self.model.fit_generator(batches,
+                                 steps_per_epoch=steps_per_epoch,
+                                 verbose=kwargs.pop('verbose', 2),
+                                 **kwargs
+                                 )
+
+    def probailities(self, position, **kwargs):
+        """Action policy for given position
+
+        :param position: array          OpenAI Go board position
+        :param kwargs: unpacked dict    model.predict keywords
+        :return: array                  action probabilities
+        """
+        if position.shape == self.board_shape:
+            position = position.reshape((1,) + self.board_shape)
+
+        return np.array(self.model.predict([position[:, :2, :, :], position[:,2,:,:]], **kwargs)).reshape((len(self.action_space),))
+
+    def batch_probabilities(self, positions, **kwargs):
+        """Action policies for a batch of positions
+
+        All positions are evaluated in a single model.predict call.
+
+        :param positions: array         N x board_shape OpenAI board positions
+        :param kwargs: unpacked dict    model.predict keywords
+        :return: array                  N x (action space) action probabilities
+        """
+        positions = np.asarray(positions).reshape((-1,) + self.board_shape)
+        kwargs.setdefault('batch_size', len(positions))
+        return np.array(self.model.predict([positions[:, :2, :, :], positions[:, 2, :, :]], **kwargs))
+
+    def batch_moves(self, positions, legal=None):
+        """Make a move on each of a batch of go boards
+
+        :param positions: array         N x board_shape OpenAI board positions
+        :param legal: array             N x (action space) booleans, None -> open intersections
+        :return: array                  N moves, pass is len(action_space)
+        """
+        positions = np.asarray(positions).reshape((-1,) + self.board_shape)
+        if legal is None:
+            legal = positions[:, 2, :, :].reshape(len(positions), len(self.action_space))
+        return sample_actions(self.batch_probabilities(positions), legal=legal)
+
+    def move(self, position):
+        """Make a move from a go board
+
+        :return: int    move from the game
+        """
+        probs = self.probailities(position=position)
+        probs = probs / np.sum(probs)
+        return np.random.choice(self.action_space, p=probs)
+
+    def save(self, fileheader, folder='models'):
+        """Save the model json and weights
+
+        Files are saved with a time tag to ensure uniqueness.
+
+        :param fileheader: str    prepended to both file names
+        :param folder: str        folder to save model and weights
+        """
+        time = datetime.now().strftime('%Y%m%d%H%M')
+        filename = '_'.join([fileheader, time])
+
+        h5name = '.'.join([filename, 'h5'])
+        self.model.save(path.join(folder, h5name))
+
+    def load_model(self, h5model, cached=False, inference=False):
+        """Load model from json description
+
+        This will replace self.model.  A net which has not used its model yet never
+        builds one.
+
+        :param h5model: str             saved model file
+        :param cached: boolean          True -> use the process wide model registry
+        :param inference: boolean       True -> load without compiling, for predictions only
+        """
+        if cached:
+            self.model = load_cached_model(h5model, inference=inference)
+        else:
+            self.model = models.load_model(h5model,
+                                           custom_objects={'rewardloss': rewardloss},
+                                           compile=not inference)
@@ -0,0 +1,263 @@
+"""Self-play generation of policy net training data
+
+Games are played between PolicyNet and/or MCTS players across a pool of processes.  The
+positions, moves and rewards of every game are streamed to numpy shards in the layout of
+the OpenAI Go position data, which nn.datasets.openai_batches reads and
+PolicyNet.train consumes:
+
+    positions       N x 3 x SIZE x SIZE uint8 planes of black, white and open intersections
+    moves           N integer moves
+    rewards         N floats, 1 if the player making the move won the game, else -1
+"""
+from datetime import datetime
+from multiprocessing import Pool
+from os import path, makedirs
+import random
+import time
+
+import numpy as np
+from thick_goban import go
+
+import mcts
+from nn import policy
+from openai_go.environment import own_eyes, position_observation
+
+
+class PolicyPlayer:
+    """Player sampling its moves from a policy net
+
+    The net is created in the process where the player first moves, so players can be
+    sent to worker processes, and each worker loads the model file once.
+    """
+    def __init__(self, h5model=None):
+        """
+        :param h5model: str     saved model file, None -> untrained net of the board size
+        """
+        self.h5model = h5model
+        self._net = None
+
+    def __getstate__(self):
+        return {'h5model': self.h5model, '_net': None}
+
+    def net(self, size):
+        """Return the policy net of the player
+
+        :param size: int
+        :return: PolicyNet
+        """
+        if self._net is None:
+            if self.h5model is None:
+                self._net = policy.PolicyNet(size=size, shared=True)
+            else:
+                self._net = policy.PolicyNet.from_file(self.h5model)
+        return self._net
+
+    def move(self, position):
+        """Play a move sampled from the policy on position
+
+        Single point eyes of the player are never filled.
+
+        :param position: go.Position
+        :return: int        move played, None if there is no legal move
+        """
+        observation = position_observation(position)
+        probabilities = self.net(position.size).batch_probabilities(observation)
+        legal = observation[2].astype(bool) & ~own_eyes(observation, position.next_player)
+        legal = legal.reshape(probabilities.shape)
+
+        while True:
+            move_pt = int(policy.sample_actions(probabilities, legal=legal)[0])
+            if move_pt == legal.shape[1]:
+                return None
+            try:
+                position.move(move_pt=move_pt)
+            except go.MoveError:
+                legal[0, move_pt] = False
+            else:
+                return move_pt
+
+
+class SearchPlayer:
+    """Player searching for its moves with mcts.move_search"""
+    def __init__(self, sim_limit=1000):
+        """
+        :param sim_limit: int   simulations per move
+        """
+        self.sim_limit = sim_limit
+
+    def move(self, position):
+        """Play the move found by a search of position
+
+        The best child may be an AMAF move which was never tried, and so illegal, when
+        the children are tried in order of visits instead.
+
+        :param position: go.Position
+        :return: int        move played, None if there is no legal move
+        """
+        rootnode = mcts.search(mcts.NodeMCTS(state=position), sim_limit=self.sim_limit)
+        try:
+            candidates = [rootnode.bestchild()]
+        except ValueError:      # nothing left to search
+            candidates = []
+        candidates += sorted(rootnode.children, key=lambda name: -rootnode.children[name].sims)
+        for move_pt in candidates:
+            try:
+                position.move(move_pt=move_pt)
+            except go.MoveError:
+                continue
+            return move_pt
+        return None
+
+
+def play_game(black, white, size=9, komi=7.5, move_limit=None):
+    """Play one game and record every move
+
+    The game ends when the player to move has no legal move left, or after move_limit
+    moves.
+
+    :param black: player        object with a move(position) method
+    :param white: player
+    :param size: int
+    :param komi: float
+    :param move_limit: int      None -> 3 * SIZE**2
+    :return: (array, array, array)  positions, moves, rewards
+    """
+    if move_limit is None:
+        move_limit = 3 * size**2
+    position = go.Position(size=size, komi=komi)
+    players = {go.BLACK: black, go.WHITE: white}
+
+    positions, moves, colours = [], [], []
+    for _ in range(move_limit):
+        colour = position.next_player
+        observation = position_observation(position)
+        move_pt = players[colour].move(position)
+        if move_pt is None:
+            break
+        positions.append(observation)
+        moves.append(move_pt)
+        colours.append(colour)
+
+    rewards = np.where(np.array(colours) == position.winner(), 1., -1.)
+    return (np.array(positions, dtype=np.uint8).reshape((-1, 3, size, size)),
+            np.array(moves, dtype=int),
+            rewards)
+
+
+def _play_seeded(args):
+    """Play a game in a worker process, with its own random seed
+
+    :param args: tuple      seed and play_game arguments
+    :return: tuple          play_game results
+    """
+    seed, black, white, size, komi, move_limit = args
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    return play_game(black, white, size=size, komi=komi, move_limit=move_limit)
+
+
+class SelfPlay:
+    """Self-play engine writing games to numpy shards
+
+    >>> engine = SelfPlay(PolicyPlayer(), SearchPlayer(sim_limit=100), folder='selfplay')
+    """
+    def __init__(self, black, white, size=9, komi=7.5, move_limit=None, swap=True,
+                 folder='selfplay', shard_size=10000, processes=None):
+        """
+        :param black: player        player of black in the first game
+        :param white: player
+        :param size: int
+        :param komi: float
+        :param move_limit: int      maximum moves per game
+        :param swap: boolean        True -> the players swap colours every game
+        :param folder: str          folder the shards are saved in
+        :param shard_size: int      positions per shard
+        :param processes: int       worker processes, None -> one per cpu
+        """
+        self.players = (black, white)
+        self.size = size
+        self.komi = komi
+        self.move_limit = move_limit
+        self.swap = swap
+        self.folder = folder
+        self.shard_size = shard_size
+        self.processes = processes
+
+        self.games = 0
+        self.positions = 0
+        self.shards = []
+        self._buffer = []
+        self._started = None
+
+    def throughput(self):
+        """Return the games and positions generated per hour so far
+
+        :return: dict
+        """
+        hours = max(time.time() - self._started, 1e-9) / 3600 if self._started else float('inf')
+        return {'games': self.games,
+                'positions': self.positions,
+                'games_per_hour': self.games / hours,
+                'positions_per_hour': self.positions / hours,
+                }
+
+    def run(self, games, report_every=100, report=None):
+        """Play games across the process pool, saving shards as they fill
+
+        :param games: int
+        :param report_every: int    games between reports, 0 -> never
+        :param report: callable     called with the throughput, None -> no reports
+        :return: dict               throughput
+        """
+        makedirs(self.folder, exist_ok=True)
+        self._started = time.time()
+        seeds = np.random.randint(2**31, size=games)
+
+        def game_args():
+            for game, seed in enumerate(seeds):
+                black, white = self.players
+                if self.swap and game % 2:
+                    black, white = white, black
+                yield int(seed), black, white, self.size, self.komi, self.move_limit
+
+        with Pool(processes=self.processes) as pool:
+            for positions, moves, rewards in pool.imap_unordered(_play_seeded, game_args()):
+                self._buffer.append((positions, moves, rewards))
+                self.games += 1
+                self.positions += len(moves)
+                if sum(len(buffered[1]) for buffered in self._buffer) >= self.shard_size:
+                    self._save_shard()
+                if report is not None and report_every and self.games % report_every == 0:
+                    report(self.throughput())
+
+        if self._buffer:
+            self._save_shard()
+        return self.throughput()
+
+    def _save_shard(self):
+        """Save the buffered games in a new shard"""
+        positions, moves, rewards = (np.concatenate(column) for column in zip(*self._buffer))
+        time_tag = datetime.now().strftime('%Y%m%d%H%M%S')
+        shard = path.join(self.folder, 'selfplay_{0}_{1:04d}.npz'.format(time_tag, len(self.shards)))
+        np.savez(shard, positions=positions, moves=moves, rewards=rewards)
+        self.shards.append(shard)
+        self._buffer = []
+
+
+def load_shards(shards):
+    """Load and concatenate self-play shards
+
+    :param shards: iter         shard file names
+    :return: (array, array, array)  positions, moves, rewards
+    """
+    columns = ([], [], [])
+    for shard in shards:
+        with np.load(shard) as data:
+            for column, name in zip(columns, ['positions', 'moves', 'rewards']):
+                column.append(data[name])
+    return tuple(np.concatenate(column) for column in columns)
+
+
+if __name__ == '__main__':
+    engine = SelfPlay(PolicyPlayer(), SearchPlayer(sim_limit=100))
+    print(engine.run(games=1000, report=print))
@@ -0,0 +1,208 @@
+"""Batched local go environments in the OpenAI Go9x9-v0 style
+
+VectorGoEnv runs many thick_goban games in lockstep, without any gym service.  Every step
+takes one action per board and returns batched arrays:
+
+    observations    N x 3 x SIZE x SIZE uint8 planes of black, white and open, the
+                    PolicyNet input layout
+    rewards         N floats, 1 for an agent win and -1 for a loss when a game ends
+    dones           N booleans, True for games which ended on the step
+
+As in OpenAI Go, the actions are the board intersections followed by pass and resign, and
+an illegal move loses the game.
+"""
+import numpy as np
+from thick_goban import go
+
+
+def position_observation(position):
+    """Return the OpenAI style observation of a thick_goban Position
+
+    :param position: go.Position
+    :return: np.array           3 x SIZE x SIZE uint8 planes of black, white and open
+    """
+    colours = np.asarray(position.board._board_colour).reshape(position.size, position.size)
+    planes = np.array((go.BLACK, go.WHITE, go.OPEN)).reshape(3, 1, 1)
+    return (colours == planes).astype(np.uint8)
+
+
+def own_eyes(observation, colour):
+    """Return the single point eyes of a colour
+
+    An open intersection is an eye if all its neighbours on the board are the colour.
+
+    :param observation: array   3 x SIZE x SIZE planes of black, white and open
+    :param colour: int          go.BLACK or go.WHITE
+    :return: array              SIZE x SIZE booleans
+    """
+    own = observation[0 if colour == go.BLACK else 1].astype(bool)
+    padded = np.pad(own, 1, mode='constant', constant_values=True)
+    surrounded = padded[:-2, 1:-1] & padded[2:, 1:-1] & padded[1:-1, :-2] & padded[1:-1, 2:]
+    return surrounded & observation[2].astype(bool)
+
+
+class VectorGoEnv:
+    """N go games played in lockstep against an opponent
+
+    >>> env = VectorGoEnv(n_envs=4, size=9)
+    >>> env.reset().shape
+    (4, 3, 9, 9)
+    """
+    def __init__(self, n_envs, size=9, komi=7.5, agent_colour=go.BLACK, opponent='random',
+                 move_limit=None, auto_reset=True):
+        """
+        :param n_envs: int          number of games
+        :param size: int            board size
+        :param komi: float
+        :param agent_colour: int    go.BLACK or go.WHITE
+        :param opponent: callable   'random', None for the agent to play both colours, or
+                                    opponent(position, colour) playing a move on position
+                                    and returning it, None for a pass
+        :param move_limit: int      moves before a game is scored, None -> 3 * SIZE**2
+        :param auto_reset: boolean  True -> ended games restart at the end of the step
+        """
+        self.n_envs = n_envs
+        self.size = size
+        self.komi = komi
+        self.agent_colour = agent_colour
+        self.opponent = random_move if opponent == 'random' else opponent
+        self.move_limit = 3 * size**2 if move_limit is None else move_limit
+        self.auto_reset = auto_reset
+
+        self.pass_action = size**2
+        self.resign_action = size**2 + 1
+        self.action_space = size**2 + 2
+
+        self.positions = [None] * n_envs
+        self.to_play = np.zeros(n_envs, dtype=int)
+        self.passes = np.zeros(n_envs, dtype=int)
+        self.moves = np.zeros(n_envs, dtype=int)
+        self.observations = np.zeros((n_envs, 3, size, size), dtype=np.uint8)
+
+    def reset(self, envs=None):
+        """Start new games
+
+        :param envs: iter       indexes of the games to restart, None -> all
+        :return: array          observations of all games
+        """
+        for env in range(self.n_envs) if envs is None else envs:
+            self.positions[env] = go.Position(size=self.size, komi=self.komi)
+            self.to_play[env] = go.BLACK
+            self.passes[env] = 0
+            self.moves[env] = 0
+            if self.opponent is not None and self.agent_colour != go.BLACK:
+                self._opponent_move(env)
+            self.observations[env] = position_observation(self.positions[env])
+        return self.observations
+
+    def legal_moves(self):
+        """Return the actions which may be legal in each game
+
+        Open intersections, pass and resign are allowed.  A suicide or ko capture can only
+        be detected by playing it, and loses the game.
+
+        :return: array      N x action_space booleans
+        """
+        legal = np.ones((self.n_envs, self.action_space), dtype=bool)
+        legal[:, :self.size**2] = self.observations[:, 2].reshape(self.n_envs, self.size**2)
+        return legal
+
+    def step(self, actions):
+        """Play an action in every game
+
+        The observations array is updated in place and returned.
+
+        :param actions: array       N integer actions
+        :return: (array, array, array, dict)
+                 observations, rewards, dones and info with the winner of ended games
+        """
+        rewards = np.zeros(self.n_envs)
+        dones = np.zeros(self.n_envs, dtype=bool)
+        winners = np.zeros(self.n_envs, dtype=int)
+
+        for env, action in enumerate(np.asarray(actions, dtype=int)):
+            mover = self.to_play[env]
+            winner = self._play(env, action)
+            if winner is None and self.opponent is not None:
+                winner = self._opponent_move(env)
+            if winner is None and self.moves[env] >= self.move_limit:
+                winner = self.positions[env].winner()
+
+            if winner is not None:
+                dones[env] = True
+                winners[env] = winner
+                perspective = mover if self.opponent is None else self.agent_colour
+                rewards[env] = 1. if winner == perspective else -1.
+            else:
+                self.observations[env] = position_observation(self.positions[env])
+
+        ended = np.flatnonzero(dones)
+        if self.auto_reset:
+            self.reset(ended)
+        else:
+            for env in ended:
+                self.observations[env] = position_observation(self.positions[env])
+
+        return self.observations, rewards, dones, {'winners': winners}
+
+    def _play(self, env, action):
+        """Play an action for the player to move in a game
+
+        :return: int        winner if the game ended, else None
+        """
+        colour = self.to_play[env]
+        self.to_play[env] = -colour
+        if action == self.resign_action:
+            return -colour
+        elif action == self.pass_action:
+            return self._pass(env)
+
+        try:
+            self.positions[env].move(move_pt=int(action), colour=colour)
+        except go.MoveError:
+            return -colour
+        self.passes[env] = 0
+        self.moves[env] += 1
+        return None
+
+    def _pass(self, env):
+        """Pass for the player to move, scoring the game after two passes in a row
+
+        :return: int        winner if the game ended, else None
+        """
+        self.passes[env] += 1
+        if self.passes[env] >= 2:
+            return self.positions[env].winner()
+        return None
+
+    def _opponent_move(self, env):
+        """Let the opponent move in a game
+
+        :return: int        winner if the game ended, else None
+        """
+        colour = self.to_play[env]
+        move_pt = self.opponent(self.positions[env], colour)
+        self.to_play[env] = -colour
+        if move_pt is None:
+            return self._pass(env)
+        self.passes[env] = 0
+        self.moves[env] += 1
+        return None
+
+
+def random_move(position, colour):
+    """Play a random legal move which does not fill one of the colour's eyes
+
+    :param position: go.Position
+    :param colour: int          go.BLACK or go.WHITE
+    :return: int                move played, None if there is no such move
+    """
+    observation = position_observation(position)
+    candidates = np.flatnonzero(observation[2].astype(bool) & ~own_eyes(observation, colour))
+    for move_pt in np.random.permutation(candidates):
+        try:
+            position.move(move_pt=int(move_pt), colour=colour)
+        except go.MoveError:
+            continue
+        return int(move_pt)
+    return None
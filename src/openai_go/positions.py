@@ -2,6 +2,9 @@
 import numpy as np
 
 
+COLOUR_VALUES = np.array((1, 255, 128))       # black, white, board
+
+
 def convert_observation(go_obs):
     """Convert openai game observations into greyscale image
 
@@ -12,9 +15,55 @@ def convert_observation(go_obs):
     :param go_obs: np.array     SIZE x SIZE x 3
     :return: np.array           SIZE x SIZE
     """
-    if len(go_obs.shape) == 3:
+    go_obs = np.asarray(go_obs)
+    return convert_observations(go_obs, dtype=np.result_type(go_obs, COLOUR_VALUES))
+
+
+def convert_observations(go_obs, out=None, dtype=np.uint8):
+    """Convert a batch of openai game observations into greyscale images
+
+    The planes are weighted by their colour values and summed in a single pass, written
+    straight into out, so no temporary the size of the observations is created.
+
+    >>> obs = np.zeros((1, 3, 2, 2), dtype=np.float32)
+    >>> obs[0, 0, 0, 0] = obs[0, 1, 1, 1] = obs[0, 2, 0, 1] = obs[0, 2, 1, 0] = 1
+    >>> convert_observations(obs)
+    array([[[  1, 128],
+            [128, 255]]], dtype=uint8)
+
+    :param go_obs: np.array     N x 3 x SIZE x SIZE, or 3 x SIZE x SIZE
+    :param out: np.array        N x SIZE x SIZE to write the images in, None -> new array
+    :param dtype: np.dtype      of the new array when out is None
+    :return: np.array           N x SIZE x SIZE
+    """
+    if go_obs.ndim == 3:
         go_obs = go_obs[np.newaxis]
+    if out is None:
+        out = np.empty((go_obs.shape[0],) + go_obs.shape[2:], dtype=dtype)
+
+    return np.einsum('nc...,c->n...', go_obs, COLOUR_VALUES.astype(out.dtype),
+                     out=out, dtype=out.dtype, casting='unsafe')
+
+
+def grayscale_observations(gray, out=None, dtype=np.uint8):
+    """Convert greyscale images back into openai game observations
+
+    The reverse of convert_observations.
+
+    >>> gray = np.array([[[1, 128], [128, 255]]], dtype=np.uint8)
+    >>> print((convert_observations(grayscale_observations(gray)) == gray).all())
+    True
+
+    :param gray: np.array       N x SIZE x SIZE, or SIZE x SIZE
+    :param out: np.array        N x 3 x SIZE x SIZE to write the planes in, None -> new array
+    :param dtype: np.dtype      of the new array when out is None
+    :return: np.array           N x 3 x SIZE x SIZE planes of black, white and board
+    """
+    gray = np.asarray(gray)
+    if gray.ndim == 2:
+        gray = gray[np.newaxis]
+    if out is None:
+        out = np.empty((gray.shape[0], 3) + gray.shape[1:], dtype=dtype)
+
+    return np.equal(gray[:, np.newaxis], COLOUR_VALUES.reshape(1, 3, 1, 1), out=out, casting='unsafe')
 
-    colour_values = np.array((1, 255, 128)).reshape(1,3,1,1)       # black, white, board
-    scaled_obs = go_obs * colour_values
-    return np.sum(scaled_obs, axis=1)
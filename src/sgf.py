@@ -301,20 +301,57 @@ def create_pro_hdf5(file=SGF_H5, direc=DATA_DIR, sgf_direc=SGF_DIR, limit=np.inf
         raise ValueError('Incorrectly constructed sgfs\n'+'\n'.join(failed_sgfs))
 
 
-def parse_to_thick_goban(sgf_file_name):
+def parse_to_thick_goban(sgf_file_name, move_limit=None):
     """Parse an sgf file into a Position object
 
     :param sgf_file_name: string of the file location
+    :param move_limit: int number of moves to play, None -> all
     :return: thick_goban.Position
     """
     with open(sgf_file_name, 'r') as sgf_file:
         sgf_str = sgf_file.read()
-    game_details = next(store_parser([(sgf_file_name, sgf_str)]))
 
-    return go.Position(moves=game_details['moves'],
-                       setup=game_details['setup'],
-                       size=game_details.get('SZ', 19),
-                       komi=game_details.get('KM', '6.5'))
+    return sgf_str_to_thick_goban(sgf_str, sgf_name=sgf_file_name, move_limit=move_limit)
+
+
+def sgf_str_to_thick_goban(sgf_str, sgf_name='', move_limit=None):
+    """Parse an sgf string into a Position object
+
+    :param sgf_str: SGF string
+    :param sgf_name: string naming the sgf in error messages
+    :param move_limit: int number of moves to play, None -> all
+    :return: thick_goban.Position
+    """
+    game = sgf_str_to_game(sgf_str, sgf_name=sgf_name)
+    return go.Position(moves=game['moves'][:move_limit],
+                       setup=game['setup'],
+                       size=game['size'],
+                       komi=game['komi'])
+
+
+def sgf_str_to_game(sgf_str, sgf_name=''):
+    """Parse an sgf string into the setup and moves of its main branch
+
+    >>> sgf_str_to_game('(;SZ[9]KM[7.5];B[ee];W[ce])')['moves']
+    [(40, 1), (38, -1)]
+
+    :param sgf_str: SGF string
+    :param sgf_name: string naming the sgf in error messages
+    :return: dict       name, size, komi, setup and moves as (point, colour) lists
+    """
+    game_details = next(store_parser([(sgf_name, sgf_str)]))
+    size = int(game_details.get('SZ', 19))
+
+    def resize(moves):
+        """store_parser numbers points on a 19x19 board"""
+        return [(pt % 19 + (pt // 19)*size, player) for pt, player in moves]
+
+    return {'name': sgf_name,
+            'size': size,
+            'komi': float(game_details.get('KM', '6.5')),
+            'setup': resize(game_details['setup']),
+            'moves': resize(game_details['moves']),
+            }
 
 
 class Library:
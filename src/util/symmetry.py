@@ -0,0 +1,86 @@
+"""Dihedral symmetries of a square go board
+
+The eight symmetries of the square (four rotations, each optionally mirrored) are
+represented as permutations of the flattened board intersections, so that any number
+of boards can be transformed with a single fancy-indexing operation.
+
+Intersections are numbered row by row, pt = x + y*size, the same as thick_goban moves.
+"""
+import numpy as np
+
+
+SYMMETRIES = 8
+
+
+def dihedral_indexes(size):
+    """Return the source index permutations of the eight board symmetries
+
+    Row s of the returned array satisfies
+        transformed_board.ravel()[j] == board.ravel()[indexes[s, j]]
+    Symmetry 0 is the identity.
+
+    >>> dihedral_indexes(2)
+    array([[0, 1, 2, 3],
+           [1, 0, 3, 2],
+           [1, 3, 0, 2],
+           [3, 1, 2, 0],
+           [3, 2, 1, 0],
+           [2, 3, 0, 1],
+           [2, 0, 3, 1],
+           [0, 2, 1, 3]])
+
+    :param size: int
+    :return: array      SYMMETRIES x size**2
+    """
+    grid = np.arange(size**2).reshape(size, size)
+    indexes = []
+    for rotations in range(4):
+        rotated = np.rot90(grid, k=rotations)
+        indexes.append(rotated.ravel())
+        indexes.append(np.fliplr(rotated).ravel())
+    return np.array(indexes)
+
+
+def inverse_indexes(indexes):
+    """Return the destination index of every intersection under each symmetry
+
+    For a move at intersection pt, the transformed move is inverse[s, pt].
+
+    :param indexes: array       dihedral_indexes output
+    :return: array              same shape as indexes
+    """
+    return np.argsort(indexes, axis=-1)
+
+
+def transform_boards(boards, symmetries):
+    """Apply a symmetry to each board in a batch
+
+    The last two axes of boards are the board axes, so both OpenAI style observations
+    (N x planes x size x size) and grayscale positions (N x size x size) are accepted.
+
+    :param boards: array        N x ... x size x size
+    :param symmetries: array    N integers in range(SYMMETRIES)
+    :return: array              transformed copy of boards
+    """
+    size = boards.shape[-1]
+    flat = boards.reshape(boards.shape[:-2] + (size**2,))
+    gather = dihedral_indexes(size)[symmetries]
+    gather = gather.reshape((len(symmetries),) + (1,)*(flat.ndim - 2) + (size**2,))
+    return np.take_along_axis(flat, gather, axis=-1).reshape(boards.shape)
+
+
+def transform_moves(moves, symmetries, size):
+    """Apply a symmetry to each move in a batch
+
+    Moves outside the board, like the pass and resign actions of OpenAI Go, are unchanged.
+
+    :param moves: array         N integer moves
+    :param symmetries: array    N integers in range(SYMMETRIES)
+    :param size: int
+    :return: array              N transformed moves
+    """
+    moves = np.asarray(moves)
+    on_board = moves < size**2
+    moved = moves.copy()
+    moved[on_board] = inverse_indexes(dihedral_indexes(size))[symmetries[on_board], moves[on_board]]
+    return moved
@@ -0,0 +1,94 @@
+"""Zobrist hashes of go positions, reduced over the board symmetries
+
+Every stone on an intersection has a random 64 bit key, and a position hashes to the
+XOR of the keys of its stones, and of a side key when white is to move.  The canonical
+hash of a position is the smallest hash of its eight symmetric boards, so positions
+that are rotations or reflections of each other hash the same.  The symmetry taking a
+position to its canonical board is returned too, to map moves between the two.
+
+Boards are flattened arrays of thick_goban colours, 1 black, -1 white and 0 open.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from util import symmetry
+
+
+SEED = 19
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(size):
+    """Return the stone keys and side key of a board size
+
+    The keys come from a fixed seed, so hashes can be stored and compared across runs.
+
+    :param size: int
+    :return: (array, uint64)    2 x size**2 keys of black and white stones, white to move key
+    """
+    rng = np.random.default_rng(SEED + size)
+    keys = rng.integers(1, 2**64, size=2*size**2 + 1, dtype=np.uint64)
+    return keys[:-1].reshape(2, size**2), keys[-1]
+
+
+def hash_boards(boards, size):
+    """Return the plain hash of each board, without reducing over the symmetries
+
+    :param boards: array        ... x size**2 colours
+    :param size: int
+    :return: array              ... uint64 hashes
+    """
+    keys, _ = zobrist_keys(size)
+    keyed = np.where(boards == 1, keys[0], np.where(boards == -1, keys[1], np.uint64(0)))
+    return np.bitwise_xor.reduce(keyed, axis=-1)
+
+
+def board_hashes(boards, players=None):
+    """Return the canonical hash and symmetry of each board
+
+    >>> board = np.zeros(9, dtype=int)
+    >>> board[0] = 1
+    >>> corners = np.zeros((4, 9), dtype=int)
+    >>> corners[range(4), [0, 2, 6, 8]] = 1
+    >>> hashes, symmetries = board_hashes(corners)
+    >>> len(set(hashes))
+    1
+
+    :param boards: array        N x size**2 colours
+    :param players: array       N colours to move, None -> the side is not hashed
+    :return: (array, array)     N uint64 hashes, N symmetries into the canonical board
+    """
+    boards = np.asarray(boards)
+    boards = boards.reshape(len(boards), -1)
+    size = int(round(np.sqrt(boards.shape[1])))
+    _, side_key = zobrist_keys(size)
+
+    # transformed[n, s, j] is intersection j of board n under symmetry s
+    hashes = hash_boards(boards[:, symmetry.dihedral_indexes(size)], size)
+    if players is not None:
+        hashes ^= np.where(np.asarray(players) == -1, side_key, np.uint64(0))[:, None]
+
+    symmetries = hashes.argmin(axis=1)
+    return hashes[np.arange(len(boards)), symmetries], symmetries
+
+
+def position_hash(state):
+    """Return the canonical hash and symmetry of a position with its player to move
+
+    :param state: go.Position
+    :return: (int, int)     hash, symmetry into the canonical board
+    """
+    hashes, symmetries = board_hashes([state.board._board_colour], [state.next_player])
+    return int(hashes[0]), int(symmetries[0])
+
+
+def gray_boards(gray):
+    """Convert Library grayscale positions to flat colour boards
+
+    :param gray: array      N x size x size uint8 of 1 black, 255 white, 128 open
+    :return: array          N x size**2 int8 colours
+    """
+    gray = np.asarray(gray)
+    boards = (gray == 1).astype(np.int8) - (gray == 255).astype(np.int8)
+    return boards.reshape(len(gray), -1)
@@ -0,0 +1,81 @@
+from copy import deepcopy
+
+import pytest
+from thick_goban import go
+
+from mcts.analysis import AnalysisWorker
+
+
+TIMEOUT = 120   # seconds, only reached when a search hangs
+
+
+@pytest.fixture()
+def worker():
+    analysis = AnalysisWorker(size=9, sim_limit=20, publish_interval=0.01)
+    yield analysis
+    analysis.stop()
+
+
+def test_search_to_limit(worker):
+    """The worker publishes its search of a position up to the simulation limit"""
+    worker.analyse(go.Position(size=9))
+    assert worker.wait(TIMEOUT)
+    assert worker.read()['sims'] == 20
+    assert worker.scores()
+    assert worker.process.is_alive()
+
+
+def test_reuse_tree(worker):
+    """A following position continues the search of its subtree"""
+    position = go.Position(size=9)
+    worker.analyse(position)
+    assert worker.wait(TIMEOUT)
+    latest = worker.read()
+
+    best_move = latest['pv'][0]
+    next_position = deepcopy(position)
+    next_position.move(move_pt=best_move)
+    worker.analyse(next_position)
+    assert worker.wait(TIMEOUT)
+
+    assert worker.read()['seq'] > latest['seq']
+    assert worker.read()['sims'] >= latest['visits'][best_move] > 0
+
+
+def test_new_position(worker):
+    """An unrelated position starts a new search"""
+    worker.analyse(go.Position(size=9))
+    assert worker.wait(TIMEOUT)
+    seq = worker.read()['seq']
+
+    position = go.Position(size=9)
+    for move_pt in [0, 80, 1, 79]:
+        position.move(move_pt=move_pt)
+    worker.analyse(position)
+    assert worker.wait(TIMEOUT)
+    assert worker.read()['seq'] > seq and worker.read()['sims'] == 20
+    assert not set(worker.scores()) & {0, 80, 1, 79}
+
+
+def test_stop(worker):
+    """Stopping ends the worker process"""
+    worker.start()
+    worker.stop()
+    assert not worker.process.is_alive()
+
+
+def test_checkpoint_resume(tmpdir):
+    """A restarted worker carries on from the tree saved when the last one quit"""
+    tree_file = str(tmpdir.join('tree.npz'))
+    first = AnalysisWorker(size=9, sim_limit=20, publish_interval=0.01, checkpoint_file=tree_file)
+    first.analyse(go.Position(size=9))
+    assert first.wait(TIMEOUT)
+    saved = first.read()
+    first.stop(timeout=TIMEOUT)
+
+    second = AnalysisWorker(size=9, sim_limit=20, publish_interval=0.01, checkpoint_file=tree_file)
+    second.analyse(go.Position(size=9))
+    assert second.wait(TIMEOUT)
+    assert second.read()['sims'] == 20
+    assert (second.read()['visits'] == saved['visits']).all()     # loaded at the limit, not searched
+    second.stop()
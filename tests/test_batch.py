@@ -0,0 +1,59 @@
+import os
+
+import h5py
+import numpy as np
+
+from mcts.batch import BatchAnalysis, analyse_game, library_jobs, read_results, sgf_jobs
+import tests.test_fixtures as fixt
+
+
+GAMES = {'one.sgf': '(;SZ[9]KM[7.5];B[ee];W[ce];B[eg])',
+         'two.sgf': '(;SZ[9]KM[7.5];B[cc];W[gg])'}
+
+
+def write_sgfs(directory):
+    for name, sgf_str in GAMES.items():
+        directory.join(name).write(sgf_str)
+    return str(directory)
+
+
+def test_analyse_game():
+    """Every move gets a row, and losses are the changes in win rate"""
+    game = {'name': 'g', 'size': 9, 'komi': 7.5, 'setup': [], 'moves': [(40, 1), (38, -1), (58, 1)]}
+    columns = analyse_game(game, sim_limit=20, blunder=0.5)
+
+    assert list(columns['move']) == [0, 1, 2]
+    assert list(columns['colour']) == [1, -1, 1]
+    assert list(columns['point']) == [40, 38, 58]
+    assert ((0 <= columns['winrate']) & (columns['winrate'] <= 1)).all()
+    assert (np.abs(columns['loss']) <= 1).all()
+    assert (columns['blunder'] == (columns['loss'] >= 0.5)).all()
+
+
+def test_library_jobs(tmpdir):
+    """Library games of a smaller board are renumbered, and their passes analysed"""
+    file_name = str(tmpdir.join('library.h5'))
+    moves = [(80, 1), (380, -1), (79, 1)]     # E5, pass, D5 numbered on a 19x19 board
+    fixt.write_library(file_name, {'small': (moves, {'KM': '7.5'})}, size=9, gray=False)
+    with h5py.File(file_name, 'r') as library:
+        games = list(library_jobs(library))
+
+    assert len(games) == 1
+    assert games[0]['size'] == 9 and games[0]['komi'] == 7.5
+    assert games[0]['moves'] == [(40, 1), (None, -1), (39, 1)]
+    assert list(analyse_game(games[0], sim_limit=5)['point']) == [40, -1, 39]
+
+
+def test_run_and_resume(tmpdir):
+    """Games are checkpointed, and a second run only gathers the results"""
+    sgf_dir = write_sgfs(tmpdir.mkdir('sgfs'))
+    batch = BatchAnalysis(str(tmpdir.join('out')), sim_limit=10, processes=2)
+
+    assert batch.run(sgf_jobs(sgf_dir)) == 2
+    assert len(os.listdir(batch.checkpoints)) == 2
+    results = read_results(batch.results_file)
+    assert len(results['names']) == 2
+    assert len(results['move']) == len(results['loss']) == 5
+
+    assert batch.run(sgf_jobs(sgf_dir)) == 0
+    assert len(read_results(batch.results_file)['move']) == 5
@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+from thick_goban import go
+
+from mcts import benchmark, mcts
+
+
+def test_benchmark_counts_games():
+    """Each position is played with the challenger as both colours"""
+    results = benchmark.benchmark(sim_limit=5, games=1, positions={'tengen': [40]}, move_limit=6)
+    wins, games = results['tengen']
+    assert games == 2
+    assert 0 <= wins <= games
+
+
+def test_widening_child_limit():
+    """Widening nodes allow one more child each time sims**WIDENING reaches a whole number"""
+    node = benchmark.WideningNodeMCTS(state=go.Position(size=9))
+    limits = []
+    for sims in [0, 1, 5, 6, 16, 100]:
+        node.sims = sims
+        limits.append(node.child_limit())
+    assert limits == [2, 3, 3, 4, 5, 8]
+
+
+def test_widening_limits_search():
+    """In a search every widening node keeps within its child limit, which holds a narrow root back"""
+    class Narrow(benchmark.WideningNodeMCTS):
+        WIDENING_START = 1
+        WIDENING = 0.01     # at most 2 children for any number of simulations
+
+    random.seed(1)
+    np.random.seed(1)
+    widened = mcts.search(benchmark.WideningNodeMCTS(state=go.Position(size=9)), sim_limit=60)
+    nodes = [widened]
+    while nodes:
+        node = nodes.pop()
+        assert len(node.children) <= node.child_limit()
+        nodes.extend(node.children.values())
+
+    narrow = mcts.search(Narrow(state=go.Position(size=9)), sim_limit=60)
+    plain = mcts.search(mcts.NodeMCTS(state=go.Position(size=9)), sim_limit=60)
+    assert len(narrow.children) <= 2 < len(plain.children)
+
+
+def test_simulations_gain_strength():
+    """The benchmark scores the strength of simulations: 60 a move beat 1 in most games"""
+    random.seed(1)
+    np.random.seed(1)
+    results = benchmark.benchmark(sim_limit=60, baseline_sim_limit=1, games=3, positions={'empty': []},
+                                  size=5, komi=0.5, move_limit=40)
+    wins, games = results['empty']
+    assert wins > games / 2
@@ -0,0 +1,73 @@
+from os import path
+
+import h5py
+import numpy as np
+import pytest
+from thick_goban import go
+
+import mcts
+from corpus.book import OpeningBook
+from util import symmetry, zobrist
+import tests.test_fixtures as fixt
+
+
+MOVES = [(60, 1), (300, -1), (72, 1)]
+MIRROR = 1     # symmetry of the mirrored game
+
+
+@pytest.fixture(scope='module')
+def library(tmpdir_factory):
+    """Three games of one opening, one of them mirrored"""
+    mirrored = symmetry.transform_moves(np.array([pt for pt, _ in MOVES]), np.full(len(MOVES), MIRROR), 19)
+    games = [(MOVES, 'B+R'), (list(zip(mirrored, [1, -1, 1])), 'W+R'), (MOVES, 'B+3.5')]
+
+    file_name = path.join(str(tmpdir_factory.mktemp('library')), 'library.h5')
+    fixt.write_library(file_name, {name: (moves, {'RE': result}) for name, (moves, result) in enumerate(games)})
+    libr = h5py.File(file_name, 'r')
+    yield libr
+    libr.close()
+
+
+@pytest.fixture(scope='module')
+def book(library):
+    return OpeningBook.build(library, max_moves=2)
+
+
+def test_canonical_hashes():
+    """Symmetric positions hash the same, unless the player to move differs"""
+    position, mirrored = go.Position(), go.Position()
+    position.move(move_pt=60)
+    mirrored.move(move_pt=int(symmetry.transform_moves(np.array([60]), np.array([MIRROR]), 19)[0]))
+
+    assert zobrist.position_hash(position)[0] == zobrist.position_hash(mirrored)[0]
+    position.next_player = go.BLACK
+    assert zobrist.position_hash(position)[0] != zobrist.position_hash(mirrored)[0]
+
+
+def test_lookup_merges_symmetries(book):
+    """Replies to a position are counted over its symmetric positions"""
+    assert len(book.lookup(go.Position())) == 2     # the first move and its mirror
+
+    position = go.Position()
+    position.move(move_pt=60)
+    assert book.lookup(position) == {300: (3, pytest.approx(1 / 3))}
+    assert book.priors(position) == {300: (pytest.approx(1 / 3), 3)}
+    assert book.lookup(go.Position(size=9)) == {}
+
+
+def test_book_move(book):
+    """The book replies with moves played often enough"""
+    position = go.Position()
+    position.move(move_pt=60)
+    assert book.move(position) == 300
+    assert book.move(position, min_count=4) is None
+    assert mcts.move_search(position, book=book) == 300
+
+
+def test_save_load(book, tmpdir):
+    """A saved book loads with the same entries"""
+    file_name = str(tmpdir.join('book.npz'))
+    book.save(file_name)
+    loaded = OpeningBook.load(file_name)
+    assert len(loaded) == len(book)
+    assert (loaded.hashes == book.hashes).all() and (loaded.counts == book.counts).all()
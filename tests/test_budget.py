@@ -0,0 +1,76 @@
+import pytest
+
+from thick_goban import go
+from mcts import mcts
+from mcts.budget import NodeBudget
+from mcts.cache import AnalysisCache
+from mcts.stats import tree_stats
+
+
+def test_search_within_budget():
+    """The tree is kept within the budget, and pruned nodes are recycled"""
+    budget = NodeBudget(capacity=40)
+    rootnode = mcts.NodeMCTS(state=go.Position(size=9), budget=budget)
+    mcts.search(rootnode, sim_limit=300)
+
+    assert rootnode.sims == 300
+    assert budget.pruned > 0
+    assert tree_stats(rootnode)['nodes'] == budget.count <= budget.capacity
+    assert all(node.state is None for nodes in budget.free.values() for node in nodes)
+    assert all(child.budget is budget for child in rootnode.children.values())
+
+
+def test_collapse_keeps_totals():
+    """A collapsed child adds its simulations and win rate to the AMAF totals of its move"""
+    rootnode = mcts.NodeMCTS(state=go.Position(size=9))
+    mcts.search(rootnode, sim_limit=30)
+    child = max(rootnode.children.values(), key=lambda node: node.sims)
+    amaf_sims, amaf_rate = rootnode.amaf_sims[child.name], rootnode.amaf_rates[child.name]
+
+    assert rootnode.collapse(child.name) is child
+    assert child.name not in rootnode.children and rootnode.sims == 30
+    assert rootnode.amaf_sims[child.name] == amaf_sims + child.sims
+    assert rootnode.amaf_rates[child.name] * (amaf_sims + child.sims) == \
+        pytest.approx(amaf_rate * amaf_sims + child.wins)
+
+
+def test_recycled_node():
+    """A recycled node starts again from the new state"""
+    budget = NodeBudget(capacity=10)
+    rootnode = mcts.NodeMCTS(state=go.Position(size=9), budget=budget)
+    child = rootnode.new_child()
+    rootnode.children.pop(child.name)
+    budget.release(child)
+
+    recycled = rootnode.new_child(move_pt=40)
+    assert recycled is child
+    assert recycled.name == 40 and recycled.parent is rootnode and recycled.sims == 1
+    assert recycled.budget is budget and recycled.playout is rootnode.playout
+
+
+def test_free_lists_per_size():
+    """Free nodes of another board size neither get recycled nor block recycling"""
+    budget = NodeBudget(capacity=10)
+    children = []
+    for size in (9, 5):
+        rootnode = mcts.NodeMCTS(state=go.Position(size=size), budget=budget)
+        children.append(rootnode.new_child())
+        rootnode.children.pop(children[-1].name)
+        budget.release(children[-1])
+
+    assert budget.new_node(mcts.NodeMCTS, state=go.Position(size=9)) is children[0]
+    assert budget.new_node(mcts.NodeMCTS, state=go.Position(size=9)) is not children[1]
+    assert budget.free[(mcts.NodeMCTS, 25)] == [children[1]]
+
+
+def test_restored_nodes_counted():
+    """The children of a root restored from the cache are counted by its budget"""
+    cache = AnalysisCache()
+    rootnode = mcts.search(mcts.NodeMCTS(state=go.Position(size=9)), sim_limit=40)
+    cache.store(rootnode)
+
+    budget = NodeBudget(capacity=100)
+    restored = cache.restore(go.Position(size=9), budget=budget)
+    assert restored.budget is budget
+    assert budget.count == 1 + len(restored.children)
+    assert all(child.budget is budget for child in restored.children.values())
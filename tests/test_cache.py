@@ -0,0 +1,92 @@
+import numpy as np
+from thick_goban import go
+
+import mcts
+from mcts.cache import AnalysisCache
+from util import symmetry
+
+
+def searched(position, sims=40):
+    rootnode = mcts.NodeMCTS(state=position)
+    return mcts.search(rootnode, sim_limit=sims)
+
+
+def test_restore_totals():
+    """A restored root has the totals of the stored one"""
+    cache = AnalysisCache()
+    rootnode = searched(go.Position(size=9))
+    cache.store(rootnode)
+
+    restored = cache.restore(go.Position(size=9))
+    assert (restored.sims, restored.wins) == (rootnode.sims, rootnode.wins)
+    assert {name: child.sims for name, child in restored.children.items()} == \
+        {name: child.sims for name, child in rootnode.children.items()}
+    assert (restored.ownership == rootnode.ownership).all()
+
+
+def test_restore_symmetric_position():
+    """A reflected position restores with the moves reflected"""
+    cache = AnalysisCache()
+    position = go.Position(size=9)
+    position.move(move_pt=11)
+    rootnode = searched(position)
+    cache.store(rootnode)
+
+    mirror = symmetry.inverse_indexes(symmetry.dihedral_indexes(9))[1]
+    reflected = go.Position(size=9)
+    reflected.move(move_pt=int(mirror[11]))
+    restored = cache.restore(reflected)
+    assert restored.sims == rootnode.sims
+    assert set(restored.children) == {int(mirror[name]) for name in rootnode.children}
+    assert cache.restore(go.Position(size=9, komi=0.5)) is None
+
+
+def test_lru_and_disk(tmpdir):
+    """Entries evicted from memory are read back from the file, which is bounded too"""
+    file_name = str(tmpdir.join('cache.sqlite'))
+    cache = AnalysisCache(file_name, capacity=1, disk_capacity=2)
+    positions = []
+    for move_pt in [0, 1, 2]:
+        position = go.Position(size=9)
+        position.move(move_pt=move_pt)
+        positions.append(position)
+        cache.store(searched(position, sims=5))
+    assert len(cache) == 1
+
+    reopened = AnalysisCache(file_name)
+    assert reopened.restore(positions[0]) is None
+    assert reopened.restore(positions[1]).sims == 5
+    assert reopened.restore(positions[2]).sims == 5
+
+
+def test_reads_batched(tmpdir):
+    """File reads do not write, and the entries read are kept at the next eviction"""
+    file_name = str(tmpdir.join('cache.sqlite'))
+    cache = AnalysisCache(file_name, capacity=1, disk_capacity=2)
+    positions = []
+    for move_pt in [0, 1]:
+        position = go.Position(size=9)
+        position.move(move_pt=move_pt)
+        positions.append(position)
+        cache.store(searched(position, sims=5))
+
+    assert cache.restore(positions[0]).sims == 5      # read from the file
+    assert not cache.db.in_transaction
+
+    position = go.Position(size=9)
+    position.move(move_pt=2)
+    cache.store(searched(position, sims=5))
+    cache.close()
+    reopened = AnalysisCache(file_name)
+    assert reopened.restore(positions[0]) is not None
+    assert reopened.restore(positions[1]) is None
+
+
+def test_search_resumes():
+    """A cached search carries on from its simulations"""
+    cache = AnalysisCache()
+    position = go.Position(size=9)
+    assert mcts.gof_move_search(None, position, sim_limit=30, cache=cache).sims == 30
+    rootnode = mcts.gof_move_search(None, position, sim_limit=50, cache=cache)
+    assert rootnode.sims == 50
+    assert cache.restore(position).sims == 50
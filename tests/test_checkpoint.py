@@ -0,0 +1,67 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from thick_goban import go
+from mcts import mcts
+from mcts.budget import NodeBudget
+from mcts.checkpoint import load_tree, save_tree
+from mcts.stats import tree_stats
+
+
+@pytest.fixture(scope='module')
+def searched():
+    position = go.Position(size=9, komi=7.5)
+    for move_pt in [40, 30]:
+        position.move(move_pt=move_pt)
+    return mcts.search(mcts.NodeMCTS(state=position), sim_limit=100)
+
+
+def test_save_load(searched, tmpdir):
+    """A loaded tree has the shape and totals of the saved one"""
+    tree_file = str(tmpdir.join('tree.npz'))
+    save_tree(searched, tree_file)
+    loaded = load_tree(tree_file)
+
+    assert tree_stats(loaded) == tree_stats(searched)
+    assert mcts.same_position(loaded.state, searched.state)
+    assert (loaded.sims, loaded.wins) == (searched.sims, searched.wins)
+    assert (loaded.ownership == searched.ownership).all()
+    assert loaded.bestchild() == searched.bestchild()
+    for name, child in searched.children.items():
+        assert loaded.children[name].parent is loaded
+        assert (loaded.children[name].sims, loaded.children[name].wins) == (child.sims, child.wins)
+        assert dict(loaded.children[name].amaf_sims) == dict(child.amaf_sims)
+        assert loaded.children[name].amaf_rates[name] == pytest.approx(child.amaf_rates[name])
+
+
+def test_lazy_states(searched, tmpdir):
+    """Node states are rebuilt from the moves on first use, and the search carries on"""
+    tree_file = str(tmpdir.join('tree.npz'))
+    save_tree(searched, tree_file)
+    loaded = load_tree(tree_file, state=deepcopy(searched.state))
+
+    child = max(loaded.children.values(), key=lambda node: node.sims)
+    assert child._state is None
+    assert mcts.same_position(child.state, searched.children[child.name].state)
+    assert child._state is not None
+
+    mcts.search(loaded, sim_limit=loaded.sims + 20)
+    assert loaded.sims == searched.sims + 20
+    with pytest.raises(ValueError):
+        load_tree(tree_file, state=go.Position(size=9))
+
+
+def test_load_with_budget(searched, tmpdir):
+    """The nodes of a tree loaded with a budget are counted, and have mutables of their own"""
+    tree_file = str(tmpdir.join('tree.npz'))
+    save_tree(searched, tree_file)
+    budget = NodeBudget(capacity=10000)
+    loaded = load_tree(tree_file, budget=budget)
+
+    assert budget.count == tree_stats(loaded)['nodes']
+    first, second = list(loaded.children.values())[:2]
+    assert first.budget is budget
+    assert first.children is not second.children and first.ownership is not second.ownership
+    assert first.amaf_sims is not second.amaf_sims
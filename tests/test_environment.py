@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from thick_goban import go
+
+from openai_go.environment import VectorGoEnv, own_eyes, random_move
+
+
+@pytest.fixture()
+def env():
+    environment = VectorGoEnv(n_envs=6, size=9)
+    environment.reset()
+    return environment
+
+
+def test_reset_observations(env):
+    """New games are all open with one black stone for agents playing white"""
+    assert env.observations.shape == (6, 3, 9, 9)
+    assert (env.observations[:, 2] == 1).all()
+
+    white_env = VectorGoEnv(n_envs=2, size=9, agent_colour=go.WHITE)
+    observations = white_env.reset()
+    assert (observations[:, 0].sum(axis=(1, 2)) == 1).all()
+
+
+def test_legal_moves(env):
+    """Open intersections, pass and resign are legal"""
+    legal = env.legal_moves()
+    assert legal.shape == (6, 83)
+    assert legal.all()
+
+    env.step(np.zeros(6, dtype=int))
+    legal = env.legal_moves()
+    assert not legal[:, 0].any()
+    assert (legal.sum(axis=1) == 83 - 2).all()      # agent and opponent stones
+
+
+def test_resign_and_illegal(env):
+    """Resigning or playing on a stone loses the game"""
+    env.step(np.zeros(6, dtype=int))
+    actions = np.array([0, 0, 0, 82, 82, 82])
+    _, rewards, dones, info = env.step(actions)
+
+    assert dones.all()
+    assert (rewards == -1).all()
+    assert (info['winners'] == go.WHITE).all()
+    assert (env.observations[:, 2] == 1).all()      # games restarted
+
+
+def test_random_rollout(env):
+    """Games sampled from the legal moves end with a win or a loss"""
+    finished = np.zeros(6, dtype=bool)
+    for _ in range(300):
+        legal = env.legal_moves()
+        legal[:, -1] = False        # do not resign
+        legal[:, -2] = ~legal[:, :-2].any(axis=1)       # pass only when the board is full
+        actions = np.array([np.random.choice(np.flatnonzero(row)) for row in legal])
+        _, rewards, dones, _ = env.step(actions)
+        assert (np.abs(rewards[dones]) == 1).all()
+        assert not rewards[~dones].any()
+        finished |= dones
+    assert finished.all()
+
+
+def test_self_play_rewards():
+    """With no opponent the agent plays both colours and is rewarded as the mover"""
+    env = VectorGoEnv(n_envs=1, size=9, opponent=None)
+    env.reset()
+    env.step([0])
+    observations, _, _, _ = env.step([1])
+    assert observations[0, 0, 0, 0] == 1 and observations[0, 1, 0, 1] == 1
+
+    _, rewards, dones, info = env.step([82])        # black resigns
+    assert dones[0] and rewards[0] == -1 and info['winners'][0] == go.WHITE
+
+
+def test_random_move():
+    """Random moves are played for the colour asked for"""
+    position = go.Position(size=9)
+    move_pt = random_move(position, go.WHITE)
+    assert position.board._board_colour[move_pt] == go.WHITE
+
+
+def test_own_eyes():
+    """Only open intersections surrounded by the colour are its eyes"""
+    observation = np.zeros((3, 5, 5), dtype=np.uint8)
+    observation[2] = 1
+    for pt in [1, 5, 7, 11]:
+        observation[0].flat[pt], observation[2].flat[pt] = 1, 0
+
+    black_eyes = own_eyes(observation, go.BLACK)
+    assert list(np.flatnonzero(black_eyes)) == [0, 6]
+    assert not own_eyes(observation, go.WHITE).any()
@@ -1,5 +1,7 @@
 from collections import defaultdict
 
+import h5py
+import numpy as np
 from thick_goban import go
 
 def open_position():
@@ -43,3 +45,31 @@ def first_position():
                 moves_played[pt] = go.WHITE
         return position, moves_played
     return position_moves
+
+
+def gray_game(moves, size=19):
+    """Grayscale positions before and after every move, without captures"""
+    gray = np.full((len(moves) + 1, size, size), 128, dtype=np.uint8)
+    for idx, (pt, player) in enumerate(moves, start=1):
+        gray[idx:, pt // size, pt % size] = 1 if player == 1 else 255
+    return gray
+
+
+def write_library(file_name, games, size=19, gray=True):
+    """Write a small h5 file laid out like the pro sgf Library
+
+    :param file_name: str
+    :param games: dict      {name: (moves, attributes)}, SZ is size unless the attributes give it
+    :param size: int
+    :param gray: boolean    True -> add the grayscale positions of every game
+    :return: str            file_name
+    """
+    with h5py.File(file_name, 'w') as h5file:
+        for name, (moves, attributes) in games.items():
+            group = h5file.create_group(str(name))
+            group.create_dataset('moves', data=np.array(moves))
+            if gray:
+                group.create_dataset('gray', data=gray_game(moves, size=size))
+            group.attrs['SZ'] = str(size)
+            group.attrs.update(attributes)
+    return file_name
@@ -0,0 +1,112 @@
+import io
+import time
+
+import pytest
+
+from mcts import mcts
+from mcts.gtp import GTPEngine, format_vertex, parse_vertex
+
+
+def run(commands, **kwargs):
+    """Run an engine over the commands, and return its responses"""
+    outstream = io.StringIO()
+    GTPEngine(**kwargs).run(io.StringIO('\n'.join(commands) + '\n'), outstream)
+    return outstream.getvalue().split('\n\n')[:-1]
+
+
+@pytest.mark.parametrize('size', [9, 19])
+def test_vertices(size):
+    """Vertices and points convert both ways"""
+    for pt in range(size**2):
+        assert parse_vertex(format_vertex(pt, size), size) == pt
+
+
+def test_protocol():
+    """Administrative commands, ids and errors follow the protocol"""
+    responses = run(['1 protocol_version', 'name', 'known_command genmove', 'known_command dance',
+                     'dance', '# comment only', 'boardsize 1', 'play b Z9', 'play b', 'quit', 'name'])
+    assert responses == ['=1 2', '= GoFamiliar', '= true', '= false', '? unknown command',
+                         '? unacceptable size', '? invalid vertex', '? syntax error', '=']
+
+
+def test_command_errors_surface():
+    """A TypeError raised by a command body is not taken for a syntax error"""
+    engine = GTPEngine(size=9)
+    engine.commands['name'] = lambda: None + 1
+    with pytest.raises(TypeError):
+        engine.handle('name')
+
+
+def test_genmove_reuses_tree():
+    """genmove plays a legal move, and the tree under it is kept for the next turn"""
+    engine = GTPEngine(size=9, komi=7.5, sim_limit=50)
+    engine.handle('play b E5')
+    response = engine.handle('genmove w')
+    assert response.startswith('= ')
+
+    move_pt = parse_vertex(response[2:], 9)
+    assert engine.state.board._board_colour[move_pt] == -1
+    assert engine.rootnode is not None and engine.rootnode.parent is None
+
+    mcts.search(engine.rootnode, sim_limit=engine.rootnode.sims + 10)   # the move may be a leaf
+    reply = next(iter(engine.rootnode.children))
+    sims = engine.rootnode.children[reply].sims
+    engine.handle('play b ' + format_vertex(reply, 9))
+    assert engine.rootnode.sims == sims
+
+
+def test_time_budget():
+    """Moves are given a share of the time left"""
+    engine = GTPEngine(size=9)
+    assert engine.move_time(1) is None
+    engine.handle('time_settings 300 0 0')
+    assert 0 < engine.move_time(1) < 300 / engine.MIN_MOVES_LEFT
+    engine.handle('time_left b 10 5')
+    assert engine.move_time(1) == pytest.approx(2 * engine.TIME_MARGIN)
+    engine.handle('time_settings 0 0 0')
+    assert engine.move_time(1) is None
+
+
+def test_out_of_time():
+    """With no time left a move is still searched, not passed"""
+    engine = GTPEngine(size=9)
+    engine.MIN_SIMS = 10
+    engine.handle('time_settings 300 0 0')
+    engine.handle('time_left b 0 0')
+    assert engine.move_time(1) == 0
+    response = engine.handle('genmove b')
+    assert response.startswith('= ') and response != '= pass'
+    assert engine.state.board._board_colour[parse_vertex(response[2:], 9)] == 1
+
+
+def test_loadsgf(tmpdir):
+    """loadsgf sets the position before the given move number"""
+    sgf_file = tmpdir.join('game.sgf')
+    sgf_file.write('(;SZ[9]KM[7.5];B[ee];W[ce];B[ec])')
+
+    engine = GTPEngine()
+    assert engine.handle('loadsgf ' + str(sgf_file) + ' 3') == '='
+    assert engine.size == 9 and engine.moves == 2
+    assert sum(abs(colour) for colour in engine.state.board._board_colour) == 2
+    assert engine.handle('loadsgf nowhere.sgf').startswith('?')
+
+
+def test_ponder_between_moves():
+    """The tree below our move grows while waiting, and the search carries on from it"""
+    engine = GTPEngine(size=9, komi=7.5, sim_limit=20, ponder=True)
+    engine.handle('genmove b')
+    assert engine.ponderer.pondering
+    deadline = time.time() + 60
+    while engine.rootnode.sims < 50:
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.01)
+    assert engine.handle('name') == '= GoFamiliar'
+    assert not engine.ponderer.pondering
+    pondered = engine.rootnode.sims
+    assert pondered > 0
+
+    reply = max(engine.rootnode.children.values(), key=lambda node: node.sims)
+    sims = reply.sims
+    engine.handle('play w ' + format_vertex(reply.name, 9))
+    assert engine.rootnode is reply and engine.rootnode.sims == sims
+    engine.ponderer.stop()
@@ -0,0 +1,60 @@
+from os import path
+
+import h5py
+import numpy as np
+import pytest
+
+from corpus import heatmaps
+import tests.test_fixtures as fixt
+
+
+@pytest.fixture(scope='module')
+def library_file(tmpdir_factory):
+    """Games of ranks and eras, with a pass and a 9x9 game"""
+    file_name = path.join(str(tmpdir_factory.mktemp('library')), 'library.h5')
+    games = [({'BR': '9p', 'WR': '3d', 'DT': '2005-04-01'}, [(60, 1), (300, -1), (72, 1)]),
+             ({'DT': '1850'}, [(60, 1), (361, -1)] + [(pt, (-1)**pt) for pt in range(20)]),
+             ({'SZ': '9'}, [(40, 1)])]
+    return fixt.write_library(file_name, {name: (moves, attributes)
+                                          for name, (attributes, moves) in enumerate(games)}, gray=False)
+
+
+def test_count_moves(library_file):
+    """Every on board move of the 19x19 games is counted once, in its bins"""
+    with h5py.File(library_file, 'r') as library:
+        counts = heatmaps.count_moves(library, chunk_size=1)
+
+    assert counts.shape == heatmaps.SHAPE
+    assert counts.sum() == 3 + 21
+    assert counts[0, 0, 4, 4, 60] == 1         # black pro in 2005
+    assert counts[1, 0, 2, 4, 300] == 1        # white 3 dan
+    assert counts[0, 0, 0, 0, 60] == 1         # unknown rank before 1900
+    assert counts[:, 2, 0, 0].sum() == 2       # moves 20 and 21 of the second game
+
+
+def test_heatmap_selections(library_file):
+    """Heatmaps are frequencies of the selected counts"""
+    with h5py.File(library_file, 'r') as library:
+        counts = heatmaps.count_moves(library)
+
+    everything = heatmaps.heatmap(counts)
+    assert everything.shape == (19, 19)
+    assert everything.sum() == pytest.approx(1)
+    assert everything[60 // 19, 60 % 19] == pytest.approx(2 / 24)
+
+    pros = heatmaps.heatmap(counts, colours=[0], ranks=[4])
+    assert pros[72 // 19, 72 % 19] == pytest.approx(0.5)
+    assert heatmaps.heatmap(counts, ranks=[1]).sum() == 0
+
+
+def test_load_counts_cache(library_file, tmpdir):
+    """Counts are cached, and the cache is used while the library is unchanged"""
+    cache = str(tmpdir.join('heatmaps.npz'))
+    counts = heatmaps.load_counts(library_file, cache=cache)
+    assert path.exists(cache)
+
+    np.savez(cache, counts=counts + 1, mtime=path.getmtime(library_file))
+    assert (heatmaps.load_counts(library_file, cache=cache) == counts + 1).all()
+
+    np.savez(cache, counts=counts + 1, mtime=0)
+    assert (heatmaps.load_counts(library_file, cache=cache) == counts).all()
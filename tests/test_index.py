@@ -0,0 +1,65 @@
+import h5py
+import numpy as np
+import pytest
+from thick_goban import go
+
+from corpus.index import PositionIndex
+from util import symmetry
+import tests.test_fixtures as fixt
+
+
+GAMES = {'a': [(60, 1), (300, -1), (72, 1)],
+         'b': [(20, 1), (340, -1)],
+         'c': [(288, 1), (60, -1)]}     # the first move of 'a' reflected
+
+
+def write_library(file_name, names):
+    fixt.write_library(file_name, {name: (GAMES[name], {}) for name in names})
+
+
+def position(moves):
+    state = go.Position()
+    for pt, colour in moves:
+        state.move(move_pt=pt, colour=colour)
+    return state
+
+
+@pytest.fixture()
+def index(tmpdir):
+    library_file = str(tmpdir.join('library.h5'))
+    write_library(library_file, ['a', 'b'])
+    index = PositionIndex(str(tmpdir.join('index')), corner_size=7)
+    with h5py.File(library_file, 'r') as library:
+        assert index.add_games(library) == 2
+    return index
+
+
+def test_find_positions(index):
+    """Whole board positions are found in any orientation"""
+    assert index.find(position(GAMES['a'][:2])) == [('a', 2)]
+    assert sorted(index.find(go.Position())) == [('a', 0), ('b', 0)]
+
+    rotated = symmetry.transform_moves(np.array([60, 300]), np.array([2, 2]), 19)
+    assert index.find(position(zip(rotated, [1, -1]))) == [('a', 2)]
+    assert index.find(position([(0, 1)])) == []
+
+
+def test_find_corner(index):
+    """Corner positions are found wherever they were played first"""
+    assert index.find_corner(position([(20, 1)]), corner=0) == [('b', 1)]
+    assert index.find_corner(position([(340, 1)]), corner=3) == [('b', 1)]
+    assert index.find_corner(position([(340, -1)]), corner=3) == [('b', 2)]
+
+
+def test_incremental_update(index, tmpdir):
+    """Games added later are merged, and the index reloads from disk"""
+    library_file = str(tmpdir.join('more.h5'))
+    write_library(library_file, ['a', 'b', 'c'])
+    with h5py.File(library_file, 'r') as library:
+        assert index.add_games(library) == 1
+
+    reloaded = PositionIndex(index.directory)
+    assert len(reloaded) == 3
+    assert sorted(reloaded.find(position(GAMES['a'][:1]))) == [('a', 1), ('c', 1)]
+    hashes = reloaded.tables['board'][0]
+    assert (hashes[1:] >= hashes[:-1]).all()
@@ -1,5 +1,7 @@
+from copy import deepcopy
 import itertools
 
+import numpy as np
 import pytest
 
 from thick_goban import go
@@ -109,6 +111,94 @@ def test_children_of_expanded(expanded_root):
         assert expanded_root.sims - expanded_root.wins == sum([child.wins for child in expanded_root.children.values()])
 
 
+def test_subtree_reuse():
+    """The subtree of a following position is found and detached"""
+    rootnode = mcts.NodeMCTS(state=go.Position(size=9))
+    for _ in range(100):
+        mcts.search_step(rootnode)
+    child = max(rootnode.children.values(), key=lambda node: node.sims)
+    grandchild = next(iter(child.children.values()))
+
+    assert mcts.subtree(rootnode, rootnode.state) is rootnode
+    assert mcts.subtree(rootnode, deepcopy(grandchild.state)) is grandchild
+    assert grandchild.parent is None
+
+    grandchild_sims = grandchild.sims
+    mcts.search_step(grandchild)
+    assert grandchild.sims == grandchild_sims + 1
+
+
+def test_subtree_missing():
+    """No subtree is found for a position not in the tree"""
+    rootnode = mcts.NodeMCTS(state=go.Position(size=9))
+    mcts.search_step(rootnode)
+    position = go.Position(size=9)
+    for move_pt in [0, 80, 1, 79]:
+        position.move(move_pt=move_pt)
+    assert mcts.subtree(rootnode, position) is None
+
+
+def test_terminal_ownership():
+    """Stones and the empty points surrounded by one colour are owned"""
+    position = go.Position(size=3, komi=0)
+    for move_pt, colour in [(1, go.BLACK), (3, go.BLACK), (5, go.WHITE), (7, go.WHITE)]:
+        position.move(move_pt=move_pt, colour=colour)
+
+    assert list(mcts.terminal_ownership(position)) == [1, 1, 0, 1, 0, -1, 0, -1, -1]
+
+
+def test_ownership_totals():
+    """Ownership is summed along the search path, and gives the expected score"""
+    rootnode = mcts.NodeMCTS(state=go.Position(size=9, komi=7.5))
+    for _ in range(50):
+        mcts.search_step(rootnode)
+
+    assert np.abs(rootnode.ownership).max() <= rootnode.sims
+    assert (rootnode.ownership == sum(child.ownership for child in rootnode.children.values())).all()
+    assert np.abs(rootnode.ownership_map()).max() <= 1
+    assert rootnode.expected_score() == pytest.approx(rootnode.ownership_map().sum() - 7.5)
+
+
+def test_priors_select_first():
+    """Moves with priors are selected before any simulation, and children share the policy"""
+    policy = lambda state: {40: (1.0, 100)} if state.lastmove is None else {}
+    rootnode = mcts.NodeMCTS(state=go.Position(size=9), prior_policy=policy)
+    mcts.search_step(rootnode)
+
+    assert list(rootnode.children) == [40]
+    assert rootnode.children[40].prior_policy is policy
+    assert rootnode.children[40].score() > 0.9
+
+
+def test_progressive_widening():
+    """Widening nodes have no more children than their visits allow"""
+    class Widening(mcts.NodeMCTS):
+        WIDENING = 0.5
+
+    widened = Widening(state=go.Position(size=9))
+    for _ in range(60):
+        mcts.search_step(widened)
+        assert len(widened.children) <= widened.child_limit()
+
+    assert widened.child_limit() == 2 + 7
+    assert all(type(child) is Widening for child in widened.children.values())
+
+
+def test_ponder_and_respond():
+    """Pondering grows the tree, and the reply's subtree is promoted"""
+    rootnode = mcts.NodeMCTS(state=go.Position(size=9))
+    ponderer = mcts.Ponderer(sim_limit=60)
+    ponderer.start(rootnode)
+    ponderer._thread.join(timeout=120)
+    assert not ponderer.pondering
+    assert rootnode.sims == 60
+
+    reply = max(rootnode.children.values(), key=lambda node: node.sims)
+    promoted = ponderer.respond(deepcopy(reply.state))
+    assert promoted is reply and promoted.parent is None
+    assert ponderer.respond(go.Position(size=9)) is None
+
+
 @pytest.fixture()
 def position():
     return fixt.open_position()()
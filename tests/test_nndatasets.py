@@ -0,0 +1,78 @@
+from os import path
+
+import h5py
+import numpy as np
+import pytest
+
+from nn import datasets
+import tests.test_fixtures as fixt
+
+
+SIZE = 9
+
+
+@pytest.fixture(scope='module')
+def library(tmpdir_factory):
+    """Three 9x9 games of ten moves, won by black, white and unknown"""
+    file_name = path.join(str(tmpdir_factory.mktemp('library')), 'library.h5')
+    fixt.write_library(file_name, {game: ([(pt, (-1)**idx) for idx, pt in enumerate(range(game, game + 10))],
+                                          {'RE': result})
+                                   for game, result in enumerate(['B+R', 'W+0.5', '?'])}, size=SIZE)
+    libr = h5py.File(file_name, 'r')
+    yield libr
+    libr.close()
+
+
+def test_library_batches(library):
+    """Every move position is yielded once in minibatches of the requested size"""
+    batches = list(datasets.library_batches(library, batch_size=7, size=SIZE))
+    assert [len(actions) for _, actions, _ in batches] == [7, 7, 7, 7, 2]
+
+    observations = np.concatenate([obs for obs, _, _ in batches])
+    assert observations.shape == (30, 3, SIZE, SIZE)
+    assert (observations.sum(axis=1) == 1).all()       # every intersection in one plane
+
+    rewards = np.concatenate([rewards for _, _, rewards in batches])
+    assert sorted(rewards) == [-1]*10 + [0]*10 + [1]*10
+
+
+def test_library_batches_size_filter(library):
+    """Games of other board sizes are skipped"""
+    assert list(datasets.library_batches(library, size=19)) == []
+
+
+def test_move_intersection_open(library):
+    """The action of every position is an open intersection"""
+    for observations, actions, _ in datasets.augment(datasets.library_batches(library, batch_size=8, size=SIZE)):
+        open_planes = observations[:, 2].reshape(len(actions), SIZE**2)
+        assert (open_planes[np.arange(len(actions)), actions] == 1).all()
+
+
+def test_openai_batches_policy_inputs():
+    """OpenAI arrays become [stones, open] inputs with one hot action rewards"""
+    positions = np.zeros((10, 3, SIZE, SIZE), dtype=np.uint8)
+    positions[:, 2] = 1
+    moves = np.array([0, 1, 2, 3, 4, 5, 6, 7, 8, 81])
+    rewards = np.array([1, -1] * 5)
+
+    batches = datasets.policy_batches(datasets.openai_batches(positions, moves, rewards, batch_size=4, shuffle=False))
+    (stones, open_plane), actionrewards = next(batches)
+    assert stones.shape == (4, 2, SIZE, SIZE)
+    assert open_plane.shape == (4, SIZE, SIZE)
+    assert (actionrewards[np.arange(4), moves[:4]] == rewards[:4]).all()
+    assert actionrewards.sum() == 0
+
+    *_, (_, last_rewards) = batches
+    assert not last_rewards[1].any()       # pass has no action reward
+
+
+def test_prefetch_order_and_errors():
+    """Prefetching yields everything and passes on exceptions from the source"""
+    assert sorted(datasets.prefetch(iter(range(100)), buffer_size=3, workers=4)) == list(range(100))
+
+    def broken():
+        yield 1
+        raise ValueError('bad batch')
+
+    with pytest.raises(ValueError):
+        list(datasets.prefetch(broken()))
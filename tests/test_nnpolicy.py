@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from nn import policy
+
+
+@pytest.mark.parametrize('size', [9, 13, 19])
+def test_size_parametric(size):
+    """Nets of any size accept positions of their size and return moves on the board"""
+    positions = np.zeros((4,) + policy.board_shape(size))
+    positions[:, 2] = 1
+
+    net = policy.PolicyNet(size=size)
+    assert net.batch_probabilities(positions).shape == (4, size**2)
+    assert net.probailities(positions[0]).shape == (size**2,)
+    assert 0 <= net.move(positions[0]) < size**2
+
+
+def test_models_cached_per_size():
+    """Shared nets use one model per board size, and other nets models of their own"""
+    assert policy.PolicyNet(size=9, shared=True).model is policy.PolicyNet(size=9, shared=True).model
+    assert policy.PolicyNet(size=9, shared=True).model is not policy.PolicyNet(size=19, shared=True).model
+    assert policy.PolicyNet(size=9).model is not policy.compiled_model(9)
+    assert policy.PolicyNet(size=9).model is not policy.PolicyNet(size=9).model
+
+
+def test_lazy_build():
+    """Nets do not build a model until it is used"""
+    policy.clear_model_caches()
+    net = policy.PolicyNet(size=9, shared=True)
+    assert 9 not in policy._compiled_models
+    net.model
+    assert 9 in policy._compiled_models
+
+
+def test_model_registry(tmpdir):
+    """Saved models are loaded once per file version and shared"""
+    net = policy.PolicyNet(size=9)
+    net.save('registry', folder=str(tmpdir))
+    h5model = tmpdir.listdir()[0]
+
+    first = policy.PolicyNet.from_file(str(h5model))
+    second = policy.PolicyNet.from_file(str(h5model))
+    assert first.model is second.model
+    assert first.size == 9
+
+    positions = np.zeros((2,) + policy.board_shape(9))
+    positions[:, 2] = 1
+    assert np.allclose(first.batch_probabilities(positions), net.batch_probabilities(positions))
@@ -1,8 +1,53 @@
 
-from nn.policy9x9 import PolicyNet
+import numpy as np
+import pytest
+
+from nn import policy19x19
+from nn.policy9x9 import PolicyNet, sample_actions
 
 
 def test_define():
-    """Test the creation of the PolicyNet object has no runtime bugs
-    """
-    PolicyNet()
+    """The model is built on first use, with inputs and output of the 9x9 board"""
+    model = PolicyNet().model
+    assert [tuple(shape) for shape in model.input_shape] == [(None, 2, 9, 9), (None, 9, 9)]
+    assert tuple(model.output_shape) == (None, 81)
+
+
+def test_from_file(tmpdir):
+    """A saved model loads as a net of the 9x9 class, and not of the 19x19 one"""
+    PolicyNet().save('define', folder=str(tmpdir))
+    h5model = str(tmpdir.listdir()[0])
+
+    net = PolicyNet.from_file(h5model)
+    assert type(net) is PolicyNet and net.size == 9
+    with pytest.raises(ValueError):
+        policy19x19.PolicyNet.from_file(h5model)
+
+
+def test_sample_actions_legal():
+    """Sampled actions are always legal, and rows without legal actions pass"""
+    probabilities = np.random.random_sample((500, 81))
+    legal = np.random.random_sample((500, 81)) < 0.1
+    legal[0] = False
+
+    actions = sample_actions(probabilities, legal=legal)
+    assert actions[0] == 81
+    assert legal[np.arange(1, 500), actions[1:]].all()
+
+
+def test_sample_actions_distribution():
+    """Actions are sampled in proportion to their probabilities"""
+    probabilities = np.tile([0.1, 0.2, 0.7], (20000, 1))
+    frequencies = np.bincount(sample_actions(probabilities), minlength=3) / 20000
+    assert np.allclose(frequencies, [0.1, 0.2, 0.7], atol=0.02)
+
+
+def test_batch_moves():
+    """One move is made for each position of a batch"""
+    positions = np.zeros((5, 3, 9, 9))
+    positions[:, 2] = 1
+    positions[:, 2, 0, :] = 0       # first row occupied
+
+    moves = PolicyNet().batch_moves(positions)
+    assert moves.shape == (5,)
+    assert all(9 <= move < 81 for move in moves)
@@ -1,4 +1,43 @@
+import numpy as np
+import pytest
 
+from openai_go import positions
 
-def test_convert_obs():
-    assert False
+
+@pytest.fixture(scope='module')
+def observations():
+    """Random one hot OpenAI observations"""
+    colours = np.random.randint(3, size=(50, 9, 9))
+    return (np.arange(3).reshape(1, 3, 1, 1) == colours[:, np.newaxis]).astype(np.float32)
+
+
+def test_convert_obs(observations):
+    """Intersections get the pixel value of their colour"""
+    gray = positions.convert_observation(observations)
+    assert gray.shape == (50, 9, 9)
+    assert (gray == np.sum(observations * np.array((1, 255, 128)).reshape(1, 3, 1, 1), axis=1)).all()
+    assert (positions.convert_observation(observations[0]) == gray[0]).all()
+
+
+def test_convert_into_buffer(observations):
+    """The batched converter writes into the buffer it is given"""
+    out = np.zeros((50, 9, 9), dtype=np.uint8)
+    converted = positions.convert_observations(observations, out=out)
+    assert converted is out
+    assert (out == positions.convert_observation(observations)).all()
+
+
+def test_convert_dtype(observations):
+    """The output type is chosen by the caller"""
+    assert positions.convert_observations(observations).dtype == np.uint8
+    assert positions.convert_observations(observations, dtype=np.int32).dtype == np.int32
+
+
+def test_grayscale_round_trip(observations):
+    """Converting to grayscale and back gives the original planes"""
+    gray = positions.convert_observations(observations)
+    out = np.empty(observations.shape, dtype=np.uint8)
+    planes = positions.grayscale_observations(gray, out=out)
+    assert planes is out
+    assert (planes == observations).all()
+    assert positions.grayscale_observations(gray[0]).shape == (1, 3, 9, 9)
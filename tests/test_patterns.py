@@ -0,0 +1,105 @@
+from os import path
+
+import h5py
+import numpy as np
+import pytest
+from thick_goban import go
+
+import mcts
+from corpus import patterns
+from corpus.patterns import PatternTable
+from mcts.playout import PatternPlayout, WeightTree
+import tests.test_fixtures as fixt
+
+
+MOVES = [(60, 1), (300, -1), (72, 1), (288, -1), (42, 1)]
+
+
+@pytest.fixture(scope='module')
+def table(tmpdir_factory):
+    file_name = path.join(str(tmpdir_factory.mktemp('library')), 'library.h5')
+    fixt.write_library(file_name, {name: (MOVES, {}) for name in ['a', 'b']})
+    with h5py.File(file_name, 'r') as library:
+        return PatternTable.build(library, chunk_size=1)
+
+
+def test_codes_symmetric():
+    """Turned and mirrored patterns have one canonical code, and colours swap back"""
+    board = np.zeros((1, 81), dtype=int)
+    board[0, [30, 31]] = 1, 2
+    codes = patterns.pattern_codes(board, 9)[0]
+    turned = np.zeros((1, 81), dtype=int)
+    turned[0, [30, 39]] = 1, 2
+    turned_codes = patterns.pattern_codes(turned, 9)[0]
+
+    assert patterns.canonical_codes(codes[40]) == patterns.canonical_codes(turned_codes[40])
+    assert patterns.canonical_codes(codes[40]) != patterns.canonical_codes(codes[39])
+    small = codes & 0xFFFF
+    assert (patterns.swap_colours(patterns.swap_colours(small)) == small).all()
+    assert patterns.own_eye(patterns.pattern_codes(np.zeros((1, 81)), 9)[0] & 0xFFFF).sum() == 0
+
+
+def test_table_counts(table, tmpdir):
+    """Every move is counted once, on a pattern seen at least as often"""
+    assert table.small_played.sum() == 2 * len(MOVES)
+    assert (table.small_seen >= table.small_played).all()
+    assert table.diamond_played.sum() == 2 * len(MOVES)
+    assert (table.diamond_seen >= table.diamond_played).all()
+
+    file_name = str(tmpdir.join('patterns.npz'))
+    table.save(file_name)
+    assert (PatternTable.load(file_name).diamond_codes == table.diamond_codes).all()
+
+
+def test_priors(table):
+    """Priors cover the open intersections, the most played patterns best"""
+    priors = table.priors(go.Position(size=9))
+    assert len(priors) == 81
+    assert max(rate for rate, _ in priors.values()) == 1
+    assert all(weight == table.PRIOR_WEIGHT for _, weight in priors.values())
+
+
+def test_incremental_codes():
+    """With only open 3x3 patterns playable, no move is played next to a stone"""
+    played = np.zeros(4**8)
+    played[0] = 1
+    table = PatternTable(played, np.ones(4**8), [], [], [])
+    table.SMOOTHING = 0
+    final, moves = PatternPlayout(table)(go.Position(size=9))
+
+    assert len(moves[go.BLACK]) + len(moves[go.WHITE]) > 4
+    neighbours = patterns.neighbour_indexes(9, patterns.SMALL)
+    stones = np.flatnonzero(np.array(final.board._board_colour))
+    for move_pt in stones:
+        around = neighbours[move_pt]
+        assert (around < 81).all()
+        assert not set(around) & set(stones)
+
+
+def test_no_moves_after_capture():
+    """The moves of a playout stop at its first capture"""
+    table = PatternTable(np.ones(4**8), np.ones(4**8), [], [], [])
+    # white fills the top three rows but for 7, black the rest but for its eye at 22
+    setup = [(pt, go.WHITE) for pt in range(15) if pt != 7] + \
+        [(pt, go.BLACK) for pt in range(15, 25) if pt != 22]
+    final, moves = PatternPlayout(table)(go.Position(setup=setup, size=5))
+
+    assert moves == {go.BLACK: [7], go.WHITE: []}
+    assert np.count_nonzero(final.board._board_colour) > 12
+
+
+def test_weight_tree():
+    """Sampled indexes follow the weights as they are updated"""
+    tree = WeightTree([1.0, 0.0, 3.0, 0.0, 2.0])
+    assert [tree.find(value) for value in (0.5, 1.0, 3.9, 4.0, 5.9)] == [0, 2, 2, 4, 4]
+    tree.update(2, 0.0)
+    tree.update(3, 0.5)
+    assert tree.total == 3.5
+    assert [tree.find(value) for value in (0.5, 1.2, 1.5)] == [0, 3, 4]
+
+
+def test_search_with_patterns(table):
+    """A search runs with pattern priors and playouts"""
+    position = go.Position(size=9, komi=7.5)
+    move_pt = mcts.move_search(position, sim_limit=20, prior_policy=table.priors, playout=PatternPlayout(table))
+    assert 0 <= move_pt < 81
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from thick_goban import go
+
+from nn import datasets, selfplay
+
+
+class RandomPlayer:
+    """Player making random moves"""
+    def move(self, position):
+        try:
+            return position.random_move()
+        except go.MoveError:
+            return None
+
+
+def test_play_game():
+    """A game records one open intersection move per position, rewarded by the result"""
+    positions, moves, rewards = selfplay.play_game(RandomPlayer(), RandomPlayer(), size=9)
+
+    assert len(positions) == len(moves) == len(rewards) > 0
+    assert positions.shape[1:] == (3, 9, 9)
+    assert (positions.reshape(len(moves), 3, 81)[np.arange(len(moves)), 2, moves] == 1).all()
+    assert set(rewards) == {-1, 1}
+    assert (rewards[::2] == -rewards[1::2][0]).all()
+
+
+def test_search_player():
+    """The search player plays the move it finds"""
+    position = go.Position(size=9)
+    move_pt = selfplay.SearchPlayer(sim_limit=20).move(position)
+    assert position.lastmove == move_pt
+
+
+def test_search_player_illegal_best(monkeypatch):
+    """An illegal best child falls back to the most visited legal child"""
+    search = selfplay.mcts.search
+
+    def illegal_best(rootnode, **kwargs):
+        rootnode = search(rootnode, **kwargs)
+        rootnode.bestchild = lambda: 40
+        return rootnode
+    monkeypatch.setattr(selfplay.mcts, 'search', illegal_best)
+
+    position = go.Position(size=9)
+    position.move(move_pt=40)
+    move_pt = selfplay.SearchPlayer(sim_limit=20).move(position)
+    assert move_pt != 40 and position.lastmove == move_pt
+
+
+def test_selfplay_shards(tmpdir):
+    """Games are saved in shards the training pipeline can read"""
+    engine = selfplay.SelfPlay(RandomPlayer(), RandomPlayer(), size=9, folder=str(tmpdir),
+                               shard_size=100, processes=2)
+    reports = []
+    report = engine.run(games=4, report_every=2, report=reports.append)
+
+    assert report['games'] == 4
+    assert report['positions_per_hour'] > 0
+    assert [progress['games'] for progress in reports] == [2, 4]
+    positions, moves, rewards = selfplay.load_shards(engine.shards)
+    assert len(moves) == report['positions']
+
+    batches = list(datasets.openai_batches(positions, moves, rewards, batch_size=32))
+    assert sum(len(batch[1]) for batch in batches) == len(moves)
@@ -0,0 +1,93 @@
+import io
+import json
+
+import pytest
+
+from mcts.server import AnalysisClient, AnalysisServer, request_position
+
+
+def serve(requests, processes=2):
+    """Run a server over the requests, and return its responses"""
+    outstream = io.StringIO()
+    instream = io.StringIO('\n'.join(json.dumps(request) for request in requests))
+    AnalysisServer(instream, outstream, processes=processes, size=9).serve()
+    return [json.loads(line) for line in outstream.getvalue().splitlines()]
+
+
+def test_request_position():
+    """Positions are made from move lists and sgf strings"""
+    assert request_position({'moves': [40, 41], 'size': 9}).board._board_colour[41] == -1
+    assert request_position({'moves': [[40, -1]], 'size': 9}).board._board_colour[40] == -1
+
+    position = request_position({'sgf': '(;SZ[9]KM[7.5];B[ee])'})
+    assert position.size == 9 and position.board._board_colour[40] == 1
+
+
+def test_concurrent_sessions():
+    """Every session streams scores and finishes with a best move"""
+    requests = [{'cmd': 'analyse', 'session': name, 'moves': moves, 'size': 9,
+                 'sim_limit': 20, 'interval': 0.01}
+                for name, moves in [('a', []), ('b', [40]), ('c', [40, 41])]]
+    responses = serve(requests)
+
+    for name in 'abc':
+        session = [response for response in responses if response.get('session') == name]
+        assert session[-1]['event'] == 'done'
+        assert session[-1]['sims'] == 20
+        assert all(response['event'] == 'scores' for response in session[:-1])
+        assert all(len(response['ownership']) == 81 for response in session[:-1])
+    assert not [response for response in responses if response['event'] == 'error']
+
+
+def test_stop_and_errors():
+    """Stopped sessions report it, and bad requests get error responses"""
+    responses = serve([{'cmd': 'analyse', 'session': 'a', 'size': 9, 'sim_limit': 10**6},
+                       {'cmd': 'stop', 'session': 'a'},
+                       {'cmd': 'stop', 'session': 'nobody'},
+                       {'cmd': 'dance'}], processes=1)
+
+    events = [response['event'] for response in responses]
+    assert events.count('stopped') == 1
+    assert events.count('error') == 2
+
+
+def test_ended_sessions_dropped():
+    """Ended and replaced sessions are joined and forgotten"""
+    server = AnalysisServer(io.StringIO(), io.StringIO(), processes=1, size=9)
+    try:
+        server.handle({'cmd': 'analyse', 'session': 'a', 'size': 9, 'sim_limit': 10})
+        server.sessions['a'].join()
+        server.handle({'cmd': 'analyse', 'session': 'b', 'size': 9, 'sim_limit': 10**6})
+        assert list(server.sessions) == ['b'] and len(server._threads) == 1
+
+        replaced = server.sessions['b']
+        server.handle({'cmd': 'analyse', 'session': 'b', 'size': 9, 'sim_limit': 10})
+        replaced.join()
+        server.sessions['b'].join()
+        server.reap()
+        assert server.sessions == {} and server._threads == []
+    finally:
+        server.pool.close()
+
+
+def test_stop_after_end():
+    """Stopping an ended session leaves the stop flag of its old slot alone"""
+    server = AnalysisServer(io.StringIO(), io.StringIO(), processes=1, size=9)
+    try:
+        server.handle({'cmd': 'analyse', 'session': 'a', 'size': 9, 'sim_limit': 10})
+        session = server.sessions['a']
+        session.join()
+        session.stop()
+        assert session.slot is None and not server.pool.stop_flags[0]
+    finally:
+        server.pool.close()
+
+
+def test_local_client():
+    """A client talks to a server subprocess"""
+    client = AnalysisClient(processes=1)
+    client.send({'cmd': 'analyse', 'session': 'a', 'size': 9, 'sim_limit': 10, 'interval': 0.01})
+    client.process.stdin.close()
+    responses = list(client.responses())
+    client.process.wait()
+    assert responses[-1]['event'] == 'done'
@@ -0,0 +1,68 @@
+import asyncio
+
+from thick_goban import go
+
+from mcts.sessions import SessionMultiplexer
+
+
+def position(moves=()):
+    state = go.Position(size=9)
+    for move_pt in moves:
+        state.move(move_pt=move_pt)
+    return state
+
+
+async def collect(session):
+    return [event async for event in session.events()]
+
+
+def test_concurrent_sessions():
+    """Sessions waiting for the pool stream their scores and finish with a best move"""
+    async def analyse():
+        multiplexer = SessionMultiplexer(processes=2, size=9)
+        sessions = [multiplexer.analyse(name, position(moves), sim_limit=20, interval=0.01)
+                    for name, moves in [('a', []), ('b', [40]), ('c', [40, 41])]]
+        streams = await asyncio.gather(*(collect(session) for session in sessions))
+        await multiplexer.close()
+        return streams
+
+    for events in asyncio.run(analyse()):
+        assert events[-1]['event'] == 'done' and events[-1]['sims'] == 20
+        assert all(event['event'] == 'scores' for event in events[:-1])
+
+
+def test_stale_session_stopped():
+    """A new position stops the search of the old one, and the same position carries on"""
+    async def analyse():
+        multiplexer = SessionMultiplexer(processes=1, size=9)
+        stale = multiplexer.analyse('a', position(), sim_limit=100000, interval=0.01)
+        stale_stream = stale.events()
+        stale_events = [await stale_stream.__anext__()]     # the search is running
+        assert multiplexer.analyse('a', position(), sim_limit=100000) is stale
+
+        latest = multiplexer.analyse('a', position([40]), sim_limit=20, interval=0.01)
+        stale_events += [event async for event in stale_stream]
+        events = await collect(latest)
+        await multiplexer.close()
+        return stale_events, events
+
+    stale_events, events = asyncio.run(analyse())
+    assert stale_events[-1]['event'] == 'stopped'
+    assert events[-1]['event'] == 'done'
+
+
+def test_slow_consumer():
+    """A consumer which does not read holds at most queue_size events"""
+    async def analyse():
+        multiplexer = SessionMultiplexer(processes=1, size=9, queue_size=2)
+        session = multiplexer.analyse('a', position(), sim_limit=60, interval=0.01)
+        events = session.events()
+        first = await events.__anext__()
+        await session.task
+        rest = [event async for event in events]
+        await multiplexer.close()
+        return [first] + rest
+
+    events = asyncio.run(analyse())
+    assert len(events) <= 1 + 2
+    assert events[-1]['event'] == 'done'
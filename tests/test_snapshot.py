@@ -0,0 +1,72 @@
+from multiprocessing import Process
+
+import numpy as np
+import pytest
+from thick_goban import go
+
+import mcts
+from mcts.snapshot import ScoreSnapshot, principal_variation
+
+
+def test_publish_from_search():
+    """The final snapshot of a search matches its root children"""
+    snapshot = ScoreSnapshot(size=9)
+    mcts.gof_move_search(None, go.Position(size=9, komi=0.5), sim_limit=50, snapshot=snapshot)
+
+    latest = snapshot.read()
+    assert latest['seq'] > 0 and latest['seq'] % 2 == 0
+    assert latest['sims'] == 50
+    assert np.nansum(latest['visits']) <= 50
+    assert set(snapshot.scores()) == set(np.flatnonzero(latest['visits']))
+    assert 1 <= len(latest['pv']) <= snapshot.max_pv
+    assert latest['visits'][latest['pv'][0]] == latest['visits'].max()
+    assert np.abs(latest['ownership'][:81]).max() <= 1
+    assert latest['score'] == pytest.approx(latest['ownership'].sum() - 0.5)
+
+
+def test_seq_unchanged_without_publish():
+    """Reading does not change the sequence number"""
+    snapshot = ScoreSnapshot(size=9)
+    rootnode = mcts.NodeMCTS(state=go.Position(size=9))
+    rootnode.new_child()
+    snapshot.publish(rootnode)
+    assert snapshot.seq == snapshot.read()['seq'] == snapshot.read()['seq'] == 2
+
+
+def test_principal_variation_follows_visits():
+    """The principal variation is the most visited child at each level"""
+    rootnode = mcts.NodeMCTS(state=go.Position(size=9))
+    for _ in range(30):
+        mcts.treepolicy(rootnode)
+
+    pv = principal_variation(rootnode)
+    node = rootnode
+    for move in pv:
+        assert node.children[move].sims == max(child.sims for child in node.children.values())
+        node = node.children[move]
+
+
+def test_pass_child():
+    """A pass child leaves the other scores alone, and is None in the principal variation"""
+    rootnode = mcts.search(mcts.NodeMCTS(state=go.Position(size=9)), sim_limit=20)
+    pass_child = mcts.NodeMCTS(state=None, name=None, parent=rootnode)
+    pass_child.sims, pass_child.wins = 100, 50
+    rootnode.children[None] = pass_child
+    snapshot = ScoreSnapshot(size=9)
+    snapshot.publish(rootnode)
+
+    latest = snapshot.read()
+    assert latest['pv'] == [None]
+    assert snapshot.scores() == pytest.approx({name: child.score() for name, child in rootnode.children.items()
+                                               if name is not None})
+
+
+def test_shared_between_processes():
+    """A search process publishes to memory the parent process reads"""
+    snapshot = ScoreSnapshot(size=9)
+    search = Process(target=mcts.gof_move_search,
+                     args=(None, go.Position(size=9), 40),
+                     kwargs={'snapshot': snapshot, 'publish_interval': 0.01})
+    search.start()
+    search.join()
+    assert snapshot.read()['sims'] == 40
@@ -0,0 +1,40 @@
+import io
+
+from thick_goban import go
+from mcts import mcts
+from mcts.stats import PHASES, SearchStats, tree_stats
+
+
+def test_move_search_stats():
+    """Every phase is timed, and the counters and tree shape agree with the search"""
+    stats = SearchStats()
+    move_pt = mcts.move_search(go.Position(size=9), sim_limit=50, stats=stats)
+    assert type(move_pt) is int
+
+    summary = stats.summary()
+    assert all(summary['phases'][phase]['count'] > 0 for phase in PHASES)
+    assert summary['phases']['selection']['count'] == summary['counters']['steps'] == 50
+    assert summary['phases']['playout']['count'] == 50
+    assert summary['counters']['nodes'] == summary['tree']['nodes'] - 1
+    assert sum(summary['depths'].values()) == 50
+    assert summary['tree']['max_depth'] == max(summary['depths']) + 1
+
+
+def test_periodic_dump():
+    """Reports are written to the stream every dump interval"""
+    outstream = io.StringIO()
+    stats = SearchStats(dump_interval=0, outstream=outstream)
+    mcts.search(mcts.NodeMCTS(state=go.Position(size=9), stats=stats), sim_limit=3)
+    reports = outstream.getvalue()
+    assert reports.count('elapsed') == 3
+    assert 'playout' in reports and 'nodes' in reports
+
+
+def test_tree_stats():
+    """A root and its children are one level of branching"""
+    rootnode = mcts.NodeMCTS(state=go.Position(size=9))
+    for _ in range(5):
+        rootnode.new_child()
+    assert rootnode.stats is None
+    assert tree_stats(rootnode) == {'nodes': 6, 'leaves': 5, 'max_depth': 1, 'mean_depth': 1.0,
+                                    'branching': 5.0, 'max_branching': 5}
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from util import symmetry
+
+
+@pytest.fixture(params=[2, 9, 19])
+def size(request):
+    return request.param
+
+
+def test_identity_first(size):
+    """Symmetry zero leaves boards unchanged"""
+    assert (symmetry.dihedral_indexes(size)[0] == np.arange(size**2)).all()
+
+
+def test_symmetries_distinct(size):
+    """The eight symmetries are all different permutations of the board"""
+    indexes = symmetry.dihedral_indexes(size)
+    assert indexes.shape == (symmetry.SYMMETRIES, size**2)
+    assert len({tuple(row) for row in indexes}) == symmetry.SYMMETRIES
+    for row in indexes:
+        assert sorted(row) == list(range(size**2))
+
+
+def test_transform_boards_matches_numpy(size):
+    """Batched transforms agree with rotating and mirroring one board at a time"""
+    boards = np.random.randint(0, 3, size=(symmetry.SYMMETRIES, 3, size, size))
+    symmetries = np.arange(symmetry.SYMMETRIES)
+    transformed = symmetry.transform_boards(boards, symmetries)
+
+    for board, sym, result in zip(boards, symmetries, transformed):
+        expected = np.rot90(board, k=sym // 2, axes=(1, 2))
+        if sym % 2:
+            expected = expected[:, :, ::-1]
+        assert (result == expected).all()
+
+
+def test_moves_follow_boards(size):
+    """A stone and its move land on the same intersection under every symmetry"""
+    moves = np.random.randint(0, size**2, size=symmetry.SYMMETRIES)
+    symmetries = np.arange(symmetry.SYMMETRIES)
+    boards = np.zeros((symmetry.SYMMETRIES, size**2), dtype=int)
+    boards[symmetries, moves] = 1
+
+    transformed = symmetry.transform_boards(boards.reshape(-1, size, size), symmetries)
+    new_moves = symmetry.transform_moves(moves, symmetries, size=size)
+
+    assert (transformed.reshape(-1, size**2)[symmetries, new_moves] == 1).all()
+
+
+def test_off_board_moves_unchanged():
+    """Pass and resign actions are not moved by a symmetry"""
+    moves = np.array([81, 82, 0])
+    assert list(symmetry.transform_moves(moves, np.array([3, 5, 2]), size=9)[:2]) == [81, 82]